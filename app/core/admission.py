@@ -0,0 +1,191 @@
+# app/core/admission.py
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Deque, Dict, Iterator, Optional, Tuple
+
+# priority classes, highest first
+INTERACTIVE = 'interactive'
+BULK = 'bulk'
+BACKGROUND = 'background'
+PRIORITIES = (INTERACTIVE, BULK, BACKGROUND)
+
+# class of the verification running in the current task; tasks inherit it when spawned
+current_priority: ContextVar[str] = ContextVar('verification_priority', default=INTERACTIVE)
+
+
+@contextmanager
+def prioritized(priority: str) -> Iterator[None]:
+    """Run the enclosed code (and the tasks it spawns) under ``priority``."""
+    token = current_priority.set(priority)
+    try:
+        yield
+    finally:
+        current_priority.reset(token)
+
+
+class PrioritySemaphore:
+    """Counting semaphore shared by priority classes.
+
+    Waiters queue FIFO per class. When slots are contended they are handed out by
+    stride scheduling on ``weights`` (a class with weight 8 gets 8 slots for every
+    1 of a class with weight 1), so lower classes slow down but never stop.
+    ``reserved`` slots can only be taken by that class or a higher one: with 10
+    reserved for interactive, bulk and background together never hold more than
+    ``capacity - 10``. ``acquire``/``release`` default to the current task's
+    class, so ``async with`` works like a plain semaphore.
+    """
+
+    def __init__(self, capacity: int, weights: Dict[str, int], reserved: Optional[Dict[str, int]] = None):
+        self.capacity = capacity
+        self.weights = {priority: weights.get(priority, 1) for priority in PRIORITIES}
+        self.reserved = reserved or {}
+        self._in_use = 0
+        self._held = {priority: 0 for priority in PRIORITIES}
+        self._waiters: Dict[str, Deque[asyncio.Future]] = {priority: deque() for priority in PRIORITIES}
+        self._pass = {priority: 0.0 for priority in PRIORITIES}
+        # most a class may hold: capacity minus what is reserved for the classes above it
+        self._limits = {}
+        reserved_above = 0
+        for priority in PRIORITIES:
+            self._limits[priority] = max(1, capacity - reserved_above)
+            reserved_above += self.reserved.get(priority, 0)
+
+    def in_use(self, priority: Optional[str] = None) -> int:
+        return self._in_use if priority is None else self._held[priority]
+
+    def waiting(self, priority: str) -> int:
+        return len(self._waiters[priority])
+
+    def locked(self) -> bool:
+        return self._in_use >= self.capacity
+
+    async def acquire(self, priority: Optional[str] = None) -> bool:
+        priority = priority or current_priority.get()
+        waiters = self._waiters[priority]
+        if not waiters and not self._held[priority]:
+            # returning after being idle: no credit for the time away
+            busy = [self._pass[p] for p in PRIORITIES if self._waiters[p] or self._held[p]]
+            if busy:
+                self._pass[priority] = max(self._pass[priority], min(busy))
+
+        future = asyncio.get_running_loop().create_future()
+        waiters.append(future)
+        self._wake()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # granted just as we were cancelled: pass the slot on
+                self.release(priority)
+            raise
+        return True
+
+    def release(self, priority: Optional[str] = None):
+        priority = priority or current_priority.get()
+        self._in_use -= 1
+        self._held[priority] -= 1
+        self._wake()
+
+    def _wake(self):
+        while self._in_use < self.capacity:
+            chosen = None
+            for priority in PRIORITIES:
+                waiters = self._waiters[priority]
+                while waiters and waiters[0].done():
+                    # cancelled while waiting
+                    waiters.popleft()
+                if waiters and self._held[priority] < self._limits[priority] and \
+                        (chosen is None or self._pass[priority] < self._pass[chosen]):
+                    chosen = priority
+            if chosen is None:
+                return
+            self._waiters[chosen].popleft().set_result(None)
+            self._in_use += 1
+            self._held[chosen] += 1
+            self._pass[chosen] += 1 / self.weights[chosen]
+
+    async def __aenter__(self):
+        await self.acquire()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class Overloaded(Exception):
+    """The backlog of ``priority`` is full; retry after ``retry_after`` seconds."""
+
+    def __init__(self, priority: str, retry_after: int):
+        super().__init__(f'{priority} verification backlog is full, retry in {retry_after}s')
+        self.priority = priority
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Bounds how many addresses per priority class are accepted and not yet finished.
+
+    A request that would push its class past ``limits[priority]`` (None = unbounded)
+    is refused with ``Overloaded`` instead of queueing, unless the class is idle, so
+    a single request larger than the limit can still run on its own. The suggested
+    retry delay is the excess divided by the recent completion rate.
+    """
+
+    def __init__(self, limits: Dict[str, Optional[int]], rate_window: int = 30, max_retry_after: int = 300):
+        self.limits = limits
+        self.rate_window = rate_window
+        self.max_retry_after = max_retry_after
+        self._backlog = {priority: 0 for priority in PRIORITIES}
+        # (second, addresses finished in it)
+        self._finished: Deque[Tuple[int, int]] = deque()
+        self.rejected = {priority: 0 for priority in PRIORITIES}
+
+    def backlog(self, priority: str) -> int:
+        return self._backlog[priority]
+
+    def check(self, priority: str, count: int = 1):
+        """Raise ``Overloaded`` if ``count`` more addresses of ``priority`` wouldn't be admitted."""
+        limit = self.limits.get(priority)
+        backlog = self._backlog[priority]
+        if limit is not None and backlog and backlog + count > limit:
+            self.rejected[priority] += 1
+            raise Overloaded(priority, self.retry_after(backlog + count - limit))
+
+    @contextmanager
+    def admit(self, priority: str, count: int = 1) -> Iterator[None]:
+        self.check(priority, count)
+        self._backlog[priority] += count
+        try:
+            yield
+        finally:
+            self._backlog[priority] -= count
+            self._record_finished(count)
+
+    def _record_finished(self, count: int):
+        second = int(time.monotonic())
+        if self._finished and self._finished[-1][0] == second:
+            self._finished[-1] = (second, self._finished[-1][1] + count)
+        else:
+            self._finished.append((second, count))
+        while self._finished[0][0] <= second - self.rate_window:
+            self._finished.popleft()
+
+    def throughput(self) -> float:
+        """Addresses finished per second over the last ``rate_window`` seconds."""
+        horizon = int(time.monotonic()) - self.rate_window
+        return sum(count for second, count in self._finished if second > horizon) / self.rate_window
+
+    def retry_after(self, excess: int) -> int:
+        rate = self.throughput()
+        if rate <= 0:
+            return self.max_retry_after
+        return max(1, min(self.max_retry_after, math.ceil(excess / rate)))
+
+    def stats(self) -> Dict[str, Dict[str, Optional[int]]]:
+        return {
+            priority: {'backlog': self._backlog[priority], 'limit': self.limits.get(priority),
+                       'rejected': self.rejected[priority]}
+            for priority in PRIORITIES
+        }
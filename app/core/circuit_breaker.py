@@ -0,0 +1,69 @@
+# app/core/circuit_breaker.py
+import time
+from typing import Any, Dict, List
+
+
+class HostCircuitBreaker:
+    """Remembers MX hosts we cannot open an SMTP session to.
+
+    After ``failure_threshold`` consecutive connection failures (timeout, refused,
+    unreachable, port 25 blocked) a host is skipped for ``base_delay`` seconds,
+    doubling on every further failure up to ``max_delay``. When the delay is over
+    one attempt is let through: success closes the circuit, failure re-opens it
+    with the next delay. A trial that never reports back (e.g. it was cancelled)
+    stops blocking others after ``trial_timeout``. One instance is shared by all
+    verifications in a process.
+    """
+
+    def __init__(self, failure_threshold: int = 2, base_delay: float = 30, max_delay: float = 1800,
+                 trial_timeout: float = 60, max_hosts: int = 50_000):
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.trial_timeout = trial_timeout
+        self.max_hosts = max_hosts
+        # host -> [consecutive failures, open until, trial started at] (monotonic times)
+        self._hosts: Dict[str, list] = {}
+
+    def _blocked(self, state: list, now: float) -> bool:
+        return state[0] >= self.failure_threshold and \
+            (now < state[1] or now - state[2] < self.trial_timeout)
+
+    def allow(self, host: str) -> bool:
+        """False while the circuit is open. Once the delay has passed, admits a single trial."""
+        state = self._hosts.get(host)
+        if state is None or state[0] < self.failure_threshold:
+            return True
+        now = time.monotonic()
+        if self._blocked(state, now):
+            return False
+        state[2] = now
+        return True
+
+    def is_open(self, host: str) -> bool:
+        state = self._hosts.get(host)
+        return state is not None and self._blocked(state, time.monotonic())
+
+    def record_success(self, host: str):
+        self._hosts.pop(host, None)
+
+    def record_failure(self, host: str):
+        state = self._hosts.get(host)
+        if state is None:
+            if len(self._hosts) >= self.max_hosts:
+                # drop the oldest insertion; dicts keep insertion order
+                del self._hosts[next(iter(self._hosts))]
+            state = self._hosts[host] = [0, 0.0, float('-inf')]
+        state[0] += 1
+        state[2] = float('-inf')
+        if state[0] >= self.failure_threshold:
+            delay = self.base_delay * 2 ** min(state[0] - self.failure_threshold, 32)
+            state[1] = time.monotonic() + min(delay, self.max_delay)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        return [
+            {'host': host, 'failures': failures, 'retry_in': round(max(0.0, until - now), 1)}
+            for host, (failures, until, _) in self._hosts.items()
+            if failures >= self.failure_threshold
+        ]
@@ -0,0 +1,236 @@
+# app/core/congestion.py
+import asyncio
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Set
+
+from app.core.admission import PRIORITIES, current_priority
+from app.utils.helpers import SingleFlight
+
+# session outcomes reported by the SMTP checker
+OK = 'ok'
+THROTTLED = 'throttled'
+TIMEOUT = 'timeout'
+ERROR = 'error'
+
+CONGESTION_KEY_PREFIX = "congestion:"
+
+
+class HostState:
+    """Learned limits and recent history of one MX host."""
+
+    def __init__(self, host: str, rate: float, concurrency: float, history: int = 20):
+        self.host = host
+        # sessions per minute and sessions open at once
+        self.rate = rate
+        self.concurrency = concurrency
+        self.in_flight = 0
+        self.next_start = 0.0
+        self.latency: Optional[float] = None
+        self.last_cut = 0.0
+        self.counts = {OK: 0, THROTTLED: 0, TIMEOUT: 0, ERROR: 0}
+        self.decisions: deque = deque(maxlen=history)
+        self.changed = asyncio.Condition()
+        # sessions waiting for a slot, by priority class
+        self.waiting = {priority: 0 for priority in PRIORITIES}
+        self.saved_at = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'host': self.host,
+            'rate_per_minute': round(self.rate, 2),
+            'concurrency': int(self.concurrency),
+            'in_flight': self.in_flight,
+            'latency_ewma': round(self.latency, 4) if self.latency is not None else None,
+            'outcomes': dict(self.counts),
+            'decisions': list(self.decisions),
+        }
+
+
+class CongestionController:
+    """AIMD pacing of SMTP sessions per MX host.
+
+    Every healthy session (answered, RCPT latency under ``latency_target``) raises
+    the host's rate by ``increase`` sessions/minute and its concurrency by
+    1/concurrency, like TCP congestion avoidance. A 4xx reply, a reset or a timeout
+    multiplies both by ``decrease``, at most once per ``cut_interval`` so one burst
+    of rejections counts as one congestion event. Learned limits are written to
+    Redis so a restart resumes from them; ``snapshot()`` exposes the state and the
+    last decisions per host.
+
+    ``acquire``/``release`` bracket a session and are used as a scheduler gate. A
+    free slot goes to the highest priority class waiting for the host.
+    """
+
+    def __init__(self, redis_client=None, initial_rate: float = 30, min_rate: float = 2,
+                 max_rate: float = 600, initial_concurrency: float = 2, max_concurrency: float = 20,
+                 increase: float = 1, decrease: float = 0.5, latency_target: float = 2.0,
+                 cut_interval: float = 5.0, save_interval: float = 30.0,
+                 state_ttl: int = 7 * 86400, max_hosts: int = 50_000):
+        self.redis = redis_client
+        self.initial_rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.initial_concurrency = initial_concurrency
+        self.max_concurrency = max_concurrency
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self.cut_interval = cut_interval
+        self.save_interval = save_interval
+        self.state_ttl = state_ttl
+        self.max_hosts = max_hosts
+        self._hosts: Dict[str, HostState] = {}
+        self._load_flight = SingleFlight()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def _new_state(self, host: str) -> HostState:
+        if len(self._hosts) >= self.max_hosts:
+            # forget the oldest idle host; dicts keep insertion order
+            for old_host, old in self._hosts.items():
+                if not old.in_flight:
+                    del self._hosts[old_host]
+                    break
+        state = HostState(host, self.initial_rate, self.initial_concurrency)
+        self._hosts[host] = state
+        return state
+
+    async def _load(self, host: str) -> HostState:
+        saved = None
+        if self.redis is not None:
+            try:
+                saved = await self.redis.hgetall(CONGESTION_KEY_PREFIX + host)
+            except Exception:
+                pass
+        # registered only once loaded, so nothing records into (and saves) defaults
+        state = self._new_state(host)
+        if saved:
+            state.rate = min(self.max_rate, max(self.min_rate, float(saved.get('rate', state.rate))))
+            state.concurrency = min(self.max_concurrency,
+                                    max(1.0, float(saved.get('concurrency', state.concurrency))))
+            self._decide(state, 'restore', 'learned limits loaded from Redis')
+        return state
+
+    async def _state(self, host: str) -> HostState:
+        state = self._hosts.get(host)
+        if state is None:
+            state = await self._load_flight.do(host, lambda: self._load(host))
+        return state
+
+    async def acquire(self, host: str):
+        """Wait for a concurrency slot and the host's pacing interval."""
+        state = await self._state(host)
+        priority = current_priority.get()
+        above = PRIORITIES[:PRIORITIES.index(priority)]
+        async with state.changed:
+            state.waiting[priority] += 1
+            try:
+                await state.changed.wait_for(lambda: state.in_flight < int(state.concurrency) and
+                                             not any(state.waiting[p] for p in above))
+            finally:
+                state.waiting[priority] -= 1
+            state.in_flight += 1
+            now = time.monotonic()
+            start_at = max(now, state.next_start)
+            state.next_start = start_at + 60.0 / state.rate
+        if start_at > now:
+            try:
+                await asyncio.sleep(start_at - now)
+            except BaseException:
+                # cancelled while paced (deadline, hedge loser): the caller never gets to release
+                self.release(host)
+                raise
+
+    def release(self, host: str):
+        state = self._hosts.get(host)
+        if state is None:
+            return
+        state.in_flight = max(0, state.in_flight - 1)
+        asyncio.ensure_future(self._notify(state))
+
+    @staticmethod
+    async def _notify(state: HostState):
+        async with state.changed:
+            state.changed.notify_all()
+
+    def record(self, host: str, outcome: str, latency: Optional[float] = None):
+        """Feed one session outcome (``OK``, ``THROTTLED``, ``TIMEOUT`` or ``ERROR``)."""
+        state = self._hosts.get(host)
+        if state is None:
+            # not loaded yet (or evicted): apply the outcome to the saved limits,
+            # not to fresh defaults that would overwrite them on the next save
+            self._track(asyncio.ensure_future(self._record_loaded(host, outcome, latency)))
+            return
+        self._apply(state, outcome, latency)
+
+    async def _record_loaded(self, host: str, outcome: str, latency: Optional[float]):
+        self._apply(await self._state(host), outcome, latency)
+
+    def _apply(self, state: HostState, outcome: str, latency: Optional[float]):
+        state.counts[outcome] = state.counts.get(outcome, 0) + 1
+        now = time.monotonic()
+
+        if outcome == OK:
+            if latency is not None:
+                state.latency = latency if state.latency is None else 0.8 * state.latency + 0.2 * latency
+            if state.latency is not None and state.latency > self.latency_target:
+                # answering, but slowly: hold the current limits
+                return
+            before = int(state.concurrency)
+            state.rate = min(self.max_rate, state.rate + self.increase)
+            state.concurrency = min(self.max_concurrency, state.concurrency + 1.0 / state.concurrency)
+            if int(state.concurrency) != before:
+                self._decide(state, 'increase', 'healthy sessions')
+                asyncio.ensure_future(self._notify(state))
+        elif outcome in (THROTTLED, TIMEOUT):
+            if now - state.last_cut < self.cut_interval:
+                # same congestion event as the last cut
+                return
+            state.last_cut = now
+            state.rate = max(self.min_rate, state.rate * self.decrease)
+            state.concurrency = max(1.0, state.concurrency * self.decrease)
+            # back off before the next session, too
+            state.next_start = max(state.next_start, now + 60.0 / state.rate)
+            self._decide(state, 'decrease', outcome)
+        else:
+            return
+
+        if outcome != OK or now - state.saved_at >= self.save_interval:
+            self._save(state)
+
+    def _decide(self, state: HostState, action: str, reason: str):
+        state.decisions.append({
+            'at': time.time(),
+            'action': action,
+            'reason': reason,
+            'rate_per_minute': round(state.rate, 2),
+            'concurrency': int(state.concurrency),
+        })
+
+    def _save(self, state: HostState):
+        if self.redis is None:
+            return
+        state.saved_at = time.monotonic()
+
+        async def save():
+            try:
+                key = CONGESTION_KEY_PREFIX + state.host
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    pipe.hset(key, mapping={'rate': state.rate, 'concurrency': state.concurrency,
+                                            'updated_at': time.time()})
+                    pipe.expire(key, self.state_ttl)
+                    await pipe.execute()
+            except Exception:
+                pass
+
+        self._track(asyncio.ensure_future(save()))
+
+    def _track(self, task: asyncio.Task):
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def snapshot(self, host: Optional[str] = None) -> List[Dict[str, Any]]:
+        if host is not None:
+            state = self._hosts.get(host)
+            return [state.to_dict()] if state else []
+        return [state.to_dict() for state in self._hosts.values()]
@@ -0,0 +1,186 @@
+# app/core/disposable.py
+import array
+import bisect
+import fnmatch
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from typing import Iterable, List, Optional, Set, Tuple
+
+# snapshot layout: magic, version, byte order, entry count, source list mtime/size,
+# then the sorted uint64 hashes
+SNAPSHOT_MAGIC = b'EVDD'
+SNAPSHOT_VERSION = 1
+_HEADER = struct.Struct('<4sIBxxxQQQ')
+_BYTE_ORDER = 1 if sys.byteorder == 'little' else 2
+
+
+def domain_hash(domain: str) -> int:
+    return int.from_bytes(hashlib.blake2b(domain.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def _read_domain_list(path: str) -> Iterable[str]:
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        for line in f:
+            domain = line.split('#', 1)[0].strip().lower().rstrip('.')
+            if domain:
+                yield domain
+
+
+class DisposableDomainIndex:
+    """Immutable set of domains stored as a sorted array of 64-bit hashes.
+
+    8 bytes per domain and a binary search per lookup. A snapshot file is
+    memory-mapped rather than read, so startup is O(1) and every worker process
+    shares the same page-cache copy.
+    """
+
+    def __init__(self, hashes, source=None):
+        self._hashes = hashes
+        self._source = source
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def __contains__(self, domain: str) -> bool:
+        h = domain_hash(domain)
+        i = bisect.bisect_left(self._hashes, h)
+        return i < len(self._hashes) and self._hashes[i] == h
+
+    @classmethod
+    def from_domains(cls, domains: Iterable[str]) -> 'DisposableDomainIndex':
+        hashes = array.array('Q', sorted({domain_hash(d) for d in domains}))
+        return cls(hashes)
+
+    def save(self, path: str, source_stamp: Tuple[int, int] = (0, 0)):
+        """Write the snapshot atomically (temp file + rename)."""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, _BYTE_ORDER, len(self._hashes), *source_stamp))
+            f.write(array.array('Q', self._hashes).tobytes())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, source_stamp: Optional[Tuple[int, int]] = None) -> Optional['DisposableDomainIndex']:
+        """Memory-map a snapshot; None if it is missing, in another format, or was
+        compiled from a different version of the list (``source_stamp``)."""
+        try:
+            with open(path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size < _HEADER.size:
+                    return None
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+        magic, version, byte_order, count, mtime_ns, size = _HEADER.unpack_from(mapped, 0)
+        if (magic, version, byte_order) != (SNAPSHOT_MAGIC, SNAPSHOT_VERSION, _BYTE_ORDER) \
+                or len(mapped) != _HEADER.size + count * 8 \
+                or (source_stamp is not None and (mtime_ns, size) != tuple(source_stamp)):
+            mapped.close()
+            return None
+        hashes = memoryview(mapped)[_HEADER.size:].cast('Q')
+        return cls(hashes, source=mapped)
+
+
+class DisposableDomains:
+    """Disposable-domain lookups backed by a (possibly very large) domain list file.
+
+    The text list is compiled once into a snapshot next to it and memory-mapped on
+    later starts. Lookups match the domain and each parent domain
+    (``x.mailinator.com``), and MX hosts are checked against glob patterns and the
+    list itself. When the list file changes, a background thread rebuilds the index
+    and swaps it in atomically; lookups never wait for a reload.
+    """
+
+    def __init__(self, domains_file: Optional[str] = None, snapshot_file: Optional[str] = None,
+                 builtin: Iterable[str] = (), mx_patterns: Iterable[str] = (),
+                 reload_interval: float = 60):
+        self.domains_file = domains_file
+        self.snapshot_file = snapshot_file or (f"{domains_file}.idx" if domains_file else None)
+        self.builtin: Set[str] = {d.lower() for d in builtin}
+        self.mx_patterns: List[str] = [p.lower() for p in mx_patterns]
+        self.reload_interval = reload_interval
+        self.index = DisposableDomainIndex.from_domains(())
+        self._source_stamp: Optional[Tuple[int, int]] = None
+        self._next_check = 0.0
+        self._reloading = threading.Lock()
+        self.reload()
+
+    def _source_stat(self) -> Optional[Tuple[int, int]]:
+        if not self.domains_file:
+            return None
+        try:
+            st = os.stat(self.domains_file)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def reload(self) -> bool:
+        """(Re)build the index from the list file; returns True when a new index was swapped in."""
+        if not self._reloading.acquire(blocking=False):
+            return False
+        try:
+            stamp = self._source_stat()
+            if stamp is None or stamp == self._source_stamp:
+                return False
+
+            index = None
+            if self.snapshot_file:
+                index = DisposableDomainIndex.load(self.snapshot_file, source_stamp=stamp)
+
+            if index is None:
+                index = DisposableDomainIndex.from_domains(_read_domain_list(self.domains_file))
+                if self.snapshot_file:
+                    try:
+                        index.save(self.snapshot_file, source_stamp=stamp)
+                        # serve from the mapping so memory is shared with other workers
+                        index = DisposableDomainIndex.load(self.snapshot_file) or index
+                    except OSError:
+                        pass
+
+            # single reference assignment: readers see the old or the new index, never a mix
+            self.index = index
+            self._source_stamp = stamp
+            return True
+        finally:
+            self._reloading.release()
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.reload_interval
+        stamp = self._source_stat()
+        if stamp is not None and stamp != self._source_stamp and not self._reloading.locked():
+            threading.Thread(target=self.reload, daemon=True).start()
+
+    def is_disposable_domain(self, domain: str) -> bool:
+        if self.reload_interval:
+            self._maybe_reload()
+
+        domain = domain.lower().rstrip('.')
+        index = self.index
+        labels = domain.split('.')
+        # the domain itself, then every parent with at least two labels
+        for i in range(len(labels) - 1):
+            candidate = '.'.join(labels[i:])
+            if candidate in self.builtin or candidate in index:
+                return True
+        return False
+
+    def is_disposable_mx(self, mx_hosts: Iterable[str]) -> bool:
+        for host in mx_hosts:
+            host = host.lower().rstrip('.')
+            if any(fnmatch.fnmatchcase(host, pattern) for pattern in self.mx_patterns):
+                return True
+            # MX hosted under a listed disposable domain (mx1.mailinator.com)
+            if self.is_disposable_domain(host):
+                return True
+        return False
+
+    def __len__(self) -> int:
+        return len(self.index) + len(self.builtin)
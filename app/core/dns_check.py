@@ -1,47 +1,163 @@
+import dns.exception
 import dns.resolver
 import dns.asyncresolver
-from typing import Tuple, List, Optional, Dict
+import dns.rdatatype
+from typing import Tuple, List, Optional, Dict, Any
 import asyncio
+import time
+from app.utils.helpers import SingleFlight
+
+# lookup outcomes
+OK = 'ok'
+NXDOMAIN = 'nxdomain'
+NO_ANSWER = 'no_answer'
+ERROR = 'error'
 
 
 class DNSChecker:
-    def __init__(self, dns_servers: List[str] = None):
-        self.resolver = dns.asyncresolver.Resolver()
-        if dns_servers:
+    """Async resolver front-end with an in-process TTL cache and request coalescing.
+
+    Answers are cached per (name, rdtype) for the record TTL; NXDOMAIN / NoAnswer are
+    cached for the negative TTL taken from the SOA in the authority section. Timeouts
+    and server failures are never cached and are reported as errors, not as a
+    missing domain. Concurrent lookups of the same (name, rdtype) share one query.
+    """
+
+    def __init__(self, dns_servers: List[str] = None, resolver=None, max_cache_entries: int = 50_000,
+                 default_negative_ttl: int = 300, max_ttl: int = 86400):
+        self.resolver = resolver or dns.asyncresolver.Resolver()
+        if dns_servers and resolver is None:
             self.resolver.nameservers = dns_servers
+        self.max_cache_entries = max_cache_entries
+        self.default_negative_ttl = default_negative_ttl
+        self.max_ttl = max_ttl
+        self._cache: Dict[Tuple[str, str], Tuple[float, str, Any]] = {}
+        self._flight = SingleFlight()
 
-    async def check_mx_records(self, domain: str) -> Tuple[bool, List[str]]:
+    def _cache_get(self, key: Tuple[str, str]) -> Optional[Tuple[str, Any]]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        expires_at, status, records = entry
+        if expires_at <= time.monotonic():
+            del self._cache[key]
+            return None
+        return status, records
 
+    def _cache_set(self, key: Tuple[str, str], status: str, records: Any, ttl: int):
+        ttl = min(ttl, self.max_ttl)
+        if ttl <= 0:
+            return
+        if len(self._cache) >= self.max_cache_entries:
+            # drop the oldest insertion; dicts keep insertion order
+            del self._cache[next(iter(self._cache))]
+        self._cache[key] = (time.monotonic() + ttl, status, records)
+
+    def _negative_ttl(self, responses) -> int:
+        """RFC 2308 negative TTL: min(SOA TTL, SOA MINIMUM) from the authority section."""
+        for response in responses:
+            for rrset in getattr(response, 'authority', []):
+                if rrset.rdtype == dns.rdatatype.SOA and len(rrset):
+                    return min(rrset.ttl, rrset[0].minimum)
+        return self.default_negative_ttl
+
+    async def _resolve(self, name: str, rdtype: str) -> Tuple[str, Any]:
+        key = (name, rdtype)
         try:
-            answers = await self.resolver.resolve(domain, 'MX')
-            mx_servers = [str(r.exchange).rstrip('.') for r in answers]
-            return True, mx_servers
-        except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN,
-                dns.resolver.NoNameservers, dns.resolver.Timeout):
+            answers = await self.resolver.resolve(name, rdtype)
+        except dns.resolver.NXDOMAIN as e:
+            self._cache_set(key, NXDOMAIN, None, self._negative_ttl(e.responses().values()))
+            return NXDOMAIN, None
+        except dns.resolver.NoAnswer as e:
+            self._cache_set(key, NO_ANSWER, None, self._negative_ttl([e.response()]))
+            return NO_ANSWER, None
+        except (dns.resolver.NoNameservers, dns.resolver.LifetimeTimeout, dns.exception.Timeout):
+            return ERROR, None
+        except Exception:
+            return ERROR, None
+
+        records = list(answers)
+        self._cache_set(key, OK, records, answers.rrset.ttl if answers.rrset is not None else 0)
+        return OK, records
+
+    async def lookup(self, name: str, rdtype: str) -> Tuple[str, Any]:
+        """Returns (status, records) where status is ok / nxdomain / no_answer / error."""
+        name = name.lower().rstrip('.')
+        cached = self._cache_get((name, rdtype))
+        if cached is not None:
+            return cached
+        return await self._flight.do((name, rdtype), lambda: self._resolve(name, rdtype))
+
+    @staticmethod
+    def _sorted_mx(records) -> List[str]:
+        # lowest preference first; name as a stable tie-breaker. A null MX entry has no name
+        ordered = sorted(records, key=lambda r: (r.preference, str(r.exchange)))
+        return [name for name in (str(r.exchange).rstrip('.') for r in ordered) if name]
+
+    @staticmethod
+    def _is_null_mx(records) -> bool:
+        # a null MX ("0 .", RFC 7505) as the only MX: the domain accepts no mail
+        return bool(records) and all(not str(r.exchange).rstrip('.') for r in records)
+
+    async def check_mx_records(self, domain: str) -> Tuple[bool, List[str]]:
+
+        status, records = await self.lookup(domain, 'MX')
+        if status != OK or self._is_null_mx(records):
             return False, []
+        return True, self._sorted_mx(records)
 
     async def check_domain_exists(self, domain: str) -> bool:
 
-        try:
-            await self.resolver.resolve(domain, 'A')
+        status, _ = await self.lookup(domain, 'A')
+        if status == OK:
             return True
-        except:
-            try:
-                await self.resolver.resolve(domain, 'AAAA')
-                return True
-            except:
-                return False
+        if status == NXDOMAIN:
+            return False
+        status, _ = await self.lookup(domain, 'AAAA')
+        return status == OK
 
     async def verify_domain(self, email: str) -> Dict[str, any]:
 
         domain = email.split('@')[1]
 
-        has_mx, mx_servers = await self.check_mx_records(domain)
-        domain_exists = await self.check_domain_exists(domain)
+        # A is fetched alongside MX so the fallback costs no extra round trip,
+        # but it is only waited on (and AAAA only asked) when MX doesn't settle it
+        mx_task = asyncio.ensure_future(self.lookup(domain, 'MX'))
+        a_task = asyncio.ensure_future(self.lookup(domain, 'A'))
+
+        mx_status, mx_records = await mx_task
+        if mx_status == OK and self._is_null_mx(mx_records):
+            # exists, but declares it takes no mail: no A-record fallback
+            a_task.cancel()
+            return {
+                'has_mx_records': False,
+                'mx_servers': [],
+                'domain_exists': True,
+                'is_valid_domain': False,
+                'null_mx': True,
+                'dns_error': False
+            }
+        mx_servers = self._sorted_mx(mx_records) if mx_status == OK else []
+
+        if mx_servers or mx_status == NXDOMAIN:
+            a_task.cancel()
+            domain_exists = bool(mx_servers)
+            dns_error = False
+        else:
+            statuses = [mx_status]
+            a_status, _ = await a_task
+            statuses.append(a_status)
+            if a_status not in (OK, NXDOMAIN):
+                aaaa_status, _ = await self.lookup(domain, 'AAAA')
+                statuses.append(aaaa_status)
+            domain_exists = OK in statuses[1:]
+            dns_error = not domain_exists and ERROR in statuses
 
         return {
-            'has_mx_records': has_mx,
+            'has_mx_records': bool(mx_servers),
             'mx_servers': mx_servers,
             'domain_exists': domain_exists,
-            'is_valid_domain': has_mx or domain_exists
-        }
\ No newline at end of file
+            'is_valid_domain': bool(mx_servers) or domain_exists,
+            # lookups failed (timeout / SERVFAIL): the domain may well exist
+            'dns_error': dns_error
+        }
@@ -0,0 +1,413 @@
+# app/core/file_runner.py
+"""Offline verification of large CSV / text files across worker processes.
+
+The parent process streams the input (csv.reader over a buffered file, never
+loaded whole), groups rows into ``shards`` by a hash of the domain and cuts each
+shard into chunks of ``chunk_size`` rows. A chunk goes to worker process
+``shard % processes``, so a domain always lands in the same process: its MX,
+catch-all verdict, SMTP sessions and L1 cache entries are reused instead of
+being rebuilt in every process. Each worker runs its own ``EmailVerifier`` event
+loop with ``in_flight`` chunks verified at once and sends back formatted output.
+
+The parent appends finished chunks to the output and periodically records a
+checkpoint: which chunk ids are written (a low watermark plus the few finished
+above it) and the output size they add up to. Chunking is deterministic for a given input,
+shard count and chunk size, so a resumed run truncates the output to the
+recorded size, re-reads the input and skips every chunk already written.
+"""
+import csv
+import io
+import json
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import time
+import zlib
+from collections import deque
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from app.utils.serialization import dumps
+
+CHECKPOINT_VERSION = 1
+CSV_COLUMNS = ('row', 'email', 'status', 'quality_score', 'is_verified', 'depth', 'syntax_valid',
+               'is_disposable', 'is_role_account', 'domain_verified', 'smtp_verified', 'is_catch_all', 'error')
+
+Row = Tuple[int, str]
+
+
+def read_rows(path: str, column: Optional[str] = None) -> Iterator[Row]:
+    """(row number, address) for every data row of ``path``. ``.csv``/``.tsv`` files
+    are parsed as such, with the address in ``column`` (a header name or a 0-based
+    index; default: the first header containing "email", else the first column).
+    Anything else is read as one address per line. Rows are numbered from 1,
+    not counting the header."""
+    delimiter = {'.csv': ',', '.tsv': '\t'}.get(os.path.splitext(path)[1].lower())
+    with open(path, newline='', encoding='utf-8', errors='replace') as f:
+        if delimiter is None:
+            for number, line in enumerate(f, 1):
+                yield number, line.strip()
+            return
+
+        reader = csv.reader(f, delimiter=delimiter)
+        first = next(reader, None)
+        if first is None:
+            return
+        index, has_header = _email_column(first, column)
+        if not has_header:
+            yield 1, first[index].strip() if index < len(first) else ''
+        for number, record in enumerate(reader, 1 + (not has_header)):
+            yield number, record[index].strip() if index < len(record) else ''
+
+
+def _email_column(first: List[str], column: Optional[str]) -> Tuple[int, bool]:
+    """(index of the address column, whether ``first`` is a header)."""
+    names = [cell.strip().lower() for cell in first]
+    if column is not None and column.isdigit():
+        index = int(column)
+        return index, index < len(first) and '@' not in first[index]
+    if column is not None:
+        if column.lower() not in names:
+            raise ValueError(f'column {column!r} not in header {first}')
+        return names.index(column.lower()), True
+    for index, name in enumerate(names):
+        if 'email' in name:
+            return index, True
+    return 0, bool(first) and '@' not in first[0]
+
+
+def count_rows(path: str, block_size: int = 1 << 20) -> int:
+    """Approximate data rows (newlines) of ``path``, read in blocks."""
+    lines = 0
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            lines += block.count(b'\n')
+    return lines
+
+
+def shard_of(email: str, shards: int) -> int:
+    domain = email.rsplit('@', 1)[-1].strip().lower()
+    return zlib.crc32(domain.encode()) % shards
+
+
+def chunk_rows(rows: Iterator[Row], shards: int, chunk_size: int) -> Iterator[Tuple[int, int, List[Row]]]:
+    """(chunk id, shard, rows): each shard's rows cut into chunks as they fill up,
+    the partial ones flushed at the end. Blank rows are left out."""
+    buffers: List[List[Row]] = [[] for _ in range(shards)]
+    chunk_id = 0
+    for row in rows:
+        if not row[1]:
+            continue
+        shard = shard_of(row[1], shards)
+        buffer = buffers[shard]
+        buffer.append(row)
+        if len(buffer) >= chunk_size:
+            yield chunk_id, shard, buffer
+            chunk_id += 1
+            buffers[shard] = []
+    for shard, buffer in enumerate(buffers):
+        if buffer:
+            yield chunk_id, shard, buffer
+            chunk_id += 1
+
+
+def format_results(rows: List[Row], results, fmt: str) -> bytes:
+    if fmt == 'jsonl':
+        return b''.join(dumps(dict(result.dict(), row=row)) + b'\n' for (row, _), result in zip(rows, results))
+    out = io.StringIO()
+    writer = csv.writer(out)
+    for (row, email), result in zip(rows, results):
+        details = result.details
+        writer.writerow((row, email, result.status, result.quality_score, int(result.is_verified),
+                         details.get('depth', ''),
+                         *(int(bool(details.get(name))) for name in CSV_COLUMNS[6:12]),
+                         details.get('error', '')))
+    return out.getvalue().encode()
+
+
+def _worker(inbox, outbox, options: dict):
+    # Ctrl-C is handled by the parent, which saves the checkpoint and stops the workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    import asyncio
+    asyncio.run(_work(inbox, outbox, options))
+
+
+async def _work(inbox, outbox, options: dict):
+    import asyncio
+    from app.core.admission import BACKGROUND
+    from app.core.verifier import EmailVerifier
+
+    verifier = EmailVerifier()
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(options['in_flight'])
+    tasks: Set[asyncio.Task] = set()
+
+    async def verify(chunk_id: int, rows: List[Row]):
+        try:
+            # offline work: background class, never shed by admission control
+            results = await verifier.verify_bulk([email for _, email in rows], priority=BACKGROUND,
+                                                 depth=options['depth'])
+            counts: Dict[str, int] = {}
+            for result in results:
+                counts[result.status] = counts.get(result.status, 0) + 1
+            outbox.put((chunk_id, format_results(rows, results, options['format']), counts, None))
+        except Exception as e:
+            outbox.put((chunk_id, None, None, f'{type(e).__name__}: {e}'))
+        finally:
+            slots.release()
+
+    while True:
+        await slots.acquire()
+        item = await loop.run_in_executor(None, inbox.get)
+        if item is None:
+            break
+        task = asyncio.ensure_future(verify(*item))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    await asyncio.gather(*tasks)
+    await verifier.refresher.stop()
+    await verifier.cache.close()
+
+
+class Checkpoint:
+    """Which chunks of a run are written, and how much of the output that is."""
+
+    def __init__(self, path: str, settings: dict):
+        self.path = path
+        self.settings = settings
+        self.output_bytes = 0
+        self.done_below = 0
+        self.done_above: Set[int] = set()
+        self.rows_done = 0
+        self.counts: Dict[str, int] = {}
+        self.finished = False
+
+    def __contains__(self, chunk_id: int) -> bool:
+        return chunk_id < self.done_below or chunk_id in self.done_above
+
+    def mark(self, chunk_id: int, rows: int, size: int, counts: Dict[str, int]):
+        """Record ``chunk_id`` as written: ``rows`` rows, ``size`` bytes of output."""
+        self.output_bytes += size
+        self.done_above.add(chunk_id)
+        while self.done_below in self.done_above:
+            self.done_above.remove(self.done_below)
+            self.done_below += 1
+        self.rows_done += rows
+        for status, count in counts.items():
+            self.counts[status] = self.counts.get(status, 0) + count
+
+    def load(self) -> bool:
+        """Resume from the file; False when there is none. Raises ``ValueError`` when
+        it belongs to a different input or chunking."""
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return False
+        if data.get('version') != CHECKPOINT_VERSION or data.get('settings') != self.settings:
+            raise ValueError(f'{self.path} was written for another input or settings: {data.get("settings")}')
+        self.output_bytes = data['output_bytes']
+        self.done_below = data['done_below']
+        self.done_above = set(data['done_above'])
+        self.rows_done = data['rows_done']
+        self.counts = data['counts']
+        self.finished = data['finished']
+        return True
+
+    def save(self):
+        data = {
+            'version': CHECKPOINT_VERSION, 'settings': self.settings, 'output_bytes': self.output_bytes,
+            'done_below': self.done_below, 'done_above': sorted(self.done_above), 'rows_done': self.rows_done,
+            'counts': self.counts, 'finished': self.finished,
+        }
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, self.path)
+
+
+class FileRunner:
+    """Verifies ``input_path`` into ``output_path`` with ``processes`` worker
+    processes, resuming from ``output_path + '.checkpoint'`` when it exists."""
+
+    def __init__(self, input_path: str, output_path: str, processes: int, column: Optional[str] = None,
+                 depth: str = 'full', shards: int = 64, chunk_size: int = 1000, in_flight: int = 8,
+                 checkpoint_interval: float = 5, progress_interval: float = 2, restart: bool = False,
+                 log=sys.stderr):
+        self.input_path = input_path
+        self.output_path = output_path
+        self.processes = max(1, processes)
+        self.column = column
+        self.shards = shards
+        self.chunk_size = chunk_size
+        self.in_flight = in_flight
+        self.checkpoint_interval = checkpoint_interval
+        self.progress_interval = progress_interval
+        self.restart = restart
+        self.log = log
+        self.format = 'jsonl' if output_path.endswith(('.jsonl', '.ndjson')) else 'csv'
+        self.options = {'depth': depth, 'format': self.format, 'in_flight': in_flight}
+        stat = os.stat(input_path)
+        self.checkpoint = Checkpoint(output_path + '.checkpoint', {
+            'input': os.path.abspath(input_path), 'input_bytes': stat.st_size, 'column': column,
+            'shards': shards, 'chunk_size': chunk_size, 'depth': depth, 'format': self.format,
+        })
+        self._pending: Dict[int, int] = {}  # chunk id -> rows, sent and not written yet
+        self._output = None
+        self._workers: List[multiprocessing.Process] = []
+        self._inboxes: list = []
+        self._outbox = None
+        self._total_rows = 0
+        self._started = 0.0
+        self._rows_at_start = 0
+        self._rates: deque = deque(maxlen=30)
+        self._last_progress = 0.0
+        self._last_checkpoint = 0.0
+
+    def run(self) -> Dict[str, int]:
+        """Verify the whole file; returns the status counts. On Ctrl-C / SIGTERM the
+        checkpoint is saved and ``KeyboardInterrupt`` propagates."""
+        resumed = not self.restart and self.checkpoint.load()
+        if resumed and self.checkpoint.finished:
+            self._print(f'{self.output_path} is already complete ({self.checkpoint.rows_done:,} rows); '
+                        f'use --restart to verify again')
+            return self.checkpoint.counts
+        if not resumed:
+            self.checkpoint = Checkpoint(self.checkpoint.path, self.checkpoint.settings)
+
+        self._open_output()
+        self._total_rows = count_rows(self.input_path)
+        self._started = self._last_checkpoint = time.monotonic()
+        self._rows_at_start = self.checkpoint.rows_done
+        if resumed:
+            self._print(f'resuming: {self.checkpoint.rows_done:,} rows already written')
+
+        previous = signal.signal(signal.SIGTERM, _interrupt)
+        self._start_workers()
+        try:
+            for chunk_id, shard, rows in chunk_rows(read_rows(self.input_path, self.column),
+                                                    self.shards, self.chunk_size):
+                if chunk_id in self.checkpoint:
+                    continue
+                self._send(shard % self.processes, chunk_id, rows)
+            for inbox in self._inboxes:
+                inbox.put(None)
+            while self._pending:
+                self._collect(timeout=0.5)
+            self.checkpoint.finished = True
+        finally:
+            self._stop_workers()
+            self._save()
+            self._output.close()
+            signal.signal(signal.SIGTERM, previous)
+        self._report(final=True)
+        return self.checkpoint.counts
+
+    def _open_output(self):
+        mode = 'r+b' if os.path.exists(self.output_path) else 'w+b'
+        self._output = open(self.output_path, mode)
+        # drop whatever was written after the last checkpoint: those chunks run again
+        self._output.truncate(self.checkpoint.output_bytes)
+        self._output.seek(self.checkpoint.output_bytes)
+        if not self.checkpoint.output_bytes and self.format == 'csv':
+            self.checkpoint.output_bytes = self._output.write((','.join(CSV_COLUMNS) + '\r\n').encode())
+
+    def _start_workers(self):
+        self._outbox = multiprocessing.Queue()
+        for _ in range(self.processes):
+            inbox = multiprocessing.Queue(maxsize=self.in_flight)
+            # never wait at exit for chunks still buffered for a worker: once it is terminated the
+            # feeder thread blocks on the dead pipe forever. Set up front, so a second Ctrl-C
+            # arriving while the workers are stopped can't skip it
+            inbox.cancel_join_thread()
+            process = multiprocessing.Process(target=_worker, args=(inbox, self._outbox, self.options), daemon=True)
+            process.start()
+            self._inboxes.append(inbox)
+            self._workers.append(process)
+
+    def _stop_workers(self):
+        for process in self._workers:
+            if process.is_alive():
+                process.terminate()
+        for process in self._workers:
+            process.join(timeout=5)
+
+    def _send(self, worker: int, chunk_id: int, rows: List[Row]):
+        self._pending[chunk_id] = len(rows)
+        while True:
+            try:
+                # bounded inbox: reading the input waits for slow workers
+                self._inboxes[worker].put((chunk_id, rows), timeout=0.2)
+                return
+            except queue.Full:
+                self._collect(timeout=0)
+
+    def _collect(self, timeout: float):
+        """Write every chunk result that has arrived (waiting up to ``timeout``)."""
+        while True:
+            try:
+                chunk_id, data, counts, error = self._outbox.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if error is not None:
+                raise RuntimeError(f'chunk {chunk_id} failed in a worker: {error}')
+            # written before it is marked: bytes past the marked total are dropped on resume
+            self._output.write(data)
+            self.checkpoint.mark(chunk_id, self._pending.pop(chunk_id), len(data), counts)
+            timeout = 0
+        dead = [process for process in self._workers if process.exitcode not in (None, 0)]
+        if dead:
+            raise RuntimeError(f'worker process exited with code {dead[0].exitcode}')
+
+        now = time.monotonic()
+        if now - self._last_checkpoint >= self.checkpoint_interval:
+            self._save()
+            self._last_checkpoint = now
+        if now - self._last_progress >= self.progress_interval:
+            self._report()
+            self._last_progress = now
+
+    def _save(self):
+        # output_bytes counts marked chunks only, not whatever was written after them
+        self._output.flush()
+        os.fsync(self._output.fileno())
+        self.checkpoint.save()
+
+    def _report(self, final: bool = False):
+        now = time.monotonic()
+        done = self.checkpoint.rows_done
+        self._rates.append((now, done))
+        # recent throughput: rows written over the last ~30 reports
+        since, done_then = self._rates[0]
+        rate = (done - done_then) / (now - since) if now > since else 0.0
+        if final or rate <= 0:
+            rate = (done - self._rows_at_start) / max(now - self._started, 1e-9)
+        total = max(self._total_rows, done)
+        line = f'{done:,}/{total:,} rows ({done / total * 100 if total else 100:.1f}%)  {rate:,.0f} rows/s'
+        if not final and rate > 0:
+            line += f'  ETA {_duration((total - done) / rate)}'
+        if final:
+            line += f'  in {_duration(now - self._started)}'
+        statuses = '  '.join(f'{status} {count:,}' for status, count in sorted(self.checkpoint.counts.items()))
+        self._print(f'{line}  [{statuses}]')
+
+    def _print(self, line: str):
+        print(line, file=self.log, flush=True)
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def _duration(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f'{seconds // 3600}h{seconds % 3600 // 60:02d}m'
+    if seconds >= 60:
+        return f'{seconds // 60}m{seconds % 60:02d}s'
+    return f'{seconds}s'
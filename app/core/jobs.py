@@ -0,0 +1,307 @@
+# app/core/jobs.py
+import asyncio
+import json
+import os
+import socket
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from app.core.admission import BACKGROUND
+from app.models.jobs import JobStatus
+
+JOB_KEY_PREFIX = "job:"
+WORK_STREAM = "jobs:work"
+WORK_GROUP = "jobs:workers"
+
+# Sets the job's status to ARGV[1] only while it is one of ARGV[3..], so a cancel is
+# never overwritten by a worker moving the job along. Returns 1 when it moved.
+_TRANSITION_LUA = """
+local status = redis.call('HGET', KEYS[1], 'status')
+for i = 3, #ARGV do
+    if status == ARGV[i] then
+        redis.call('HSET', KEYS[1], 'status', ARGV[1], 'updated_at', ARGV[2])
+        return 1
+    end
+end
+return 0
+"""
+
+
+class JobManager:
+    """Redis-backed bulk jobs.
+
+    A job is a hash ``job:<id>`` (status and counters) plus a hash
+    ``job:<id>:results`` mapping input position to the JSON result. Work items go
+    into one Redis stream read through a consumer group, so any number of worker
+    pools on any number of nodes can share the load.
+    """
+
+    def __init__(self, redis_client, stream: str = WORK_STREAM, group: str = WORK_GROUP,
+                 result_ttl: int = 7 * 86400):
+        self.redis = redis_client
+        self.stream = stream
+        self.group = group
+        self.result_ttl = result_ttl
+        self._transition = redis_client.register_script(_TRANSITION_LUA)
+
+    @staticmethod
+    def _meta_key(job_id: str) -> str:
+        return JOB_KEY_PREFIX + job_id
+
+    @staticmethod
+    def _results_key(job_id: str) -> str:
+        return JOB_KEY_PREFIX + job_id + ":results"
+
+    @staticmethod
+    def _attempts_key(job_id: str) -> str:
+        return JOB_KEY_PREFIX + job_id + ":attempts"
+
+    async def ensure_group(self):
+        try:
+            await self.redis.xgroup_create(self.stream, self.group, id='0', mkstream=True)
+        except Exception as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+
+    async def submit(self, emails: List[str], chunk_size: int = 1000) -> str:
+        await self.ensure_group()
+
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        await self.redis.hset(self._meta_key(job_id), mapping={
+            'status': JobStatus.QUEUED.value,
+            'total': len(emails),
+            'processed': 0,
+            'valid': 0,
+            'created_at': now,
+            'updated_at': now,
+        })
+
+        for i in range(0, len(emails), chunk_size):
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for index, email in enumerate(emails[i:i + chunk_size], start=i):
+                    pipe.xadd(self.stream, {'job': job_id, 'idx': index, 'email': email})
+                await pipe.execute()
+
+        if not emails:
+            await self._finish(job_id, JobStatus.COMPLETED, JobStatus.QUEUED)
+        return job_id
+
+    async def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        meta = await self.redis.hgetall(self._meta_key(job_id))
+        if not meta:
+            return None
+
+        total = int(meta.get('total', 0))
+        processed = int(meta.get('processed', 0))
+        return {
+            'job_id': job_id,
+            'status': meta.get('status'),
+            'total': total,
+            'processed': processed,
+            'valid_count': int(meta.get('valid', 0)),
+            'progress': round(processed / total, 4) if total else 1.0,
+            'created_at': float(meta.get('created_at', 0)),
+            'updated_at': float(meta.get('updated_at', 0)),
+        }
+
+    async def results(self, job_id: str, offset: int = 0, limit: int = 100) -> List[Optional[Dict[str, Any]]]:
+        """Results in input order; positions not yet verified come back as None."""
+        total = int(await self.redis.hget(self._meta_key(job_id), 'total') or 0)
+        indexes = list(range(offset, min(offset + limit, total)))
+        if not indexes:
+            return []
+        values = await self.redis.hmget(self._results_key(job_id), indexes)
+        return [json.loads(v) if v else None for v in values]
+
+    async def cancel(self, job_id: str) -> bool:
+        status = await self.redis.hget(self._meta_key(job_id), 'status')
+        if status is None:
+            return False
+        # queued items are acknowledged and dropped by the workers as they come up
+        await self._finish(job_id, JobStatus.CANCELLED, JobStatus.QUEUED, JobStatus.RUNNING)
+        return True
+
+    async def job_status(self, job_id: str) -> Optional[str]:
+        return await self.redis.hget(self._meta_key(job_id), 'status')
+
+    async def record_result(self, job_id: str, index: int, result: Dict[str, Any]) -> bool:
+        """Store one result; counters move only the first time a position is written,
+        so a redelivered item can never be counted twice."""
+        stored = await self.redis.hsetnx(self._results_key(job_id), index, json.dumps(result))
+        if not stored:
+            return False
+
+        meta_key = self._meta_key(job_id)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.hincrby(meta_key, 'processed', 1)
+            pipe.hincrby(meta_key, 'valid', 1 if result.get('is_verified') else 0)
+            pipe.hset(meta_key, 'updated_at', time.time())
+            pipe.hget(meta_key, 'total')
+            pipe.hget(meta_key, 'status')
+            processed, _, _, total, status = await pipe.execute()
+
+        if status == JobStatus.QUEUED.value:
+            await self._move(job_id, JobStatus.RUNNING, JobStatus.QUEUED)
+        if status in (JobStatus.QUEUED.value, JobStatus.RUNNING.value) and processed >= int(total or 0):
+            await self._finish(job_id, JobStatus.COMPLETED, JobStatus.QUEUED, JobStatus.RUNNING)
+        return True
+
+    async def record_attempt(self, job_id: str, index: int) -> int:
+        return await self.redis.hincrby(self._attempts_key(job_id), index, 1)
+
+    async def _move(self, job_id: str, status: JobStatus, *current: JobStatus) -> bool:
+        """Atomically set ``status`` if the job is still in one of ``current``."""
+        moved = await self._transition(keys=[self._meta_key(job_id)],
+                                       args=[status.value, time.time(), *(c.value for c in current)])
+        return bool(int(moved))
+
+    async def _finish(self, job_id: str, status: JobStatus, *current: JobStatus):
+        if not await self._move(job_id, status, *current):
+            # already finished (or cancelled) by someone else
+            return
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.expire(self._meta_key(job_id), self.result_ttl)
+            pipe.expire(self._results_key(job_id), self.result_ttl)
+            pipe.delete(self._attempts_key(job_id))
+            await pipe.execute()
+
+
+class JobWorkerPool:
+    """Pool of coroutines consuming the job stream with a shared ``EmailVerifier``.
+
+    Items are acknowledged only after their result is stored. On start the pool
+    replays its own unacknowledged items: pass a ``consumer`` name that is stable
+    across restarts and unique per process for that. Without one, the name is unique
+    to this pool, so pools sharing a host never replay each other's work in flight.
+    It periodically claims items other consumers left idle for longer than
+    ``claim_idle_ms``, which is how a crashed unnamed pool's items get finished. An item delivered more than ``max_attempts`` times is
+    recorded as an error instead of being retried forever.
+    """
+
+    def __init__(self, manager: JobManager, verifier, workers: int = 4, batch_size: int = 50,
+                 consumer: Optional[str] = None, claim_idle_ms: int = 5 * 60 * 1000,
+                 max_attempts: int = 3, block_ms: int = 1000):
+        self.manager = manager
+        self.verifier = verifier
+        self.workers = workers
+        self.batch_size = batch_size
+        self._named = consumer is not None
+        self.consumer = consumer or f'{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}'
+        self.claim_idle_ms = claim_idle_ms
+        self.max_attempts = max_attempts
+        self.block_ms = block_ms
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = False
+
+    async def start(self):
+        await self.manager.ensure_group()
+        self._stopping = False
+        # items this consumer read before a crash/restart but never acknowledged
+        await self._replay_pending()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._reclaim()))
+
+    async def stop(self):
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if not self._named:
+            # the name is never used again: drop it from the group unless it still owns items
+            try:
+                redis = self.manager.redis
+                if not await redis.xpending_range(self.manager.stream, self.manager.group, '-', '+', 1,
+                                                  consumername=self.consumer):
+                    await redis.xgroup_delconsumer(self.manager.stream, self.manager.group, self.consumer)
+            except Exception:
+                pass
+
+    async def _replay_pending(self):
+        redis = self.manager.redis
+        while True:
+            response = await redis.xreadgroup(self.manager.group, self.consumer,
+                                              {self.manager.stream: '0'}, count=self.batch_size)
+            entries = response[0][1] if response else []
+            if not entries:
+                return
+            await self._process(entries)
+
+    async def _work(self):
+        redis = self.manager.redis
+        while not self._stopping:
+            try:
+                response = await redis.xreadgroup(self.manager.group, self.consumer,
+                                                  {self.manager.stream: '>'},
+                                                  count=self.batch_size, block=self.block_ms)
+                for _, entries in response or []:
+                    await self._process(entries)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Redis hiccup: back off and keep the worker alive
+                await asyncio.sleep(1)
+
+    async def _reclaim(self):
+        redis = self.manager.redis
+        while not self._stopping:
+            await asyncio.sleep(self.claim_idle_ms / 1000 / 2)
+            try:
+                start = '0-0'
+                while True:
+                    start, entries, *_ = await redis.xautoclaim(
+                        self.manager.stream, self.manager.group, self.consumer,
+                        min_idle_time=self.claim_idle_ms, start_id=start, count=self.batch_size
+                    )
+                    entries = [e for e in entries if e and e[1]]
+                    if entries:
+                        await self._process(entries)
+                    if start in ('0-0', b'0-0'):
+                        break
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                continue
+
+    async def _process(self, entries):
+        manager = self.manager
+        work = []
+        done_ids = []
+        statuses: Dict[str, Optional[str]] = {}
+
+        for entry_id, fields in entries:
+            if not fields:
+                # entry deleted from the stream while pending
+                done_ids.append(entry_id)
+                continue
+            job_id, index, email = fields['job'], int(fields['idx']), fields['email']
+            if job_id not in statuses:
+                statuses[job_id] = await manager.job_status(job_id)
+            if statuses[job_id] not in (JobStatus.QUEUED.value, JobStatus.RUNNING.value):
+                # cancelled, finished or expired job
+                done_ids.append(entry_id)
+                continue
+
+            if await manager.record_attempt(job_id, index) > self.max_attempts:
+                await manager.record_result(job_id, index, {
+                    'email': email, 'status': 'unknown', 'quality_score': 0,
+                    'details': {'error': 'max_attempts_exceeded'}, 'is_verified': False
+                })
+                done_ids.append(entry_id)
+                continue
+            work.append((entry_id, job_id, index, email))
+
+        if work:
+            # queued jobs are already durable: lowest priority, never shed
+            results = await self.verifier.verify_bulk([email for _, _, _, email in work], priority=BACKGROUND)
+            for (entry_id, job_id, index, _), result in zip(work, results):
+                await manager.record_result(job_id, index, result.dict())
+                done_ids.append(entry_id)
+
+        if done_ids:
+            async with manager.redis.pipeline(transaction=False) as pipe:
+                pipe.xack(manager.stream, manager.group, *done_ids)
+                pipe.xdel(manager.stream, *done_ids)
+                await pipe.execute()
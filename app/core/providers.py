@@ -0,0 +1,76 @@
+# app/core/providers.py
+import fnmatch
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+
+
+class ProviderPolicy(NamedTuple):
+    name: str
+    mx_patterns: Tuple[str, ...]
+    # SMTP sessions per minute against the whole provider
+    max_calls: int
+    # sessions the provider may have open at once
+    concurrency: int
+
+
+class ProviderClassifier:
+    """Maps a recipient domain to the mail infrastructure that receives its mail.
+
+    Throttling is decided by the MX hosts, not by the recipient domain: thousands of
+    Google Workspace domains all land on ``aspmx.l.google.com``. A domain with an
+    MX host matching a policy pattern gets that provider's bucket
+    (``provider:google``); any other domain is bucketed by its primary MX host
+    (``mx:mail.example.com``), so domains sharing a self-hosted or smaller
+    provider's MX share its budget too. Results are cached per MX host set, which
+    many domains share and which stays correct when a domain's MX changes.
+    """
+
+    def __init__(self, policies: Iterable[ProviderPolicy] = (), default_max_calls: int = 60,
+                 default_concurrency: int = 5, max_cache_entries: int = 100_000):
+        self.policies: List[ProviderPolicy] = list(policies)
+        self.default_max_calls = default_max_calls
+        self.default_concurrency = default_concurrency
+        self.max_cache_entries = max_cache_entries
+        self._cache: Dict[Tuple[str, ...], Tuple[str, Optional[ProviderPolicy]]] = {}
+
+    @classmethod
+    def from_config(cls, table: Mapping[str, Mapping], **kwargs) -> 'ProviderClassifier':
+        policies = [
+            ProviderPolicy(name, tuple(p.lower() for p in spec['mx']), spec['max_calls'], spec['concurrency'])
+            for name, spec in table.items()
+        ]
+        return cls(policies, **kwargs)
+
+    def _match(self, mx_servers: List[str]) -> Tuple[str, Optional[ProviderPolicy]]:
+        hosts = [host.lower().rstrip('.') for host in mx_servers]
+        for host in hosts:
+            for policy in self.policies:
+                if any(fnmatch.fnmatchcase(host, pattern) for pattern in policy.mx_patterns):
+                    return 'provider:' + policy.name, policy
+        return 'mx:' + hosts[0], None
+
+    def classify(self, domain: str, mx_servers: List[str]) -> Tuple[str, Optional[ProviderPolicy]]:
+        """Returns (bucket key, matched policy or None for the defaults)."""
+        if not mx_servers:
+            return domain, None
+        key = tuple(mx_servers)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+
+        bucket = self._match(mx_servers)
+        if len(self._cache) >= self.max_cache_entries:
+            # drop the oldest insertion; dicts keep insertion order
+            del self._cache[next(iter(self._cache))]
+        self._cache[key] = bucket
+        return bucket
+
+    def provider_name(self, host: str) -> str:
+        """Provider of a single MX host, or 'other'; a bounded label for metrics."""
+        key, policy = self.classify(host, [host])
+        return policy.name if policy is not None else 'other'
+
+    def limits(self, policy: Optional[ProviderPolicy]) -> Tuple[int, int]:
+        """(max calls per minute, concurrency) for a bucket."""
+        if policy is None:
+            return self.default_max_calls, self.default_concurrency
+        return policy.max_calls, policy.concurrency
@@ -1,6 +1,8 @@
 # app/core/rate_limiter.py
 import asyncio
+import itertools
 import time
+import uuid
 from collections import deque
 from typing import Dict
 
@@ -39,3 +41,123 @@ class DomainRateLimiter:
                 wait_time = (dq[0] + self.window_seconds) - now
 
             await asyncio.sleep(wait_time if wait_time > 0 else 0.05)
+
+
+# Sliding window over a sorted set of grant timestamps. Grants up to ARGV[4] calls
+# at once and returns {granted, ms until the oldest grant leaves the window}.
+_SLIDING_WINDOW_LUA = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local max_calls = tonumber(ARGV[3])
+local want = tonumber(ARGV[4])
+local member = ARGV[5]
+
+redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+local used = redis.call('ZCARD', key)
+local granted = math.min(want, max_calls - used)
+if granted > 0 then
+    for i = 1, granted do
+        redis.call('ZADD', key, now, member .. ':' .. i)
+    end
+    redis.call('PEXPIRE', key, window)
+    return {granted, 0}
+end
+
+local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+local wait = window
+if oldest[2] then
+    wait = tonumber(oldest[2]) + window - now
+end
+return {0, wait}
+"""
+
+
+class RedisRateLimiter:
+    """Per-domain sliding-window limiter shared by every process using the same Redis.
+
+    Same ``acquire(domain, max_calls)`` interface as ``DomainRateLimiter``; the window
+    check and the grant happen atomically in one Lua script. With ``prefetch`` > 1 a
+    call reserves several grants and later calls in this process spend them without a
+    round trip; unused grants are dropped after ``prefetch_ttl`` seconds, so a node
+    can run at most ``prefetch`` calls ahead of the shared window.
+
+    When Redis is unreachable the process falls back to an in-memory limiter and
+    retries Redis after ``retry_interval`` seconds.
+    """
+
+    def __init__(self, redis_client, default_max_calls: int = 60, window_seconds: int = 60,
+                 prefetch: int = 1, prefetch_ttl: float = 1.0, key_prefix: str = "ratelimit:",
+                 retry_interval: float = 5.0, fallback: DomainRateLimiter = None):
+        self.redis = redis_client
+        self.default_max_calls = default_max_calls
+        self.window_seconds = window_seconds
+        self.prefetch = max(1, prefetch)
+        self.prefetch_ttl = prefetch_ttl
+        self.key_prefix = key_prefix
+        self.retry_interval = retry_interval
+        self.fallback = fallback or DomainRateLimiter(default_max_calls, window_seconds)
+        self._script = redis_client.register_script(_SLIDING_WINDOW_LUA)
+        self._node = uuid.uuid4().hex
+        self._seq = itertools.count()
+        # domain -> [grants left, expires at]
+        self._tokens: Dict[str, list] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._redis_down_until = 0.0
+
+    def _take_local(self, domain: str) -> bool:
+        tokens = self._tokens.get(domain)
+        if tokens is None:
+            return False
+        if tokens[1] <= time.monotonic():
+            del self._tokens[domain]
+            return False
+        tokens[0] -= 1
+        if not tokens[0]:
+            del self._tokens[domain]
+        return True
+
+    def _batch_size(self, max_calls: int) -> int:
+        # never reserve more than a tenth of a domain's budget ahead of time
+        return max(1, min(self.prefetch, max_calls // 10))
+
+    async def acquire(self, domain: str, max_calls: int = None):
+
+        if max_calls is None:
+            max_calls = self.default_max_calls
+
+        if self._take_local(domain):
+            return
+
+        lock = self._locks.get(domain)
+        if lock is None:
+            lock = self._locks[domain] = asyncio.Lock()
+
+        while True:
+            if time.monotonic() < self._redis_down_until:
+                await self.fallback.acquire(domain, max_calls=max_calls)
+                return
+
+            async with lock:
+                # another waiter may have refilled while we queued on the lock
+                if self._take_local(domain):
+                    return
+                want = self._batch_size(max_calls)
+                try:
+                    granted, wait_ms = await self._script(
+                        keys=[self.key_prefix + domain],
+                        args=[int(time.time() * 1000), self.window_seconds * 1000, max_calls, want,
+                              f"{self._node}:{next(self._seq)}"]
+                    )
+                except Exception:
+                    self._redis_down_until = time.monotonic() + self.retry_interval
+                    continue
+
+                granted = int(granted)
+                if granted:
+                    if granted > 1:
+                        self._tokens[domain] = [granted - 1, time.monotonic() + self.prefetch_ttl]
+                    return
+
+            wait = int(wait_ms) / 1000
+            await asyncio.sleep(wait if wait > 0 else 0.05)
@@ -0,0 +1,71 @@
+# app/core/refresher.py
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Set
+
+
+class RefreshQueue:
+    """Re-verifies stale cached results in the background.
+
+    ``schedule`` never waits: an address already queued or being refreshed is
+    ignored, and when ``max_pending`` addresses are waiting further requests are
+    dropped (the next stale read asks again). A fixed number of ``workers`` drain
+    the queue, so refreshes can't crowd out live traffic however many stale hits
+    arrive at once. Workers start with the first scheduled refresh.
+    """
+
+    def __init__(self, refresh: Callable[[str], Awaitable[object]], workers: int = 4, max_pending: int = 10_000):
+        self.refresh = refresh
+        self.workers = workers
+        self.max_pending = max_pending
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._pending: Set[str] = set()
+        self._tasks: List[asyncio.Task] = []
+        self.queued = 0
+        self.dropped = 0
+        self.completed = 0
+        self.failed = 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def schedule(self, email: str) -> bool:
+        """Queue a refresh of ``email``; False when it was already pending or the queue is full."""
+        if email in self._pending:
+            return False
+        if self._queue.qsize() >= self.max_pending:
+            self.dropped += 1
+            return False
+        if not self._tasks:
+            self._tasks = [asyncio.ensure_future(self._work()) for _ in range(self.workers)]
+        self._pending.add(email)
+        self._queue.put_nowait(email)
+        self.queued += 1
+        return True
+
+    async def _work(self):
+        while True:
+            email = await self._queue.get()
+            try:
+                await self.refresh(email)
+                self.completed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.failed += 1
+            finally:
+                self._pending.discard(email)
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'pending': len(self._pending),
+            'queued': self.queued,
+            'dropped': self.dropped,
+            'completed': self.completed,
+            'failed': self.failed,
+        }
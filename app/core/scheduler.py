@@ -0,0 +1,178 @@
+# app/core/scheduler.py
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Sequence, Set, Tuple
+
+from app.core.admission import PRIORITIES, current_priority
+from app.utils.metrics import observe_stage
+
+Job = Callable[[], Awaitable[Any]]
+Entry = Tuple[Job, Tuple[str, ...], Tuple[str, ...], asyncio.Future, str]
+
+
+class _KeyQueue:
+    """A key's pending jobs, one FIFO per priority class."""
+
+    def __init__(self):
+        self.by_priority: Dict[str, Deque[Entry]] = {priority: deque() for priority in PRIORITIES}
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self.by_priority.values())
+
+    def append(self, entry: Entry):
+        self.by_priority[entry[4]].append(entry)
+
+    def push_back(self, entry: Entry):
+        """Return a popped entry to the head of its class."""
+        self.by_priority[entry[4]].appendleft(entry)
+
+    def pop(self, above: Optional[str] = None, limit_keys: Optional[Tuple[str, ...]] = None) -> Optional[Entry]:
+        """The oldest entry of the highest class waiting (only classes above ``above``
+        and entries drawing on ``limit_keys``, when given)."""
+        for priority in PRIORITIES:
+            if priority == above:
+                break
+            entries = self.by_priority[priority]
+            while entries and entries[0][3].done():
+                # caller gave up while queued
+                entries.popleft()
+            if entries and (limit_keys is None or entries[0][1] == limit_keys):
+                return entries.popleft()
+        return None
+
+
+class DomainScheduler:
+    """Fair dispatcher for per-domain SMTP work.
+
+    Every key (normally a recipient domain) gets its own FIFO queue drained by up to
+    ``concurrency`` lanes. A lane first takes a token from the domain limiter and only
+    then waits for a global slot, so a rate-limited domain never sits on global
+    capacity. Lanes of all keys queue on the same semaphore, which hands slots out in
+    arrival order within a priority class: ready domains are served round-robin,
+    weighted by their lane count.
+    ``weights`` and ``limits`` override the lane count and the limiter budget per key.
+    An optional ``gate`` (``acquire(key)``/``release(key)``, e.g. the congestion
+    controller) is passed between the limiter and the global slot for ``gate_keys``.
+    Jobs keep the priority class they were submitted under. All classes share the
+    key's lanes; a free lane takes the oldest job of the highest class waiting, and a
+    lane that got its limiter token for a lower class hands the token to a higher
+    class job queued meanwhile. The gate and the global slot are requested for the
+    job's class (see ``PrioritySemaphore``).
+    """
+
+    def __init__(self, domain_limiter, global_semaphore,
+                 max_calls: int = 60, concurrency: int = 1,
+                 weights: Optional[Dict[str, int]] = None, limits: Optional[Dict[str, int]] = None,
+                 gate=None):
+        self.domain_limiter = domain_limiter
+        self.global_semaphore = global_semaphore
+        self.max_calls = max_calls
+        self.concurrency = concurrency
+        self.weights = weights or {}
+        self.limits = limits or {}
+        self.gate = gate
+        self._queues: Dict[str, _KeyQueue] = {}
+        self._lanes: Dict[str, int] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def active(self) -> Dict[str, int]:
+        """Running lanes per key."""
+        return dict(self._lanes)
+
+    def depths(self) -> Dict[str, int]:
+        """Queued jobs per key."""
+        return {key: len(queue) for key, queue in self._queues.items()}
+
+    def queued(self, key: Optional[str] = None) -> int:
+        if key is not None:
+            return len(self._queues.get(key, ()))
+        return sum(len(q) for q in self._queues.values())
+
+    def submit(self, key: str, job: Job, limit_keys: Optional[Sequence[str]] = None,
+               gate_keys: Sequence[str] = ()) -> asyncio.Future:
+        """Queue ``job`` under ``key``; it runs once a token for every ``limit_keys``
+        entry (default: ``key``), the gate for every ``gate_keys`` entry and a global
+        slot are held."""
+        future = asyncio.get_running_loop().create_future()
+        entry = (job, tuple(limit_keys or (key,)), tuple(gate_keys) if self.gate else (), future,
+                 current_priority.get())
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = _KeyQueue()
+        queue.append(entry)
+        self._spawn_lanes(key)
+        return future
+
+    async def run(self, key: str, job: Job, limit_keys: Optional[Sequence[str]] = None,
+                  gate_keys: Sequence[str] = ()) -> Any:
+        return await self.submit(key, job, limit_keys, gate_keys)
+
+    def _spawn_lanes(self, key: str):
+        wanted = min(self.weights.get(key, self.concurrency), len(self._queues[key]))
+        while self._lanes.get(key, 0) < wanted:
+            self._lanes[key] = self._lanes.get(key, 0) + 1
+            task = asyncio.create_task(self._lane(key))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _lane(self, key: str):
+        queue = self._queues[key]
+        try:
+            while True:
+                entry = queue.pop()
+                if entry is None:
+                    break
+                job, limit_keys, gate_keys, future, priority = entry
+
+                started = time.perf_counter()
+                for limit_key in limit_keys:
+                    await self.domain_limiter.acquire(limit_key,
+                                                      max_calls=self.limits.get(limit_key, self.max_calls))
+                started = observe_stage('limiter_wait', started)
+                if priority != PRIORITIES[0]:
+                    # a higher class queued while this lane waited for the token: it goes first
+                    higher = queue.pop(above=priority, limit_keys=limit_keys)
+                    if higher is not None:
+                        queue.push_back(entry)
+                        job, limit_keys, gate_keys, future, priority = higher
+                if future.done():
+                    continue
+
+                # gates and jobs see the job's class, not the submitter's that spawned the lane
+                current_priority.set(priority)
+                held = []
+                try:
+                    for gate_key in gate_keys:
+                        await self.gate.acquire(gate_key)
+                        held.append(gate_key)
+                    if held:
+                        observe_stage('congestion_wait', started)
+                    await self._run_job(job, future, priority)
+                finally:
+                    for gate_key in held:
+                        self.gate.release(gate_key)
+        finally:
+            self._lanes[key] -= 1
+            if not self._lanes[key]:
+                del self._lanes[key]
+                if not queue and self._queues.get(key) is queue:
+                    del self._queues[key]
+
+    async def _run_job(self, job: Job, future: asyncio.Future, priority: str):
+        started = time.perf_counter()
+        await self.global_semaphore.acquire(priority)
+        observe_stage('slot_wait', started)
+        try:
+            if future.done():
+                return
+            try:
+                result = await job()
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self.global_semaphore.release(priority)
@@ -0,0 +1,610 @@
+# app/core/sharding.py
+"""Domain-affinity sharding of verification across worker processes.
+
+With several independent API processes every one of them keeps its own DNS and
+catch-all caches, rate limiter and congestion state and SMTP sessions, and a
+domain's traffic is spread over all of them: its caches are cold N times over
+and its addresses can't share sessions. In sharded mode the API process is only
+a front: ``ShardDispatcher`` hashes each address' domain onto a ``HashRing`` of
+worker processes and forwards the work to the owner over a Unix socket, so all
+the state of a domain lives in exactly one ``EmailVerifier``.
+
+Frames on the socket are a 4-byte big-endian length followed by JSON. A request
+carries an id, the addresses and the verification options; the reply carries the
+same id and the results, or the error. Replies come back in completion order,
+so one connection per worker carries any number of concurrent requests.
+
+Rebalancing: a worker that dies or drops its connection leaves the ring at once,
+its unanswered requests are re-sent to the new owners of their domains, and it
+is restarted under the same name, which gives it back the same share of the
+ring. Growing or shrinking the pool (``resize``, or SIGTTIN / SIGTTOU to the API
+process) only moves the domains of the added or removed workers; a removed
+worker leaves the ring first and is stopped once its requests are answered.
+"""
+import asyncio
+import bisect
+import hashlib
+import itertools
+import multiprocessing
+import os
+import shutil
+import signal
+import struct
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from app.core.admission import BULK, INTERACTIVE, AdmissionController, Overloaded
+from app.models.results import ResultRecord, VerificationDepth, VerificationStatus
+from app.utils import metrics
+from app.utils.serialization import dumps, loads
+from config import Config
+
+_FRAME = struct.Struct('>I')
+
+
+class ShardUnavailable(ConnectionError):
+    """The worker owning an address went away (or none is running)."""
+
+
+def domain_key(email: str) -> str:
+    return email.rsplit('@', 1)[-1].strip().lower()
+
+
+class HashRing:
+    """Consistent hashing of keys onto nodes.
+
+    Each node sits at ``replicas`` points of a 64-bit ring and owns the keys that
+    hash up to them, so adding or removing a node only moves keys to or from that
+    node (about 1/N of them) and the rest keep their owner.
+    """
+
+    def __init__(self, replicas: int = 128):
+        self.replicas = replicas
+        self.nodes: Set[str] = set()
+        self._points: List[int] = []
+        self._owners: List[str] = []
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        # stable across processes and restarts, unlike hash()
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'big')
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def add(self, node: str):
+        if node in self.nodes:
+            return
+        self.nodes.add(node)
+        for replica in range(self.replicas):
+            point = self._hash(f'{node}#{replica}')
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, node)
+
+    def remove(self, node: str):
+        if node not in self.nodes:
+            return
+        self.nodes.discard(node)
+        kept = [(point, owner) for point, owner in zip(self._points, self._owners) if owner != node]
+        self._points = [point for point, _ in kept]
+        self._owners = [owner for _, owner in kept]
+
+    def node_for(self, key: str) -> Optional[str]:
+        if not self._points:
+            return None
+        index = bisect.bisect(self._points, self._hash(key))
+        return self._owners[index % len(self._owners)]
+
+    def shares(self) -> Dict[str, float]:
+        """Fraction of the key space each node owns."""
+        shares = {node: 0.0 for node in self.nodes}
+        previous = self._points[-1] - (1 << 64) if self._points else 0
+        for point, owner in zip(self._points, self._owners):
+            shares[owner] += (point - previous) / (1 << 64)
+            previous = point
+        return shares
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Optional[Dict[str, Any]]:
+    """Next message, or None once the peer has closed the connection."""
+    try:
+        header = await reader.readexactly(_FRAME.size)
+        return loads(await reader.readexactly(_FRAME.unpack(header)[0]))
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return None
+
+
+def write_frame(writer: asyncio.StreamWriter, message: Dict[str, Any]):
+    body = dumps(message)
+    writer.write(_FRAME.pack(len(body)) + body)
+
+
+class ShardServer:
+    """Runs in a worker process: verifies what the dispatcher sends over ``path``."""
+
+    def __init__(self, verifier, path: str):
+        self.verifier = verifier
+        self.path = path
+        self._tasks: Set[asyncio.Task] = set()
+        self._connections: Dict[asyncio.Task, asyncio.StreamWriter] = {}
+
+    async def serve(self, stop: asyncio.Event):
+        if os.path.exists(self.path):
+            # left behind by a worker that was killed
+            os.unlink(self.path)
+        server = await asyncio.start_unix_server(self._connection, path=self.path)
+        await stop.wait()
+        # stop accepting, but answer what was already sent
+        server.close()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for writer in self._connections.values():
+            writer.close()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+
+    async def _connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        connection = asyncio.current_task()
+        self._connections[connection] = writer
+        try:
+            while True:
+                message = await read_frame(reader)
+                if message is None:
+                    break
+                task = asyncio.ensure_future(self._handle(message, writer))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+        finally:
+            del self._connections[connection]
+            writer.close()
+
+    async def _handle(self, message: Dict[str, Any], writer: asyncio.StreamWriter):
+        reply: Dict[str, Any] = {'id': message['id']}
+        if 'stats' in message:
+            reply['stats'] = self._stats(message['stats'].get('host'))
+            await self._reply(writer, reply)
+            return
+        emails = message['emails']
+        options = {'priority': message['priority'], 'depth': message['depth'],
+                   'deadline': message['deadline'], 'background': message['background']}
+        try:
+            if len(emails) == 1:
+                reply['results'] = [await self.verifier.verify_single(emails[0], **options)]
+            else:
+                reply['results'] = await self.verifier.verify_bulk(emails, **options)
+        except Overloaded as e:
+            reply['overloaded'] = e.priority
+            reply['retry_after'] = e.retry_after
+        except Exception as e:
+            reply['error'] = str(e)
+        await self._reply(writer, reply)
+
+    @staticmethod
+    async def _reply(writer: asyncio.StreamWriter, reply: Dict[str, Any]):
+        if writer.is_closing():
+            return
+        write_frame(writer, reply)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    def _stats(self, host: Optional[str]) -> Dict[str, Any]:
+        """What the front's stats endpoints show for this worker's verifier."""
+        verifier = self.verifier
+        return {
+            'cache': dict(verifier.cache.stats(), refresh=verifier.refresher.stats()),
+            'slots': {'capacity': verifier.global_semaphore.capacity,
+                      'in_use': verifier.global_semaphore.in_use()},
+            'congestion': verifier.congestion.snapshot(host),
+            'open_circuits': verifier.smtp_checker.breaker.snapshot(),
+        }
+
+
+def run_shard(path: str, verifier_factory: Optional[Callable[[], Any]] = None):
+    """Entry point of a worker process."""
+    # Ctrl-C reaches the whole process group; the front decides when workers stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_serve_shard(path, verifier_factory))
+
+
+async def _serve_shard(path: str, verifier_factory: Optional[Callable[[], Any]]):
+    if verifier_factory is None:
+        from app.core.verifier import EmailVerifier
+        verifier_factory = EmailVerifier
+    verifier = verifier_factory()
+    stop = asyncio.Event()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+
+    async def orphaned():
+        # the front was killed without stopping us
+        parent = os.getppid()
+        while os.getppid() == parent:
+            await asyncio.sleep(1)
+        stop.set()
+
+    watchdog = asyncio.ensure_future(orphaned())
+    try:
+        await ShardServer(verifier, path).serve(stop)
+    finally:
+        watchdog.cancel()
+        await verifier.refresher.stop()
+        await verifier.cache.close()
+
+
+class ShardClient:
+    """The dispatcher's connection to one worker; any number of calls share it."""
+
+    def __init__(self, name: str, path: str, on_lost: Callable[['ShardClient'], None]):
+        self.name = name
+        self.path = path
+        self.on_lost = on_lost
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count()
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._pending)
+
+    async def connect(self, timeout: float):
+        """Connect once the worker listens (it takes a moment to start)."""
+        expires = time.monotonic() + timeout
+        while True:
+            try:
+                reader, self._writer = await asyncio.open_unix_connection(self.path)
+                break
+            except (FileNotFoundError, ConnectionRefusedError):
+                if time.monotonic() >= expires:
+                    raise ShardUnavailable(f'{self.name} did not start listening within {timeout}s')
+                await asyncio.sleep(0.05)
+        self._reader_task = asyncio.ensure_future(self._read(reader))
+
+    async def call(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        if not self.connected:
+            raise ShardUnavailable(f'{self.name} is not connected')
+        call_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[call_id] = future
+        try:
+            write_frame(self._writer, dict(message, id=call_id))
+            await self._writer.drain()
+            return await future
+        except ConnectionError as e:
+            raise ShardUnavailable(f'{self.name}: {e}') from e
+        finally:
+            self._pending.pop(call_id, None)
+
+    async def _read(self, reader: asyncio.StreamReader):
+        try:
+            while True:
+                message = await read_frame(reader)
+                if message is None:
+                    break
+                future = self._pending.get(message['id'])
+                if future is not None and not future.done():
+                    future.set_result(message)
+        finally:
+            # out of the ring before the callers retry, so they pick the new owner
+            self.on_lost(self)
+            self.close()
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        if self._reader_task is not None and self._reader_task is not asyncio.current_task():
+            self._reader_task.cancel()
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(ShardUnavailable(f'{self.name} went away'))
+
+
+class ShardDispatcher:
+    """Front of the sharded mode, with the ``verify_*`` interface of ``EmailVerifier``.
+
+    Starts ``workers`` processes running ``verifier_factory()`` (``EmailVerifier``
+    by default) and routes every address to the worker owning its domain. Admission
+    control happens here, for the whole pool; each worker still schedules and
+    prioritizes its own share.
+    """
+
+    def __init__(self, workers: int, socket_dir: Optional[str] = None,
+                 verifier_factory: Optional[Callable[[], Any]] = None, replicas: int = Config.SHARD_VNODES):
+        self.workers = workers
+        self.socket_dir = socket_dir
+        self.verifier_factory = verifier_factory
+        self.ring = HashRing(replicas)
+        self.admission = AdmissionController(Config.ADMISSION_LIMITS)
+        self._context = multiprocessing.get_context('spawn')
+        self._processes: Dict[str, multiprocessing.process.BaseProcess] = {}
+        self._clients: Dict[str, ShardClient] = {}
+        self._retiring: Set[str] = set()
+        self._names = itertools.count()
+        self._resizing = asyncio.Lock()
+        self._watcher: Optional[asyncio.Task] = None
+        self._own_socket_dir = False
+        self.restarts = 0
+        self.rerouted = 0
+        self._register_metrics()
+
+    def _register_metrics(self):
+        registry = metrics.REGISTRY
+        registry.register(metrics.Gauge(
+            'email_verifier_shard_in_flight', 'Requests sent to a shard worker and not answered yet.', ('shard',),
+            callback=lambda: {(name,): client.in_flight for name, client in self._clients.items()}
+        ))
+        registry.register(metrics.CallbackCounter(
+            'email_verifier_shard_restarts_total', 'Shard workers restarted after dying or disconnecting.',
+            callback=lambda: {(): self.restarts}
+        ))
+        registry.register(metrics.CallbackCounter(
+            'email_verifier_shard_rerouted_total', 'Addresses re-sent to a new owner after losing their worker.',
+            callback=lambda: {(): self.rerouted}
+        ))
+
+    async def start(self):
+        if self.socket_dir is None:
+            self.socket_dir = tempfile.mkdtemp(prefix='email-verifier-shards-')
+            self._own_socket_dir = True
+        await asyncio.gather(*(self._spawn(self._new_name()) for _ in range(self.workers)))
+        self._watcher = asyncio.ensure_future(self._watch())
+        loop = asyncio.get_running_loop()
+        try:
+            # the gunicorn convention: TTIN adds a worker, TTOU removes one
+            loop.add_signal_handler(signal.SIGTTIN, lambda: asyncio.ensure_future(self.resize(self.workers + 1)))
+            loop.add_signal_handler(signal.SIGTTOU, lambda: asyncio.ensure_future(self.resize(self.workers - 1)))
+        except (NotImplementedError, RuntimeError, ValueError):
+            # not the main thread / no Unix signals: resize() still works
+            pass
+
+    async def stop(self):
+        if self._watcher is not None:
+            self._watcher.cancel()
+            self._watcher = None
+        await asyncio.gather(*(self._retire(name, drain=False) for name in list(self._processes)))
+        if self._own_socket_dir:
+            shutil.rmtree(self.socket_dir, ignore_errors=True)
+
+    async def resize(self, workers: int):
+        """Grow or shrink the pool to ``workers`` (at least one)."""
+        async with self._resizing:
+            self.workers = max(1, workers)
+            names = sorted((name for name in self._processes if name not in self._retiring), key=_name_index)
+            if len(names) < self.workers:
+                await asyncio.gather(*(self._spawn(self._new_name())
+                                       for _ in range(self.workers - len(names))))
+            else:
+                # newest first, so the long-lived workers keep their warm caches
+                await asyncio.gather(*(self._retire(name) for name in names[self.workers:]))
+
+    def _new_name(self) -> str:
+        while True:
+            name = f'shard-{next(self._names)}'
+            if name not in self._processes:
+                return name
+
+    async def _spawn(self, name: str):
+        """Start worker ``name`` and put it on the ring once it answers."""
+        path = os.path.join(self.socket_dir, name + '.sock')
+        process = self._context.Process(target=run_shard, args=(path, self.verifier_factory),
+                                        name=name, daemon=True)
+        process.start()
+        self._processes[name] = process
+        client = ShardClient(name, path, self._lost)
+        await client.connect(Config.SHARD_START_TIMEOUT)
+        self._clients[name] = client
+        self.ring.add(name)
+
+    async def _retire(self, name: str, drain: bool = True):
+        self._retiring.add(name)
+        self.ring.remove(name)
+        client = self._clients.pop(name, None)
+        if client is not None:
+            expires = time.monotonic() + Config.SHARD_DRAIN_TIMEOUT
+            while drain and client.in_flight and time.monotonic() < expires:
+                await asyncio.sleep(0.05)
+            client.close()
+        process = self._processes.pop(name, None)
+        if process is not None:
+            if process.is_alive():
+                # SIGTERM: the worker finishes what it has and exits
+                process.terminate()
+            await asyncio.get_running_loop().run_in_executor(None, process.join, Config.SHARD_DRAIN_TIMEOUT)
+            if process.is_alive():
+                process.kill()
+        self._retiring.discard(name)
+
+    def _lost(self, client: ShardClient):
+        # connection dropped: stop routing to it now, the watcher restarts it
+        if self._clients.get(client.name) is client:
+            self.ring.remove(client.name)
+
+    def _healthy(self, name: str) -> bool:
+        process = self._processes.get(name)
+        client = self._clients.get(name)
+        return process is None or name in self._retiring or \
+            (process.is_alive() and client is not None and client.connected)
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(Config.SHARD_HEALTH_INTERVAL)
+            for name in list(self._processes):
+                if self._healthy(name):
+                    continue
+                # not while resizing, which counts and names the workers
+                async with self._resizing:
+                    if self._healthy(name):
+                        continue
+                    try:
+                        await self._restart(name)
+                    except Exception:
+                        # retried on the next round
+                        pass
+
+    async def _restart(self, name: str):
+        self.ring.remove(name)
+        client = self._clients.pop(name, None)
+        if client is not None:
+            client.close()
+        process = self._processes.pop(name)
+        if process.is_alive():
+            process.kill()
+        await asyncio.get_running_loop().run_in_executor(None, process.join, 5)
+        self.restarts += 1
+        # same name, same ring points: it takes back exactly the domains it had
+        await self._spawn(name)
+
+    def snapshot(self) -> Dict[str, Any]:
+        shares = self.ring.shares()
+        return {
+            'workers': self.workers,
+            'restarts': self.restarts,
+            'rerouted': self.rerouted,
+            'shards': {
+                name: {
+                    'pid': process.pid,
+                    'alive': process.is_alive(),
+                    'serving': name in self.ring.nodes,
+                    'in_flight': self._clients[name].in_flight if name in self._clients else 0,
+                    'share': round(shares.get(name, 0.0), 4),
+                }
+                for name, process in sorted(self._processes.items(), key=lambda item: _name_index(item[0]))
+            },
+        }
+
+    async def stats(self, host: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """Cache, slot and congestion state of every connected worker, by shard name."""
+        names = sorted(self._clients, key=_name_index)
+        replies = await asyncio.gather(
+            *(self._clients[name].call({'stats': {'host': host}}) for name in names), return_exceptions=True
+        )
+        # a worker going away meanwhile just drops out of the view
+        return {name: reply['stats'] for name, reply in zip(names, replies) if not isinstance(reply, BaseException)}
+
+    async def verify_single(self, email: str, priority: str = INTERACTIVE,
+                            depth: str = VerificationDepth.FULL.value, deadline: Optional[float] = None,
+                            background: bool = False) -> ResultRecord:
+        with self.admission.admit(priority):
+            results = await self._dispatch([email], priority, depth, deadline, background)
+        return results[0]
+
+    async def verify_bulk(self, emails: List[str], priority: str = BULK,
+                          depth: str = VerificationDepth.FULL.value, deadline: Optional[float] = None,
+                          background: bool = False) -> List[ResultRecord]:
+        if not emails:
+            return []
+        with self.admission.admit(priority, len(emails)):
+            return await self._dispatch(emails, priority, depth, deadline, background)
+
+    async def verify_stream(self, emails, max_pending: int = None, priority: str = BULK):
+        """``EmailVerifier.verify_stream`` across the pool: results in completion order,
+        at most ``max_pending`` addresses in flight or waiting to be consumed."""
+        if max_pending is None:
+            max_pending = Config.STREAM_MAX_PENDING
+        with self.admission.admit(priority, max_pending):
+            slots = asyncio.Semaphore(max_pending)
+            done: asyncio.Queue = asyncio.Queue()
+            feed_finished = object()
+
+            async def verify(email: str) -> ResultRecord:
+                try:
+                    return (await self._dispatch([email], priority, VerificationDepth.FULL.value, None, False))[0]
+                except Exception as e:
+                    return _error_result(email, e)
+
+            async def feed() -> int:
+                submitted = 0
+                async for email in emails:
+                    await slots.acquire()
+                    task = asyncio.ensure_future(verify(email))
+                    task.add_done_callback(done.put_nowait)
+                    submitted += 1
+                return submitted
+
+            feeder = asyncio.ensure_future(feed())
+            feeder.add_done_callback(lambda _: done.put_nowait(feed_finished))
+
+            yielded = 0
+            try:
+                while not (feeder.done() and yielded == feeder.result()):
+                    item = await done.get()
+                    if item is feed_finished:
+                        feeder.result()
+                        continue
+                    yielded += 1
+                    slots.release()
+                    yield item.result()
+            finally:
+                feeder.cancel()
+
+    async def _dispatch(self, emails: List[str], priority: str, depth: str, deadline: Optional[float],
+                        background: bool) -> List[ResultRecord]:
+        results: List[Optional[ResultRecord]] = [None] * len(emails)
+        expires = time.monotonic() + deadline if deadline is not None else None
+        pending = list(range(len(emails)))
+        failures: List[BaseException] = []
+        failed = 0
+        # one more round than there are workers: each lost worker costs one re-send
+        for _ in range(len(self._processes) + 1):
+            owners: Dict[str, Optional[str]] = {}
+            groups: Dict[str, List[int]] = {}
+            for index in pending:
+                domain = domain_key(emails[index])
+                if domain not in owners:
+                    owners[domain] = self.ring.node_for(domain)
+                if owners[domain] is None:
+                    raise ShardUnavailable('no shard worker is running')
+                groups.setdefault(owners[domain], []).append(index)
+
+            message = {'priority': priority, 'depth': depth, 'background': background,
+                       'deadline': max(expires - time.monotonic(), 0.001) if expires is not None else None}
+            names = list(groups)
+            replies = await asyncio.gather(
+                *(self._send(name, [emails[index] for index in groups[name]], message) for name in names),
+                return_exceptions=True
+            )
+            pending = []
+            for name, reply in zip(names, replies):
+                if isinstance(reply, ShardUnavailable):
+                    pending.extend(groups[name])
+                elif isinstance(reply, BaseException):
+                    failures.append(reply)
+                    failed += len(groups[name])
+                    # only this shard's addresses are lost, the other shards' answers stand
+                    for index in groups[name]:
+                        results[index] = _error_result(emails[index], reply)
+                else:
+                    for index, result in zip(groups[name], reply):
+                        results[index] = result
+            if not pending:
+                if failed == len(emails):
+                    # nothing was answered (always the case for a single address): let the caller see why
+                    raise failures[0]
+                return results
+            self.rerouted += len(pending)
+        raise ShardUnavailable('shard workers kept going away')
+
+    async def _send(self, name: str, emails: List[str], message: Dict[str, Any]) -> List[ResultRecord]:
+        client = self._clients.get(name)
+        if client is None:
+            raise ShardUnavailable(f'{name} is not connected')
+        reply = await client.call(dict(message, emails=emails))
+        if 'overloaded' in reply:
+            raise Overloaded(reply['overloaded'], reply['retry_after'])
+        if 'error' in reply:
+            raise RuntimeError(reply['error'])
+        return [ResultRecord(**result) for result in reply['results']]
+
+
+def _name_index(name: str) -> int:
+    return int(name.rsplit('-', 1)[-1])
+
+
+def _error_result(email: str, error: BaseException) -> ResultRecord:
+    return ResultRecord(email=email, status=VerificationStatus.UNKNOWN.value, quality_score=0,
+                        details={'error': str(error)}, is_verified=False)
@@ -1,75 +1,336 @@
 import aiosmtplib
 import socket
 import random
-from typing import Optional, Dict, Any, List
+import time
+from typing import Callable, Optional, Dict, Any, List, Tuple
 import asyncio
+from app.core import congestion
+from app.core.circuit_breaker import HostCircuitBreaker
+from app.utils.metrics import SMTP_REPLIES, SMTP_SESSIONS, observe_stage
+
+# 421: service closing the session, 452: too many recipients in this transaction
+SESSION_LIMIT_CODES = (421,)
+TRANSACTION_LIMIT_CODES = (452,)
 
 
 class SMTPChecker:
-    def __init__(self, timeout: int = 10, from_email: str = 'verify@example.com'):
+    def __init__(self, timeout: int = 10, from_email: str = 'verify@example.com',
+                 max_rcpt_per_session: int = 25, rcpt_per_transaction: int = 10,
+                 max_reconnects: int = 2, congestion_controller=None,
+                 hedge_delay: float = 2.0, max_mx_attempts: int = 2,
+                 breaker: Optional[HostCircuitBreaker] = None,
+                 provider_label: Optional[Callable[[str], str]] = None, port: int = 25,
+                 connect_to: Optional[Callable[[str], Tuple[str, int]]] = None):
         self.timeout = timeout
         self.from_email = from_email
+        self.max_rcpt_per_session = max_rcpt_per_session
+        self.rcpt_per_transaction = rcpt_per_transaction
+        self.max_reconnects = max_reconnects
+        # optional CongestionController fed with the outcome of every session
+        self.congestion = congestion_controller
+        # the next MX is tried in parallel once the current one has been silent this long
+        self.hedge_delay = hedge_delay
+        self.max_mx_attempts = max_mx_attempts
+        # MX hosts we could not connect to are skipped until their backoff expires
+        self.breaker = breaker or HostCircuitBreaker()
+        # MX host -> provider name for metric labels (bounded, unlike host names)
+        self.provider_label = provider_label or (lambda host: 'other')
+        self.port = port
+        # MX host -> (address, port) actually dialled, e.g. a local fake server in benchmarks
+        self.connect_to = connect_to
+
+    def _client(self, mx_server: str) -> aiosmtplib.SMTP:
+        hostname, port = self.connect_to(mx_server) if self.connect_to else (mx_server, self.port)
+        return aiosmtplib.SMTP(hostname=hostname, port=port, timeout=self.timeout)
+
+    def _record_connect(self, mx_server: str, connected: bool, error: Optional[BaseException] = None):
+        if connected:
+            self.breaker.record_success(mx_server)
+        elif error is not None and not isinstance(error, aiosmtplib.SMTPResponseException):
+            # no session at all (timeout, refused, unreachable); a refusing greeting
+            # means the host is up and is left to congestion control
+            self.breaker.record_failure(mx_server)
+
+    @staticmethod
+    def _code_outcome(code: int) -> str:
+        # 421/450/451/452...: the server wants us to slow down or come back later
+        return congestion.THROTTLED if 400 <= code < 500 else congestion.OK
+
+    @staticmethod
+    def _error_outcome(error: BaseException) -> str:
+        if isinstance(error, (aiosmtplib.SMTPTimeoutError, asyncio.TimeoutError, socket.timeout)):
+            return congestion.TIMEOUT
+        code = getattr(error, 'code', None)
+        if isinstance(code, int) and 400 <= code < 500:
+            return congestion.THROTTLED
+        if isinstance(error, (aiosmtplib.SMTPServerDisconnected, ConnectionResetError)):
+            # dropped mid-session
+            return congestion.THROTTLED
+        return congestion.ERROR
+
+    def _report(self, mx_server: str, outcome: str, latency: Optional[float] = None):
+        SMTP_SESSIONS.inc((self.provider_label(mx_server), outcome))
+        if self.congestion is not None:
+            self.congestion.record(mx_server, outcome, latency)
+
+    def _report_rcpt(self, mx_server: str, code: int):
+        SMTP_REPLIES.inc((self.provider_label(mx_server), str(code)))
+
+    @staticmethod
+    def _rcpt_result(code: int, message: Any) -> Dict[str, Any]:
+        message = message.decode() if hasattr(message, 'decode') else str(message)
+        if code == 250:
+            return {'status': 'valid', 'code': code, 'message': message}
+        elif code == 550:
+            return {'status': 'invalid', 'code': code, 'message': message}
+        return {'status': 'unknown', 'code': code, 'message': message}
 
     async def check_smtp(self, email: str, mx_server: str) -> Dict[str, Any]:
 
+        if not self.breaker.allow(mx_server):
+            return {'status': 'error', 'error': 'mx host unreachable (circuit open)', 'circuit_open': True}
+
+        reported = connected = False
+        smtp = None
         try:
             # Connect to SMTP server with better error handling
-            smtp = aiosmtplib.SMTP(
-                hostname=mx_server,
-                port=25,
-                timeout=self.timeout
-            )
+            smtp = self._client(mx_server)
 
+            started = time.perf_counter()
             await smtp.connect()
+            connected = True
+            self._record_connect(mx_server, True)
+            started = observe_stage('smtp_connect', started)
             await smtp.ehlo()
+            started = observe_stage('smtp_ehlo', started)
 
             mail_result = await smtp.mail(self.from_email)
             if not mail_result[0] == 250:
                 await smtp.quit()
                 return {'status': 'error', 'error': f"MAIL command failed: {mail_result[1]}"}
+            rcpt_started = observe_stage('smtp_mail', started)
 
-            code, message = await smtp.rcpt(email)
+            try:
+                code, message = await smtp.rcpt(email)
+            except aiosmtplib.SMTPRecipientRefused as e:
+                # aiosmtplib raises on anything but 250/251; the code is the answer we want
+                code, message = e.code, e.message
+            self._report_rcpt(mx_server, code)
+            self._report(mx_server, self._code_outcome(code), observe_stage('smtp_rcpt', rcpt_started) - rcpt_started)
+            reported = True
 
             await smtp.quit()
 
-            if code == 250:
-                return {'status': 'valid', 'code': code,
-                        'message': message.decode() if hasattr(message, 'decode') else str(message)}
-            elif code == 550:
-                return {'status': 'invalid', 'code': code,
-                        'message': message.decode() if hasattr(message, 'decode') else str(message)}
-            else:
-                return {'status': 'unknown', 'code': code,
-                        'message': message.decode() if hasattr(message, 'decode') else str(message)}
+            return self._rcpt_result(code, message)
 
         except (aiosmtplib.SMTPConnectError, aiosmtplib.SMTPTimeoutError,
                 aiosmtplib.SMTPServerDisconnected, socket.timeout,
                 ConnectionRefusedError, OSError, Exception) as e:
+            if not connected:
+                self._record_connect(mx_server, False, e)
+            if not reported:
+                # failed before the RCPT was answered
+                self._report(mx_server, self._error_outcome(e))
             return {'status': 'error', 'error': str(e)}
+        finally:
+            # also reached when a hedged attempt is cancelled mid-session
+            if smtp is not None and smtp.is_connected:
+                smtp.close()
+
+    def live_hosts(self, mx_servers: List[str]) -> List[str]:
+        """MX hosts in preference order, without those behind an open circuit."""
+        return [host for host in mx_servers if not self.breaker.is_open(host)][:self.max_mx_attempts]
 
     async def verify_email_smtp(self, email: str, mx_servers: List[str]) -> Dict[str, Any]:
+        """Hedged check over the MX hosts: the next host (in preference order) starts
+        when the current attempts have been silent for ``hedge_delay`` seconds or have
+        all failed, and the first definitive answer wins."""
 
         if not mx_servers:
             return {'status': 'no_mx_servers'}
 
-        for mx_server in mx_servers[:2]:
-            result = await self.check_smtp(email, mx_server)
+        hosts = self.live_hosts(mx_servers)
+        if not hosts:
+            return {'status': 'unknown', 'reason': 'mx_unreachable'}
 
-            if result['status'] in ['valid', 'invalid']:
-                return result
+        attempts = set()
+        reply = None
+        try:
+            while hosts or attempts:
+                if hosts:
+                    attempts.add(asyncio.ensure_future(self.check_smtp(email, hosts.pop(0))))
+                done, attempts = await asyncio.wait(
+                    attempts, timeout=self.hedge_delay if hosts else None,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                for attempt in done:
+                    result = attempt.result()
+                    if result['status'] in ['valid', 'invalid']:
+                        return result
+                    if 'code' in result:
+                        reply = result
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
 
-            await asyncio.sleep(1)
+        return self._unknown_result('all_servers_failed', reply)
 
-        return {'status': 'unknown', 'reason': 'all_servers_failed'}
+    @staticmethod
+    def _unknown_result(reason: str, reply: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """No definitive answer from any host; keeps the code and message of the
+        last RCPT reply, if there was one."""
+        result = {'status': 'unknown', 'reason': reason}
+        if reply is not None:
+            result['code'] = reply['code']
+            result['message'] = reply['message']
+        return result
 
-    async def detect_catch_all(self, domain: str, mx_server: str) -> bool:
+    async def _batch_session(self, emails: List[str], mx_server: str, max_rcpt: int,
+                             results: Dict[str, Dict[str, Any]]) -> Tuple[int, Optional[str]]:
+        """Run one SMTP session over ``emails``; returns (recipients answered, error)."""
+        if not self.breaker.allow(mx_server):
+            return 0, 'mx host unreachable (circuit open)'
 
+        checked = 0
+        outcome = congestion.OK
+        latencies: List[float] = []
+        connected = False
+        smtp = self._client(mx_server)
+        try:
+            started = time.perf_counter()
+            await smtp.connect()
+            connected = True
+            self._record_connect(mx_server, True)
+            started = observe_stage('smtp_connect', started)
+            await smtp.ehlo()
+            started = observe_stage('smtp_ehlo', started)
+            await smtp.mail(self.from_email)
+            observe_stage('smtp_mail', started)
+
+            per_transaction = self.rcpt_per_transaction
+            in_transaction = 0
+            while checked < len(emails) and checked < max_rcpt:
+                if in_transaction >= per_transaction:
+                    await smtp.rset()
+                    await smtp.mail(self.from_email)
+                    in_transaction = 0
+
+                email = emails[checked]
+                rcpt_started = time.perf_counter()
+                try:
+                    code, message = await smtp.rcpt(email)
+                except aiosmtplib.SMTPRecipientRefused as e:
+                    code, message = e.code, e.message
+                latencies.append(observe_stage('smtp_rcpt', rcpt_started) - rcpt_started)
+                self._report_rcpt(mx_server, code)
+
+                if code in SESSION_LIMIT_CODES:
+                    outcome = congestion.THROTTLED
+                    return checked, f"session closed by server: {message}"
+                if code in TRANSACTION_LIMIT_CODES:
+                    if in_transaction == 0:
+                        outcome = congestion.THROTTLED
+                        return checked, f"recipient limit reached: {message}"
+                    # server caps recipients per transaction below our setting:
+                    # shrink the chunk and retry this address after RSET
+                    per_transaction = in_transaction
+                    continue
+
+                if self._code_outcome(code) != congestion.OK:
+                    outcome = congestion.THROTTLED
+                results[email] = self._rcpt_result(code, message)
+                checked += 1
+                in_transaction += 1
+
+            await smtp.quit()
+            return checked, None
+        except aiosmtplib.SMTPSenderRefused as e:
+            outcome = self._error_outcome(e)
+            return checked, f"MAIL command failed: {e.message}"
+        except Exception as e:
+            outcome = self._error_outcome(e)
+            if not connected:
+                self._record_connect(mx_server, False, e)
+            return checked, str(e) or type(e).__name__
+        finally:
+            if smtp.is_connected:
+                smtp.close()
+            # one report per session, with the mean RCPT latency
+            self._report(mx_server, outcome, sum(latencies) / len(latencies) if latencies else None)
+
+    async def check_smtp_batch(self, emails: List[str], mx_server: str,
+                               max_rcpt_per_session: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+        """Check many recipients against one MX, reusing each connection for up to
+        ``max_rcpt_per_session`` RCPTs (RSET between transactions). If the server
+        drops the session early, reconnect and resume from the first unanswered address."""
+        max_rcpt = max_rcpt_per_session or self.max_rcpt_per_session
+        results: Dict[str, Dict[str, Any]] = {}
+        pending = list(dict.fromkeys(emails))
+        failures = 0
+
+        while pending:
+            checked, error = await self._batch_session(pending, mx_server, max_rcpt, results)
+            pending = pending[checked:]
+            if not pending:
+                break
+
+            if checked == 0:
+                failures += 1
+                if failures > self.max_reconnects:
+                    for email in pending:
+                        results[email] = {'status': 'error', 'error': error or 'session_failed'}
+                    break
+            else:
+                failures = 0
+
+        return results
+
+    async def verify_email_smtp_batch(self, emails: List[str], mx_servers: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Batched counterpart of ``verify_email_smtp``: addresses without a definitive
+        answer from one MX are retried right away on the next. Hosts behind an open
+        circuit are skipped; a whole session is too heavy to hedge."""
+        if not mx_servers:
+            return {email: {'status': 'no_mx_servers'} for email in emails}
+
+        results: Dict[str, Dict[str, Any]] = {}
+        # last non-definitive reply per address, so its code and message aren't lost
+        replies: Dict[str, Dict[str, Any]] = {}
+        pending = list(dict.fromkeys(emails))
+        hosts = self.live_hosts(mx_servers)
+
+        for mx_server in hosts:
+            batch = await self.check_smtp_batch(pending, mx_server)
+            for email, result in batch.items():
+                if result['status'] in ['valid', 'invalid']:
+                    results[email] = result
+                elif 'code' in result:
+                    replies[email] = result
+
+            pending = [email for email in pending if email not in results]
+            if not pending:
+                return results
+
+        reason = 'all_servers_failed' if hosts else 'mx_unreachable'
+        for email in pending:
+            results[email] = self._unknown_result(reason, replies.get(email))
+        return results
+
+    async def probe_catch_all(self, domain: str, mx_server: str) -> Optional[bool]:
+        """RCPT a random address on ``domain``; None when the probe was inconclusive."""
         try:
 
             random_part = ''.join(random.choices('abcdefghijklmnopqrstuvwxyz0123456789', k=15))
             test_email = f'{random_part}@{domain}'
 
             result = await self.check_smtp(test_email, mx_server)
-            return result.get('status') == 'valid'
+            if result.get('status') == 'valid':
+                return True
+            if result.get('status') == 'invalid':
+                return False
+            return None
         except Exception:
-            return False
\ No newline at end of file
+            return None
+
+    async def detect_catch_all(self, domain: str, mx_server: str) -> bool:
+
+        return bool(await self.probe_catch_all(domain, mx_server))
@@ -1,32 +1,74 @@
 import re
 import asyncio
-from typing import List, Set
+from typing import Dict, Iterable, List, NamedTuple, Pattern, Set, Tuple
 import aiohttp
+from app.core.disposable import DisposableDomains
+from config import Config
+
+# compiled once; the single-address and batch paths share them
+SYNTAX_RE = re.compile(r'^[a-zA-Z0-9.!#$%&’*+/=?^_`{|}~-]+@[a-zA-Z0-9-]+(?:\.[a-zA-Z0-9-]+)*$')
+# role detection matches whole tokens of the local part (tokens are split on
+# separators and digits): "info.smith" and "support2" are roles, "shinfo.smith" is not
+_TOKEN_BOUNDARY = r'._+\-\d'
+_SEPARATORS = r'[._+\-]*'
+
+
+def compile_role_patterns(prefixes: Iterable[str]) -> Tuple[Pattern, Pattern]:
+    """One alternation per check, so each address is scanned once in C no matter how
+    many role names there are: a token matcher, and a full match that tolerates
+    separators inside a role name ("no-reply", "web.master")."""
+    names = sorted(prefixes, key=len, reverse=True)
+    tokens = '|'.join(re.escape(name) for name in names)
+    token_re = re.compile(rf'(?<![^{_TOKEN_BOUNDARY}])(?:{tokens})(?![^{_TOKEN_BOUNDARY}])')
+    spaced = '|'.join(_SEPARATORS.join(re.escape(ch) for ch in name) for name in names)
+    spaced_re = re.compile(rf'(?:{spaced})')
+    return token_re, spaced_re
+
+
+class PrefilterResult(NamedTuple):
+    email: str  # normalized
+    syntax_valid: bool
+    is_disposable: bool
+    is_role_account: bool
+
+    @property
+    def rejected(self) -> bool:
+        """Decided locally: no DNS/SMTP work needed."""
+        return not self.syntax_valid or self.is_disposable
 
 
 class EmailValidators:
     def __init__(self):
         self.disposable_domains: Set[str] = set()
+        self.disposable: DisposableDomains = None
         self.role_account_prefixes: Set[str] = {
             'admin', 'support', 'info', 'contact', 'sales',
             'help', 'newsletter', 'noreply', 'hello', 'service',
             'marketing', 'news', 'feedback', 'webmaster', 'postmaster'
         }
+        self._role_key = None
+        self._role_res = None
         self._load_disposable_domains()
 
     def _load_disposable_domains(self):
 
+        # always-on fallback; the large public list comes from DISPOSABLE_DOMAINS_FILE
         self.disposable_domains = {
             'tempmail.com', 'mailinator.com', 'guerrillamail.com',
             '10minutemail.com', 'throwawaymail.com', 'yopmail.com',
             'fakeinbox.com', 'trashmail.com', 'getairmail.com'
         }
+        self.disposable = DisposableDomains(
+            domains_file=Config.DISPOSABLE_DOMAINS_FILE,
+            snapshot_file=Config.DISPOSABLE_SNAPSHOT_FILE,
+            builtin=self.disposable_domains,
+            mx_patterns=Config.DISPOSABLE_MX_PATTERNS,
+            reload_interval=Config.DISPOSABLE_RELOAD_INTERVAL
+        )
 
     def validate_syntax(self, email: str) -> bool:
 
-        pattern = r'^[a-zA-Z0-9.!#$%&’*+/=?^_`{|}~-]+@[a-zA-Z0-9-]+(?:\.[a-zA-Z0-9-]+)*$'
-
-        if not re.match(pattern, email):
+        if not SYNTAX_RE.match(email):
             return False
 
         local_part, domain = email.split('@')
@@ -45,12 +87,67 @@ class EmailValidators:
     def is_disposable_email(self, email: str) -> bool:
 
         domain = email.split('@')[1].lower()
-        return domain in self.disposable_domains
+        return self.disposable.is_disposable_domain(domain)
+
+    def is_disposable_mx(self, mx_servers: Iterable[str]) -> bool:
+
+        return self.disposable.is_disposable_mx(mx_servers)
 
     def is_role_account(self, email: str) -> bool:
 
         local_part = email.split('@')[0].lower()
-        return any(prefix in local_part for prefix in self.role_account_prefixes)
+        return self._is_role_local_part(local_part)
+
+    def _role_patterns(self) -> Tuple[Pattern, Pattern]:
+        # recompiled only when the prefix set is changed
+        key = frozenset(self.role_account_prefixes)
+        if self._role_key != key:
+            self._role_key = key
+            self._role_res = compile_role_patterns(key)
+        return self._role_res
+
+    def _is_role_local_part(self, local_part: str) -> bool:
+        token_re, spaced_re = self._role_patterns()
+        return token_re.search(local_part) is not None or spaced_re.fullmatch(local_part) is not None
+
+    def prefilter(self, email: str) -> PrefilterResult:
+
+        return self.validate_batch([email])[0]
+
+    def validate_batch(self, emails: Iterable[str]) -> List[PrefilterResult]:
+        """Run the cheap local checks (normalize, syntax, disposable, role) over a
+        whole list in one pass. Disposable verdicts are computed once per domain."""
+        results = []
+        disposable_by_domain: Dict[str, bool] = {}
+        syntax_match = SYNTAX_RE.match
+        token_re, spaced_re = self._role_patterns()
+        role_search, role_fullmatch = token_re.search, spaced_re.fullmatch
+
+        for raw in emails:
+            try:
+                email = self.normalize_email(raw)
+            except (ValueError, AttributeError):
+                email = str(raw).lower().strip()
+
+            if not syntax_match(email):
+                results.append(PrefilterResult(email, False, False, False))
+                continue
+            local_part, domain = email.split('@')
+            if len(local_part) > 64 or len(domain) > 253 or '..' in local_part or '..' in domain:
+                results.append(PrefilterResult(email, False, False, False))
+                continue
+
+            is_disposable = disposable_by_domain.get(domain)
+            if is_disposable is None:
+                is_disposable = self.disposable.is_disposable_domain(domain)
+                disposable_by_domain[domain] = is_disposable
+            if is_disposable:
+                results.append(PrefilterResult(email, True, True, False))
+                continue
+
+            is_role = role_search(local_part) is not None or role_fullmatch(local_part) is not None
+            results.append(PrefilterResult(email, True, False, is_role))
+        return results
 
     def normalize_email(self, email: str) -> str:
 
@@ -1,175 +1,899 @@
 # app/core/verifier.py
 import asyncio
-from typing import List, Dict, Any
-from app.core.validators import EmailValidators
+import dataclasses
+import time
+from typing import List, Dict, Any, AsyncIterable, AsyncIterator, Iterable, Optional, Tuple
+from app.core.validators import EmailValidators, PrefilterResult
 from app.core.dns_check import DNSChecker
 from app.core.smtp_check import SMTPChecker
-from app.utils.cache import CacheManager
-from app.models.results import VerificationResult, VerificationStatus
+from app.utils.cache import CacheManager, CacheWriteBuffer, HashLayout, LocalTTLCache
+from app.utils.codec import decode_catch_all, decode_entry, decode_mx, encode_catch_all, encode_mx, encode_result
+from app.utils.helpers import SingleFlight
+from app.utils import metrics
+from app.utils.metrics import Stopwatch, observe_stage
+from app.models.results import DEPTH_RANKS, ResultRecord, VerificationDepth, VerificationStatus
 from config import Config
-from app.core.rate_limiter import DomainRateLimiter
+from app.core.rate_limiter import DomainRateLimiter, RedisRateLimiter
+from app.core.scheduler import DomainScheduler
+from app.core.providers import ProviderClassifier
+from app.core.congestion import CongestionController
+from app.core.circuit_breaker import HostCircuitBreaker
+from app.core.refresher import RefreshQueue
+from app.core.admission import (BACKGROUND, BULK, INTERACTIVE, PRIORITIES, AdmissionController,
+                                PrioritySemaphore, current_priority, prioritized)
 
 # keys and TTLs
 MX_CACHE_PREFIX = "mx:"
 EMAIL_CACHE_PREFIX = "email_verify:"
+CATCH_ALL_CACHE_PREFIX = "catch_all:"
 MX_CACHE_TTL = 60 * 60 * 24  # 24 hours
+NEGATIVE_CACHE_TTL = Config.NEGATIVE_CACHE_TTL  # NXDOMAIN / no MX
 RESULT_CACHE_TTL = Config.CACHE_TTL  # from config
+RESULT_CACHE_TTLS = Config.RESULT_CACHE_TTLS  # fresh lifetime per status
+RESULT_STALE_WINDOW = Config.RESULT_CACHE_STALE_WINDOW  # served stale (and refreshed) this much longer
+CATCH_ALL_CACHE_TTL = Config.CATCH_ALL_CACHE_TTL
+# limiter budget for buckets without a provider policy (see Config.PROVIDER_POLICIES)
+PER_DOMAIN_LIMIT = Config.PROVIDER_DEFAULT_MAX_CALLS  # default: 60/min
+# how far a check goes (see VerificationDepth)
+DEPTH_SYNTAX = VerificationDepth.SYNTAX.value
+DEPTH_DNS = VerificationDepth.DNS.value
+DEPTH_SMTP = VerificationDepth.SMTP.value
+DEPTH_FULL = VerificationDepth.FULL.value
 
 
 class EmailVerifier:
-    def __init__(self):
+    def __init__(self, redis_client=None, resolver=None):
+        # redis_client / resolver: injected stand-ins (benchmarks); built from Config otherwise
         self.validators = EmailValidators()
-        self.dns_checker = DNSChecker(Config.DNS_SERVERS)
-        self.smtp_checker = SMTPChecker(timeout=Config.SMTP_TIMEOUT, from_email=Config.FROM_EMAIL)
-        self.cache = CacheManager(Config.REDIS_HOST, Config.REDIS_PORT, Config.REDIS_DB)
-        self.global_semaphore = asyncio.Semaphore(Config.MAX_CONCURRENT_VERIFICATIONS)
+        self.dns_checker = DNSChecker(Config.DNS_SERVERS, resolver=resolver)
+        self.cache = CacheManager(
+            Config.REDIS_HOST, Config.REDIS_PORT, Config.REDIS_DB,
+            local_cache=LocalTTLCache(max_entries=Config.L1_CACHE_MAX_ENTRIES,
+                                      max_bytes=Config.L1_CACHE_MAX_BYTES,
+                                      default_ttl=Config.L1_CACHE_TTL),
+            client=redis_client
+        )
+        # cached results: packed strings unless CACHE_ENCODING=json, optionally as hash fields
+        self._compact = Config.CACHE_ENCODING != 'json'
+        self.result_layout = HashLayout(
+            EMAIL_CACHE_PREFIX, Config.RESULT_CACHE_HASH_BUCKETS,
+            generation_seconds=max([RESULT_CACHE_TTL, *RESULT_CACHE_TTLS.values()]) + RESULT_STALE_WINDOW
+        ) if Config.RESULT_CACHE_HASHED else None
+        # per-MX AIMD pacing learned from SMTP replies; limits persist in Redis
+        self.congestion = CongestionController(
+            self.cache.redis,
+            initial_rate=Config.CONGESTION_INITIAL_RATE,
+            min_rate=Config.CONGESTION_MIN_RATE,
+            max_rate=Config.CONGESTION_MAX_RATE,
+            initial_concurrency=Config.CONGESTION_INITIAL_CONCURRENCY,
+            max_concurrency=Config.CONGESTION_MAX_CONCURRENCY,
+            latency_target=Config.CONGESTION_LATENCY_TARGET
+        )
+        self.smtp_checker = SMTPChecker(timeout=Config.SMTP_TIMEOUT, from_email=Config.FROM_EMAIL,
+                                        port=Config.SMTP_PORT,
+                                        max_rcpt_per_session=Config.SMTP_MAX_RCPT_PER_SESSION,
+                                        rcpt_per_transaction=Config.SMTP_RCPT_PER_TRANSACTION,
+                                        congestion_controller=self.congestion,
+                                        hedge_delay=Config.SMTP_HEDGE_DELAY,
+                                        max_mx_attempts=Config.SMTP_MAX_MX_ATTEMPTS,
+                                        breaker=HostCircuitBreaker(
+                                            failure_threshold=Config.SMTP_BREAKER_FAILURES,
+                                            base_delay=Config.SMTP_BREAKER_BASE_DELAY,
+                                            max_delay=Config.SMTP_BREAKER_MAX_DELAY
+                                        ),
+                                        provider_label=lambda host: self.providers.provider_name(host))
+        # global slots, shared by priority class: signup checks aren't stuck behind bulk lists
+        self.global_semaphore = PrioritySemaphore(Config.MAX_CONCURRENT_VERIFICATIONS,
+                                                  weights=Config.PRIORITY_WEIGHTS,
+                                                  reserved=Config.PRIORITY_RESERVED)
+        # bounded backlog per class; beyond it requests are refused (HTTP 429) instead of queued
+        self.admission = AdmissionController(Config.ADMISSION_LIMITS)
         # domain limiter: default 60 calls per 60 seconds (1 per second)
-        self.domain_limiter = DomainRateLimiter(default_max_calls=60, window_seconds=60)
+        if Config.RATE_LIMIT_BACKEND == 'redis':
+            self.domain_limiter = RedisRateLimiter(self.cache.redis, default_max_calls=60, window_seconds=60,
+                                                   prefetch=Config.RATE_LIMIT_PREFETCH)
+        else:
+            self.domain_limiter = DomainRateLimiter(default_max_calls=60, window_seconds=60)
+        # SMTP work is throttled per receiving infrastructure (provider or MX host), not per domain
+        self.providers = ProviderClassifier.from_config(
+            Config.PROVIDER_POLICIES,
+            default_max_calls=PER_DOMAIN_LIMIT,
+            default_concurrency=Config.PROVIDER_DEFAULT_CONCURRENCY
+        )
+        # SMTP work is dispatched per bucket: limiter token, then the primary MX's
+        # congestion gate, then a global slot
+        self.scheduler = DomainScheduler(self.domain_limiter, self.global_semaphore,
+                                         max_calls=PER_DOMAIN_LIMIT,
+                                         concurrency=Config.PROVIDER_DEFAULT_CONCURRENCY,
+                                         gate=self.congestion)
+        # one catch-all probe per domain at a time, shared by every waiting verification
+        self._catch_all_flight = SingleFlight()
+        # concurrent verifications of the same normalized address share one pipeline run
+        self._verify_flight = SingleFlight()
+        # stale cache hits are answered at once and re-verified here, a few at a time
+        self.refresher = RefreshQueue(self._refresh, workers=Config.RESULT_REFRESH_WORKERS,
+                                      max_pending=Config.RESULT_REFRESH_MAX_PENDING)
+        self._register_metrics()
+
+    def _register_metrics(self):
+        """Gauges read at scrape time, so they cost nothing on the hot path."""
+        registry = metrics.REGISTRY
+
+        def by_bucket(values: Dict[str, int]) -> Dict[Tuple[str, ...], int]:
+            # provider buckets keep their name; per-MX/per-domain keys fold into "other"
+            folded: Dict[Tuple[str, ...], int] = {}
+            for key, value in values.items():
+                label = (key.split(':', 1)[1] if key.startswith('provider:') else 'other',)
+                folded[label] = folded.get(label, 0) + value
+            return folded
+
+        def cache_requests():
+            stats = self.cache.stats()
+            return {
+                ('l1', 'hit'): stats['l1']['hits'], ('l1', 'miss'): stats['l1']['misses'],
+                ('l2', 'hit'): stats['l2']['hits'], ('l2', 'miss'): stats['l2']['misses'],
+                ('l2', 'error'): stats['l2']['errors'],
+            }
 
-    async def _get_cached_mx(self, domain: str) -> List[str]:
+        registry.register(metrics.Gauge(
+            'email_verifier_global_slots_in_use', 'Global verification slots held, by priority class.',
+            ('priority',),
+            callback=lambda: {(p,): self.global_semaphore.in_use(p) for p in PRIORITIES}
+        ))
+        registry.register(metrics.Gauge(
+            'email_verifier_global_slots_waiting', 'Waiters for a global slot, by priority class.', ('priority',),
+            callback=lambda: {(p,): self.global_semaphore.waiting(p) for p in PRIORITIES}
+        ))
+        registry.register(metrics.Gauge(
+            'email_verifier_admission_backlog', 'Addresses admitted and not yet finished, by priority class.',
+            ('priority',),
+            callback=lambda: {(p,): self.admission.backlog(p) for p in PRIORITIES}
+        ))
+        registry.register(metrics.CallbackCounter(
+            'email_verifier_admission_rejected_total', 'Requests refused because their backlog was full.',
+            ('priority',),
+            callback=lambda: {(p,): self.admission.rejected[p] for p in PRIORITIES}
+        ))
+        registry.register(metrics.Gauge(
+            'email_verifier_scheduler_queued', 'SMTP jobs waiting per provider bucket.', ('bucket',),
+            callback=lambda: by_bucket(self.scheduler.depths())
+        ))
+        registry.register(metrics.Gauge(
+            'email_verifier_scheduler_lanes', 'Running scheduler lanes per provider bucket.', ('bucket',),
+            callback=lambda: by_bucket(self.scheduler.active())
+        ))
+        registry.register(metrics.Gauge(
+            'email_verifier_verifications_in_flight', 'Distinct addresses being verified.',
+            callback=lambda: {(): len(self._verify_flight)}
+        ))
+        registry.register(metrics.Gauge(
+            'email_verifier_cache_refresh_pending', 'Stale cached results waiting for or being re-verified.',
+            callback=lambda: {(): len(self.refresher)}
+        ))
+        registry.register(metrics.CallbackCounter(
+            'email_verifier_cache_refreshes_total', 'Background refreshes of stale cached results by outcome.',
+            ('outcome',),
+            callback=lambda: {(outcome,): value for outcome, value in self.refresher.stats().items()
+                              if outcome != 'pending'}
+        ))
+        registry.register(metrics.CallbackCounter(
+            'email_verifier_cache_requests_total', 'Cache lookups by tier and result.', ('tier', 'result'),
+            callback=cache_requests
+        ))
+
+    async def _get_cached_mx(self, domain: str) -> Optional[Tuple[bool, List[str]]]:
+        """Cached (domain is valid, MX servers), or None when the domain isn't cached."""
         key = MX_CACHE_PREFIX + domain
-        cached = await self.cache.get(key)
-        if cached and isinstance(cached, dict) and cached.get("mx"):
-            return cached.get("mx")
-        return []
+        return await self.cache.get(key, decode=self._decode_mx)
+
+    @staticmethod
+    def _decode_mx(key: str, payload: str) -> Optional[Tuple[bool, List[str]]]:
+        return decode_mx(payload)
 
     async def _set_cached_mx(self, domain: str, mx_servers: List[str]):
         key = MX_CACHE_PREFIX + domain
-        await self.cache.set(key, {"mx": mx_servers}, ttl=MX_CACHE_TTL)
+        await self.cache.set(key, encode_mx(True, mx_servers, self._compact), ttl=MX_CACHE_TTL, encode=str)
 
-    async def verify_single(self, email: str) -> VerificationResult:
-        """Verify a single email address with MX caching and domain-level rate limiting."""
-        # Normalize
-        email = self.validators.normalize_email(email)
+    async def _set_negative_mx(self, domain: str, domain_valid: bool):
+        key = MX_CACHE_PREFIX + domain
+        await self.cache.set(key, encode_mx(domain_valid, [], self._compact), ttl=NEGATIVE_CACHE_TTL, encode=str)
 
-        cache_key = EMAIL_CACHE_PREFIX + email
-        # check cached final result first
-        cached_result = await self.cache.get(cache_key)
-        if cached_result:
-            return VerificationResult(**cached_result)
+    @staticmethod
+    def _decode_result(key: str, payload: str) -> Optional[Tuple[ResultRecord, float]]:
+        return decode_entry(key[len(EMAIL_CACHE_PREFIX):], payload)
 
-        # Acquire global semaphore to control total concurrency
-        async with self.global_semaphore:
-            details = {
-                'syntax_valid': False,
-                'is_disposable': False,
-                'is_role_account': False,
-                'domain_verified': False,
-                'smtp_verified': False,
-                'is_catch_all': False,
-                'quality_score': 0
-            }
+    async def _get_cached_results(self, emails: Iterable[str], depth: str = DEPTH_FULL) -> Dict[str, ResultRecord]:
+        """Cached results by address, fetched in one round trip per chunk. Stale
+        results are returned as well, and queued for a background refresh. Results
+        checked less deeply than ``depth`` don't count."""
+        keys = [EMAIL_CACHE_PREFIX + email for email in emails]
+        if self.result_layout is not None:
+            found = await self.cache.hget_many(keys, self.result_layout, decode=self._decode_result)
+        else:
+            found = await self.cache.get_many(keys, decode=self._decode_result)
 
-            # Step 1: syntax
-            if not self.validators.validate_syntax(email):
-                result = self._create_result(email, VerificationStatus.INVALID, 0, details)
-                await self.cache.set(cache_key, result.dict(), ttl=RESULT_CACHE_TTL)
-                return result
-            details['syntax_valid'] = True
-
-            # Step 2: disposable/role
-            if self.validators.is_disposable_email(email):
-                details['is_disposable'] = True
-                result = self._create_result(email, VerificationStatus.DISPOSABLE, 20, details)
-                await self.cache.set(cache_key, result.dict(), ttl=RESULT_CACHE_TTL)
-                return result
-
-            if self.validators.is_role_account(email):
-                details['is_role_account'] = True
-
-            domain = email.split('@', 1)[1].lower()
-
-            # Step 3: MX cache check
-            mx_servers = await self._get_cached_mx(domain)
-            if not mx_servers:
-                # not cached -> check DNS
-                domain_result = await self.dns_checker.verify_domain(email)
-                if not domain_result['is_valid_domain']:
-                    result = self._create_result(email, VerificationStatus.INVALID, 30, details)
-                    await self.cache.set(cache_key, result.dict(), ttl=RESULT_CACHE_TTL)
-                    return result
-
-                details['domain_verified'] = True
-                mx_servers = domain_result.get('mx_servers', [])
-                # cache MX servers
-                if mx_servers:
-                    await self._set_cached_mx(domain, mx_servers)
+        now = time.time()
+        rank = DEPTH_RANKS[depth]
+        results = {}
+        for key, (result, fresh_until) in found.items():
+            if DEPTH_RANKS[result.details.get('depth', DEPTH_FULL)] < rank:
+                continue
+            email = key[len(EMAIL_CACHE_PREFIX):]
+            if fresh_until <= now:
+                self.refresher.schedule(email)
+            results[email] = result
+        return results
+
+    async def _store_results(self, results: Dict[str, ResultRecord], ttl: Optional[int] = None):
+        """Cache results, each fresh for its status' TTL (or ``ttl``) and kept
+        RESULT_STALE_WINDOW longer for stale-while-revalidate."""
+        by_ttl: Dict[int, Dict[str, ResultRecord]] = {}
+        for email, result in results.items():
+            fresh_ttl = ttl if ttl is not None else RESULT_CACHE_TTLS.get(result.status, RESULT_CACHE_TTL)
+            by_ttl.setdefault(fresh_ttl, {})[EMAIL_CACHE_PREFIX + email] = result
+
+        now = time.time()
+        for fresh_ttl, items in by_ttl.items():
+            fresh_until = now + fresh_ttl
+            hard_ttl = fresh_ttl + RESULT_STALE_WINDOW
+            if self.result_layout is not None:
+                # hash fields can't expire on their own: the expiry travels in the payload
+                expires_at = now + hard_ttl
+                await self.cache.hset_many(
+                    items, self.result_layout, ttl=hard_ttl,
+                    encode=lambda result: encode_result(result, expires_at, self._compact, fresh_until)
+                )
             else:
-                # we have cached MX - set domain_verified
-                details['domain_verified'] = True
-
-            # Step 4: SMTP check with domain rate limiting
-            if mx_servers:
-                # Determine per-domain limit: you can customize mapping for high-volume domains
-                # Example: Gmail is aggressive, set low concurrent calls per minute if you want
-                per_domain_limit = 60  # default: 60/min
-                # Acquire a slot in domain limiter (will wait if limit reached)
-                await self.domain_limiter.acquire(domain, max_calls=per_domain_limit)
-
-                # Use SMTP checker (tries multiple MX hosts)
-                smtp_result = await self.smtp_checker.verify_email_smtp(email, mx_servers)
-                status = smtp_result.get('status')
-
-                if status == 'valid':
-                    details['smtp_verified'] = True
-                    # check catch-all (quick check only on first MX)
-                    try:
-                        is_catch_all = await self.smtp_checker.detect_catch_all(domain, mx_servers[0])
-                        details['is_catch_all'] = is_catch_all
-                    except Exception:
-                        is_catch_all = False
-                    if is_catch_all:
-                        final_status = VerificationStatus.CATCH_ALL
-                        quality = 75
-                    else:
-                        final_status = VerificationStatus.VALID
-                        quality = 95
-                elif status == 'invalid':
-                    final_status = VerificationStatus.INVALID
-                    quality = 40
-                elif status in ('unknown', 'no_mx_servers', 'error'):
-                    final_status = VerificationStatus.RISKY
-                    quality = 65
+                await self.cache.set_many(
+                    items, ttl=hard_ttl,
+                    encode=lambda result: encode_result(result, compact=self._compact, fresh_until=fresh_until)
+                )
+
+    async def _refresh(self, email: str) -> ResultRecord:
+        """Re-verify a stale cached address live and cache the new verdict. Shares the
+        full check's flight, so it joins a live check of the address or is joined by one."""
+        check = self.validators.prefilter(email)
+        details = self._new_details()
+        result = self._precheck(check, details)
+        if result:
+            return result
+        with prioritized(BACKGROUND):
+            return await self._verify_flight.do(
+                self._flight_key(check.email, DEPTH_FULL),
+                lambda: self._verify_normalized(check.email, details, use_cache=False)
+            )
+
+    def _complete_later(self, email: str):
+        """Queue a full check of ``email`` on the refresher (background class, bounded)
+        unless one is already in flight, so a shallow answer still fills the cache."""
+        if self._verify_flight.get(email) is None:
+            self.refresher.schedule(email)
+
+    def _throttle_key(self, domain: str, mx_servers: List[str]) -> str:
+        """Scheduler/limiter key for a domain: its provider bucket, with that provider's
+        budget and concurrency registered on the scheduler."""
+        key, policy = self.providers.classify(domain, mx_servers)
+        if policy is not None and key not in self.scheduler.limits:
+            self.scheduler.limits[key] = policy.max_calls
+            self.scheduler.weights[key] = policy.concurrency
+        return key
+
+    @staticmethod
+    def _new_details() -> Dict[str, Any]:
+        return {
+            'syntax_valid': False,
+            'is_disposable': False,
+            'is_role_account': False,
+            'domain_verified': False,
+            'smtp_verified': False,
+            'is_catch_all': False,
+            'quality_score': 0,
+            'depth': DEPTH_FULL
+        }
+
+    def _precheck(self, check: PrefilterResult, details: Dict[str, Any]) -> Optional[ResultRecord]:
+        """Apply the local checks (syntax, disposable, role). Returns a final result or None to continue."""
+        email = check.email
+        # Step 1: syntax
+        if not check.syntax_valid:
+            return self._create_result(email, VerificationStatus.INVALID, 0, details)
+        details['syntax_valid'] = True
+
+        # Step 2: disposable/role
+        if check.is_disposable:
+            details['is_disposable'] = True
+            return self._create_result(email, VerificationStatus.DISPOSABLE, 20, details)
+
+        if check.is_role_account:
+            details['is_role_account'] = True
+
+        return None
+
+    async def _resolve_mx(self, email: str, domain: str) -> Tuple[Optional[bool], List[str]]:
+        """Returns (domain is valid, MX servers), using the MX cache when possible.
+        Validity is None when DNS itself failed (timeout / SERVFAIL)."""
+        # Step 3: MX cache check (positive and negative entries)
+        cached = await self._get_cached_mx(domain)
+        if cached is not None:
+            return cached
+
+        # not cached -> check DNS
+        started = time.perf_counter()
+        domain_result = await self.dns_checker.verify_domain(email)
+        observe_stage('dns', started)
+        if domain_result.get('dns_error'):
+            # not a verdict on the domain: nothing is cached
+            return None, []
+        if not domain_result['is_valid_domain']:
+            await self._set_negative_mx(domain, False)
+            return False, []
+
+        mx_servers = domain_result.get('mx_servers', [])
+        # cache MX servers
+        if mx_servers:
+            await self._set_cached_mx(domain, mx_servers)
+        else:
+            await self._set_negative_mx(domain, True)
+        return True, mx_servers
+
+    async def _finalize_smtp(self, email: str, domain: str, mx_servers: List[str],
+                             smtp_result: Dict[str, Any], details: Dict[str, Any],
+                             depth: str = DEPTH_FULL) -> ResultRecord:
+        status = smtp_result.get('status')
+
+        if status == 'valid':
+            details['smtp_verified'] = True
+            # catch-all is a domain property: cached per domain, probed on first MX
+            # (below full depth only a verdict already cached is used)
+            try:
+                if depth == DEPTH_FULL:
+                    is_catch_all = await self.get_catch_all(domain, mx_servers)
                 else:
-                    final_status = VerificationStatus.UNKNOWN
-                    quality = 50
+                    is_catch_all = await self.cache.get(CATCH_ALL_CACHE_PREFIX + domain,
+                                                        decode=self._decode_catch_all)
+                if is_catch_all is not None:
+                    details['is_catch_all'] = is_catch_all
+            except Exception:
+                is_catch_all = False
+            if is_catch_all is None:
+                # mailbox accepted, domain not probed: it may still turn out to be catch-all
+                details['depth'] = DEPTH_SMTP
+                final_status = VerificationStatus.VALID
+                quality = 85
+            elif is_catch_all:
+                final_status = VerificationStatus.CATCH_ALL
+                quality = 75
             else:
-                # no mx (rare, but handled)
-                final_status = VerificationStatus.RISKY
-                quality = 60
+                final_status = VerificationStatus.VALID
+                quality = 95
+        elif status == 'invalid':
+            final_status = VerificationStatus.INVALID
+            quality = 40
+        elif status in ('unknown', 'no_mx_servers', 'error'):
+            final_status = VerificationStatus.RISKY
+            quality = 65
+        else:
+            final_status = VerificationStatus.UNKNOWN
+            quality = 50
+
+        return self._create_result(email, final_status, quality, details)
+
+    async def _lookup_catch_all(self, domain: str, mx_servers: List[str]) -> bool:
+        key = CATCH_ALL_CACHE_PREFIX + domain
+        cached = await self.cache.get(key, decode=self._decode_catch_all)
+        if cached is not None:
+            return cached
+
+        gate_keys = self.smtp_checker.live_hosts(mx_servers)[:1]
+        # first MX that isn't behind an open circuit
+        mx_server = (gate_keys or mx_servers)[0]
 
-            details['quality_score'] = quality
-            result = self._create_result(email, final_status, quality, details)
+        async def probe() -> Optional[bool]:
+            started = time.perf_counter()
+            try:
+                return await self.smtp_checker.probe_catch_all(domain, mx_server)
+            finally:
+                observe_stage('catch_all_probe', started)
+
+        # a session like any other: provider budget and lanes, congestion gate, global slot
+        is_catch_all = await self.scheduler.run(self._throttle_key(domain, mx_servers), probe, gate_keys=gate_keys)
+        if is_catch_all is None:
+            # inconclusive probe: don't pin the domain verdict for a whole TTL
+            return False
+        await self.cache.set(key, encode_catch_all(is_catch_all, self._compact), ttl=CATCH_ALL_CACHE_TTL, encode=str)
+        return is_catch_all
+
+    @staticmethod
+    def _decode_catch_all(key: str, payload: str) -> Optional[bool]:
+        return decode_catch_all(payload)
+
+    async def get_catch_all(self, domain: str, mx_servers: List[str]) -> bool:
+        """Per-domain catch-all verdict: cached, and probed at most once concurrently.
+        Never call it from a scheduler job: the probe queues on the scheduler itself."""
+        return await self._catch_all_flight.do(domain, lambda: self._lookup_catch_all(domain, mx_servers))
+
+    async def prime_catch_all(self, domain_mx: Dict[str, List[str]]):
+        """Probe the catch-all status of several domains up front (e.g. before a bulk run)."""
+        # one MGET for the verdicts we already have; hits also land in the L1 cache
+        cached = await self.cache.get_many((CATCH_ALL_CACHE_PREFIX + domain for domain in domain_mx),
+                                           decode=self._decode_catch_all)
+        domain_mx = {domain: mx for domain, mx in domain_mx.items()
+                     if CATCH_ALL_CACHE_PREFIX + domain not in cached}
+
+        # each probe queues on the scheduler under the provider of the domain
+        await asyncio.gather(
+            *(self.get_catch_all(domain, mx) for domain, mx in domain_mx.items() if mx),
+            return_exceptions=True
+        )
 
-            # Cache final result
-            await self.cache.set(cache_key, result.dict(), ttl=RESULT_CACHE_TTL)
+    async def verify_single(self, email: str, priority: str = INTERACTIVE, depth: str = DEPTH_FULL,
+                            deadline: Optional[float] = None, background: bool = False) -> ResultRecord:
+        """Verify a single email address with MX caching and domain-level rate limiting.
+        Concurrent calls for the same normalized address wait on one shared run.
 
+        The check stops at ``depth``, or after ``deadline`` seconds with the best
+        verdict known by then; ``details['depth']`` says how far it got. With
+        ``background``, an answer short of full depth queues the full check to fill
+        the cache. Raises ``Overloaded`` when the backlog of ``priority`` is full."""
+        with self.admission.admit(priority), prioritized(priority):
+            # Normalize + local checks
+            check = self.validators.prefilter(email)
+            try:
+                result = await asyncio.wait_for(
+                    self._verify_prefiltered(check, depth, abandon=deadline is not None), deadline
+                )
+            except asyncio.TimeoutError:
+                result = (await self._best_known([check]))[check.email]
+        if background and self._is_partial(result):
+            self._complete_later(check.email)
+        return result
+
+    @staticmethod
+    def _is_partial(result: ResultRecord) -> bool:
+        return DEPTH_RANKS[result.details.get('depth', DEPTH_FULL)] < DEPTH_RANKS[DEPTH_FULL]
+
+    @staticmethod
+    def _flight_key(email: str, depth: str) -> str:
+        # checks of different depths don't share runs
+        return email if depth == DEPTH_FULL else f'{depth}:{email}'
+
+    async def _verify_prefiltered(self, check: PrefilterResult, depth: str = DEPTH_FULL,
+                                  abandon: bool = False) -> ResultRecord:
+        email = check.email
+        details = self._new_details()
+
+        # locally rejected addresses never touch the cache, the flight or a slot
+        result = self._precheck(check, details)
+        if result:
             return result
 
-    async def verify_bulk(self, emails: List[str]) -> List[VerificationResult]:
-        """Verify multiple emails concurrently but respecting global semaphore and per-domain limits."""
-        # create tasks but don't fire them all at once to avoid spike; let asyncio schedule
-        tasks = [self.verify_single(email) for email in emails]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        return await self._verify_flight.do(self._flight_key(email, depth),
+                                            lambda: self._verify_normalized(email, details, depth=depth),
+                                            abandon=abandon)
 
-        final_results = []
-        for res in results:
-            if isinstance(res, Exception):
-                final_results.append(VerificationResult(
-                    email="unknown",
-                    status=VerificationStatus.UNKNOWN,
-                    quality_score=0,
-                    details={'error': str(res)},
-                    is_verified=False
+    async def _verify_normalized(self, email: str, details: Dict[str, Any], use_cache: bool = True,
+                                 depth: str = DEPTH_FULL) -> ResultRecord:
+        watch = Stopwatch(keep=Config.DETAILS_TIMINGS)
+        # check cached final result first (fresh or stale: stale ones are refreshed in the background)
+        result = (await self._get_cached_results([email], depth)).get(email) if use_cache else None
+        started = watch.lap('cache', watch.started)
+        if result is not None:
+            if watch.timings is not None:
+                result.details['timings'] = dict(watch.breakdown(), cached=True)
+            return result
+        if depth == DEPTH_SYNTAX:
+            return self._with_timings(self._partial_result(email, DEPTH_SYNTAX, details), watch)
+
+        domain = email.split('@', 1)[1].lower()
+
+        # Acquire global semaphore to control total concurrency
+        async with self.global_semaphore:
+            started = watch.lap('dns_slot_wait', started)
+            domain_valid, mx_servers = await self._resolve_mx(email, domain)
+        started = watch.lap('mx', started)
+        if domain_valid is None:
+            return self._with_timings(self._dns_error_result(email, details), watch)
+        result = self._domain_result(email, domain_valid, mx_servers, details)
+        if result is not None:
+            result = self._with_timings(result, watch)
+            await self._store_results({email: result})
+            return result
+        if depth == DEPTH_DNS:
+            return self._with_timings(self._partial_result(email, DEPTH_DNS, details), watch)
+
+        # Step 4: SMTP check with domain rate limiting
+        # the scheduler waits for a limiter slot of the provider, then a global slot
+        smtp_result = await self.scheduler.run(
+            self._throttle_key(domain, mx_servers),
+            lambda: self._smtp_stage(email, mx_servers, watch, started),
+            gate_keys=self.smtp_checker.live_hosts(mx_servers)[:1]
+        )
+        # finalized outside the scheduler job: a catch-all probe queues as a session of its own
+        started = time.perf_counter()
+        result = await self._finalize_smtp(email, domain, mx_servers, smtp_result, details, depth)
+        watch.lap('catch_all', started)
+
+        # Cache final result
+        result = self._with_timings(result, watch)
+        await self._store_results({email: result})
+
+        return result
+
+    @staticmethod
+    def _with_timings(result: ResultRecord, watch: Stopwatch) -> ResultRecord:
+        if watch.timings is not None:
+            result.details['timings'] = watch.breakdown()
+        return result
+
+    async def _smtp_stage(self, email: str, mx_servers: List[str], watch: Optional[Stopwatch] = None,
+                          queued_at: Optional[float] = None) -> Dict[str, Any]:
+        watch = watch or Stopwatch()
+        # limiter, congestion gate and global slot
+        started = watch.lap('queue', queued_at) if queued_at is not None else time.perf_counter()
+        # Use SMTP checker (tries multiple MX hosts)
+        smtp_result = await self.smtp_checker.verify_email_smtp(email, mx_servers)
+        watch.lap('smtp', started)
+        return smtp_result
+
+    async def _smtp_batch_stage(self, emails: List[str], mx_servers: List[str]) -> Dict[str, Dict[str, Any]]:
+        started = time.perf_counter()
+        smtp_results = await self.smtp_checker.verify_email_smtp_batch(emails, mx_servers)
+        observe_stage('smtp_batch', started)
+        return smtp_results
+
+    async def _verify_mx_group(self, mx_servers: List[str], emails: List[str],
+                               details_map: Dict[str, Dict[str, Any]], writer: CacheWriteBuffer,
+                               results: Dict[str, ResultRecord], depth: str = DEPTH_FULL):
+        """SMTP-verify addresses sharing the same MX hosts, several recipients per session.
+        Each session is queued on the scheduler under the provider of those MX hosts
+        and takes one of its limiter tokens."""
+        session_size = Config.SMTP_MAX_RCPT_PER_SESSION
+        key = self._throttle_key(emails[0].split('@', 1)[1], mx_servers)
+        gate_keys = self.smtp_checker.live_hosts(mx_servers)[:1]
+
+        async def session(chunk: List[str]):
+            smtp_results = await self.scheduler.run(key, lambda: self._smtp_batch_stage(chunk, mx_servers),
+                                                    gate_keys=gate_keys)
+            # finalized outside the scheduler job: a catch-all probe queues as a session of its own
+            for email in chunk:
+                domain = email.split('@', 1)[1]
+                smtp_result = smtp_results.get(email, {'status': 'error'})
+                result = await self._finalize_smtp(email, domain, mx_servers, smtp_result, details_map[email], depth)
+                await writer.add(email, result)
+                results[email] = result
+
+        chunks = [emails[i:i + session_size] for i in range(0, len(emails), session_size)]
+        outcomes = await asyncio.gather(*(session(chunk) for chunk in chunks), return_exceptions=True)
+        for chunk, outcome in zip(chunks, outcomes):
+            if isinstance(outcome, Exception):
+                for email in chunk:
+                    results.setdefault(email, self._error_result(email, outcome))
+
+    async def _verify_batched(self, emails: List[str], details_map: Dict[str, Dict[str, Any]],
+                              depth: str = DEPTH_FULL,
+                              results: Optional[Dict[str, ResultRecord]] = None) -> Dict[str, ResultRecord]:
+        """Verify normalized, de-duplicated addresses that passed the local checks,
+        grouping SMTP work by domain and MX. Results land in ``results`` as they are
+        settled, so a caller that stops waiting keeps the ones already finished."""
+        results = {} if results is None else results
+        by_domain: Dict[str, List[str]] = {}
+        # no fixed TTL: _store_results picks one per status
+        writer = CacheWriteBuffer(self.cache, ttl=None, batch_size=Config.CACHE_WRITE_BATCH,
+                                  write=self._store_results)
+
+        # all cached results in a few round trips before any live work
+        started = time.perf_counter()
+        cached_results = await self._get_cached_results(emails, depth)
+        observe_stage('cache_batch', started)
+
+        for email in emails:
+            cached_result = cached_results.get(email)
+            if cached_result is not None:
+                results[email] = cached_result
+            elif depth == DEPTH_SYNTAX:
+                results[email] = self._partial_result(email, DEPTH_SYNTAX, details_map[email])
+            else:
+                by_domain.setdefault(email.split('@', 1)[1].lower(), []).append(email)
+
+        # resolve each domain once (cached MX in one batch) and group addresses by their MX hosts
+        domains = list(by_domain)
+        cached_mx = await self.cache.get_many((MX_CACHE_PREFIX + domain for domain in domains), decode=self._decode_mx)
+
+        async def resolve(domain: str):
+            cached = cached_mx.get(MX_CACHE_PREFIX + domain)
+            if cached is not None:
+                return cached
+            async with self.global_semaphore:
+                return await self._resolve_mx(by_domain[domain][0], domain)
+
+        resolved = await asyncio.gather(*(resolve(d) for d in domains), return_exceptions=True)
+
+        by_mx: Dict[Tuple[str, ...], List[str]] = {}
+        domain_mx: Dict[str, List[str]] = {}
+        try:
+            for domain, outcome in zip(domains, resolved):
+                for email in by_domain[domain]:
+                    details = details_map[email]
+                    if isinstance(outcome, Exception):
+                        results[email] = self._error_result(email, outcome)
+                        continue
+
+                    domain_valid, mx_servers = outcome
+                    if domain_valid is None:
+                        results[email] = self._dns_error_result(email, details)
+                        continue
+                    result = self._domain_result(email, domain_valid, mx_servers, details)
+                    if result is None:
+                        if depth == DEPTH_DNS:
+                            results[email] = self._partial_result(email, DEPTH_DNS, details)
+                            continue
+                        by_mx.setdefault(tuple(mx_servers), []).append(email)
+                        if depth == DEPTH_FULL:
+                            # the only depth that probes for catch-all
+                            domain_mx[domain] = mx_servers
+                        continue
+
+                    await writer.add(email, result)
+                    results[email] = result
+
+            groups = list(by_mx.items())
+            # catch-all probes run once per domain alongside the recipient sessions;
+            # finalizing a valid address joins the in-flight probe instead of starting one
+            prime = asyncio.ensure_future(self.prime_catch_all(domain_mx))
+            try:
+                outcomes = await asyncio.gather(
+                    *(self._verify_mx_group(list(mx), group, details_map, writer, results, depth)
+                      for mx, group in groups),
+                    return_exceptions=True
+                )
+                await prime
+            finally:
+                prime.cancel()
+            for (mx, group), outcome in zip(groups, outcomes):
+                if isinstance(outcome, Exception):
+                    for email in group:
+                        results.setdefault(email, self._error_result(email, outcome))
+        finally:
+            # also when cancelled on a deadline: finished results still reach the cache
+            await writer.flush()
+        return results
+
+    async def verify_bulk(self, emails: List[str], priority: str = BULK, depth: str = DEPTH_FULL,
+                          deadline: Optional[float] = None, background: bool = False) -> List[ResultRecord]:
+        """Verify multiple emails, sharing DNS lookups and SMTP sessions between addresses
+        on the same domain/MX while respecting global and per-domain limits.
+
+        Duplicates (after normalization) are verified once, and addresses already being
+        verified by another caller are joined rather than re-run. Results come back in
+        input order with the caller's original spelling of each address. ``depth``,
+        ``deadline`` (for the whole list) and ``background`` work as in ``verify_single``.
+        All the work runs under ``priority``; raises ``Overloaded`` when that class'
+        backlog is full.
+        """
+        with self.admission.admit(priority, len(emails)), prioritized(priority):
+            return await self._verify_bulk(emails, depth, deadline, background)
+
+    async def _verify_bulk(self, emails: List[str], depth: str = DEPTH_FULL, deadline: Optional[float] = None,
+                           background: bool = False) -> List[ResultRecord]:
+        loop = asyncio.get_running_loop()
+        expires = loop.time() + deadline if deadline is not None else None
+        # local checks for the whole list first: rejects are final before anything is scheduled
+        checks = self.validators.validate_batch(emails)
+
+        results: Dict[str, ResultRecord] = {}
+        details_map: Dict[str, Dict[str, Any]] = {}
+        pending: Dict[str, PrefilterResult] = {}
+        for check in checks:
+            if check.email in results or check.email in details_map:
+                continue
+            details = self._new_details()
+            result = self._precheck(check, details)
+            if result:
+                results[check.email] = result
+            else:
+                details_map[check.email] = details
+                pending[check.email] = check
+
+        joined = {email: self._verify_flight.get(self._flight_key(email, depth)) for email in details_map}
+        joined = {email: future for email, future in joined.items() if future is not None}
+        own = [email for email in details_map if email not in joined]
+        claimed = {email: self._verify_flight.claim(self._flight_key(email, depth)) for email in own}
+
+        verified: Dict[str, ResultRecord] = {}
+        error = None
+        timed_out = False
+        try:
+            await asyncio.wait_for(self._verify_batched(own, details_map, depth, verified), deadline)
+        except asyncio.TimeoutError:
+            timed_out = True
+        except Exception as e:
+            error = e
+        finally:
+            # always settle claimed futures, so callers that joined them never hang
+            for email, future in claimed.items():
+                if future.done():
+                    continue
+                if email in verified:
+                    future.set_result(verified[email])
+                elif timed_out:
+                    # a partial answer is only good enough for this caller: joiners check for themselves
+                    self._verify_flight.abandon(future)
+                else:
+                    future.set_result(self._error_result(email, error or RuntimeError('not verified')))
+        results.update(verified)
+        if timed_out:
+            # out of time: whatever finished stands, the rest get the best verdict known so far
+            results.update(await self._best_known([pending[email] for email in own if email not in verified]))
+
+        if joined:
+            # through the flight, so a run its owner abandons is picked up here
+            tasks = {
+                email: asyncio.ensure_future(self._verify_flight.do(
+                    self._flight_key(email, depth),
+                    lambda email=email: self._verify_normalized(email, details_map[email], depth=depth),
+                    abandon=expires is not None
                 ))
+                for email in joined
+            }
+            timeout = None if expires is None else max(0.0, expires - loop.time())
+            await asyncio.wait(tasks.values(), timeout=timeout)
+            late = []
+            for email, task in tasks.items():
+                if not task.done():
+                    task.cancel()
+                    late.append(pending[email])
+                elif task.exception() is not None:
+                    results[email] = self._error_result(email, task.exception())
+                else:
+                    results[email] = task.result()
+            if late:
+                results.update(await self._best_known(late))
+
+        final_results = []
+        for original, check in zip(emails, checks):
+            res = results.get(check.email)
+            if res is None:
+                res = self._error_result(original, error or RuntimeError('not verified'))
             else:
-                final_results.append(res)
+                if background and self._is_partial(res):
+                    self._complete_later(check.email)
+                if res.email != original:
+                    res = dataclasses.replace(res, email=original)
+            final_results.append(res)
         return final_results
 
-    def _create_result(self, email: str, status: VerificationStatus, quality_score: int, details: Dict[str, Any]) -> VerificationResult:
-        return VerificationResult(
+    async def verify_stream(self, emails: AsyncIterable[str], max_pending: int = None,
+                            priority: str = BULK) -> AsyncIterator[ResultRecord]:
+        """Verify addresses as they arrive and yield results in completion order.
+
+        At most ``max_pending`` addresses are in flight or waiting to be consumed, so
+        memory stays flat however long the input is, and a slow reader applies
+        backpressure all the way to the input. The stream counts as ``max_pending``
+        addresses of ``priority`` against admission for its whole duration.
+        """
+        if max_pending is None:
+            max_pending = Config.STREAM_MAX_PENDING
+        with self.admission.admit(priority, max_pending):
+            async for result in self._stream(emails, max_pending, priority):
+                yield result
+
+    async def _stream(self, emails: AsyncIterable[str], max_pending: int,
+                      priority: str) -> AsyncIterator[ResultRecord]:
+        slots = asyncio.Semaphore(max_pending)
+        done: asyncio.Queue = asyncio.Queue()
+        feed_finished = object()
+
+        async def verify(check: PrefilterResult) -> ResultRecord:
+            try:
+                return await self._verify_prefiltered(check)
+            except Exception as e:
+                return self._error_result(check.email, e)
+
+        async def feed() -> int:
+            # the feeder runs in its own task: verifications it spawns inherit the class
+            current_priority.set(priority)
+            submitted = 0
+            loop = asyncio.get_running_loop()
+            async for email in emails:
+                await slots.acquire()
+                check = self.validators.prefilter(email)
+                if check.rejected:
+                    # resolved on the spot, no task scheduled
+                    future = loop.create_future()
+                    future.set_result(self._precheck(check, self._new_details()))
+                    done.put_nowait(future)
+                else:
+                    task = asyncio.ensure_future(verify(check))
+                    task.add_done_callback(done.put_nowait)
+                submitted += 1
+            return submitted
+
+        feeder = asyncio.ensure_future(feed())
+        feeder.add_done_callback(lambda _: done.put_nowait(feed_finished))
+
+        yielded = 0
+        try:
+            while not (feeder.done() and yielded == feeder.result()):
+                item = await done.get()
+                if item is feed_finished:
+                    # re-raises input errors (bad body, client disconnect)
+                    feeder.result()
+                    continue
+                yielded += 1
+                slots.release()
+                yield item.result()
+        finally:
+            feeder.cancel()
+
+    def _disposable_mx_result(self, email: str, details: Dict[str, Any]) -> ResultRecord:
+        # domain not on the list, but its mail is handled by disposable-mail infrastructure
+        details['is_disposable'] = True
+        details['disposable_mx'] = True
+        return self._create_result(email, VerificationStatus.DISPOSABLE, 20, details)
+
+    def _dns_error_result(self, email: str, details: Dict[str, Any]) -> ResultRecord:
+        # DNS timed out or failed: unknown rather than invalid, and left uncached
+        details['dns_error'] = True
+        return self._create_result(email, VerificationStatus.UNKNOWN, 50, details)
+
+    def _domain_result(self, email: str, domain_valid: bool, mx_servers: List[str],
+                       details: Dict[str, Any]) -> Optional[ResultRecord]:
+        """The verdict when the domain alone settles it, or None when the mailbox
+        still has to be checked over SMTP."""
+        if not domain_valid:
+            return self._create_result(email, VerificationStatus.INVALID, 30, details)
+        details['domain_verified'] = True
+        if self.validators.is_disposable_mx(mx_servers):
+            return self._disposable_mx_result(email, details)
+        if not mx_servers:
+            # no mx (rare, but handled)
+            return self._create_result(email, VerificationStatus.RISKY, 60, details)
+        return None
+
+    def _partial_result(self, email: str, depth: str, details: Dict[str, Any]) -> ResultRecord:
+        # stopped before the mailbox was checked: nothing rules the address in or out yet
+        details['depth'] = depth
+        quality = 70 if depth == DEPTH_DNS else 50
+        return self._create_result(email, VerificationStatus.UNKNOWN, quality, details)
+
+    async def _best_known(self, checks: List[PrefilterResult]) -> Dict[str, ResultRecord]:
+        """Verdicts from the local checks and cached domain facts alone, for addresses
+        whose deadline passed before their own check finished."""
+        domains = {check.email: check.email.split('@', 1)[1].lower() for check in checks}
+        cached_mx = await self.cache.get_many({MX_CACHE_PREFIX + domain for domain in domains.values()},
+                                              decode=self._decode_mx)
+        results = {}
+        for check in checks:
+            details = self._new_details()
+            result = self._precheck(check, details)
+            if result is None:
+                cached = cached_mx.get(MX_CACHE_PREFIX + domains[check.email])
+                if cached is None:
+                    result = self._partial_result(check.email, DEPTH_SYNTAX, details)
+                else:
+                    result = self._domain_result(check.email, cached[0], cached[1], details) or \
+                        self._partial_result(check.email, DEPTH_DNS, details)
+            results[check.email] = result
+        return results
+
+    @staticmethod
+    def _error_result(email: str, error: BaseException) -> ResultRecord:
+        metrics.RESULTS.inc(('error',))
+        return ResultRecord(
+            email=email,
+            status=VerificationStatus.UNKNOWN.value,
+            quality_score=0,
+            details={'error': str(error)},
+            is_verified=False
+        )
+
+    def _create_result(self, email: str, status: VerificationStatus, quality_score: int, details: Dict[str, Any]) -> ResultRecord:
+        metrics.RESULTS.inc((status.value,))
+        # the codec rebuilds details['quality_score'] from the score: live answers must match cached ones
+        details['quality_score'] = quality_score
+        return ResultRecord(
             email=email,
-            status=status,
+            status=status.value,
             quality_score=quality_score,
             details=details,
             is_verified=status in [VerificationStatus.VALID, VerificationStatus.CATCH_ALL]
@@ -0,0 +1,33 @@
+from pydantic import BaseModel
+from typing import Optional, Dict, Any, List
+from enum import Enum
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    CANCELLED = "cancelled"
+
+
+class JobInfo(BaseModel):
+    job_id: str
+    status: JobStatus
+    total: int
+    processed: int
+    valid_count: int
+    progress: float
+    created_at: float
+    updated_at: float
+
+    class Config:
+        use_enum_values = True
+
+
+class JobResultsPage(BaseModel):
+    job_id: str
+    offset: int
+    limit: int
+    total: int
+    # None for positions that haven't been verified yet
+    data: List[Optional[Dict[str, Any]]]
@@ -1,3 +1,4 @@
+from dataclasses import dataclass
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
 from enum import Enum
@@ -13,6 +14,18 @@ class VerificationStatus(str, Enum):
     ROLE_ACCOUNT = "role_account"
 
 
+class VerificationDepth(str, Enum):
+    """How far a verification goes; every level includes the ones before it."""
+    SYNTAX = "syntax"  # local checks: syntax, disposable list, role accounts
+    DNS = "dns"  # + domain and MX records
+    SMTP = "smtp"  # + RCPT probe of the mailbox
+    FULL = "full"  # + catch-all probe of the domain
+
+
+# shallow to deep: a result of depth d answers any request for a depth ranked at most d
+DEPTH_RANKS = {depth.value: rank for rank, depth in enumerate(VerificationDepth)}
+
+
 class VerificationResult(BaseModel):
     email: str
     status: VerificationStatus
@@ -21,4 +34,28 @@ class VerificationResult(BaseModel):
     is_verified: bool
 
     class Config:
-        use_enum_values = True
\ No newline at end of file
+        use_enum_values = True
+
+
+@dataclass
+class ResultRecord:
+    """What the verifier hands to the API layer: the fields of ``VerificationResult``
+    without pydantic validation on every construction. ``status`` holds the plain
+    string value. ``VerificationResult`` remains the schema published by the API.
+
+    Deliberately not ``slots=True``: orjson serializes dataclasses through their
+    ``__dict__`` about twice as fast as through slots."""
+    email: str
+    status: str
+    quality_score: int
+    details: Dict[str, Any]
+    is_verified: bool
+
+    def dict(self) -> Dict[str, Any]:
+        return {
+            'email': self.email,
+            'status': self.status,
+            'quality_score': self.quality_score,
+            'details': dict(self.details),
+            'is_verified': self.is_verified,
+        }
@@ -1,41 +1,387 @@
 # app/utils/cache.py
 import json
-from typing import Optional, Any
+import sys
+import time
+import zlib
+from collections import OrderedDict
+from typing import Optional, Any, Callable, Dict, Iterable, List, Tuple
 import redis.asyncio as redis
 
+# rough per-entry overhead of the OrderedDict slot, key object and tuple
+ENTRY_OVERHEAD = 120
+
+# payload codecs: ``encode(value) -> str`` and ``decode(key, payload) -> value``,
+# where a decoded None counts as a miss
+Encoder = Callable[[Any], str]
+Decoder = Callable[[str, str], Any]
+
+
+def json_encode(value: Any) -> str:
+    return json.dumps(value)
+
+
+def json_decode(key: str, payload: str) -> Any:
+    return json.loads(payload)
+
+
+class LocalTTLCache:
+    """Bounded in-process LRU cache with per-entry TTL.
+
+    Values are kept as the JSON payload stored in Redis, so hits never share mutable
+    objects between callers and ``bytes`` is a close estimate of the memory used.
+    """
+
+    def __init__(self, max_entries: int = 100_000, max_bytes: int = 64 * 1024 * 1024, default_ttl: int = 300):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._data: "OrderedDict[str, Tuple[float, int, str]]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, size, payload = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return payload
+
+    def set(self, key: str, payload: str, ttl: Optional[int] = None):
+        ttl = self.default_ttl if ttl is None else min(ttl, self.default_ttl)
+        if ttl <= 0:
+            return
+
+        size = sys.getsizeof(payload) + len(key) + ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+
+        if key in self._data:
+            self._remove(key)
+        self._data[key] = (time.monotonic() + ttl, size, payload)
+        self.bytes += size
+
+        while len(self._data) > self.max_entries or self.bytes > self.max_bytes:
+            oldest = next(iter(self._data))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def delete(self, key: str):
+        if key in self._data:
+            self._remove(key)
+
+    def clear(self):
+        self._data.clear()
+        self.bytes = 0
+
+    def _remove(self, key: str):
+        _, size, _ = self._data.pop(key)
+        self.bytes -= size
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'entries': len(self._data),
+            'bytes': self.bytes,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
 
 class CacheManager:
-    """Async Redis cache manager using redis.asyncio."""
+    """Async Redis cache manager using redis.asyncio.
+
+    An optional ``LocalTTLCache`` acts as L1 in front of Redis (L2): reads check it
+    first and fill it from Redis hits, writes go to both tiers. Values are JSON by
+    default; callers with a more compact format pass their own ``encode``/``decode``.
+    Both tiers hold the encoded payload.
+    """
 
-    def __init__(self, host: str = 'localhost', port: int = 6379, db: int = 0, decode_responses: bool = True):
-        self.redis = redis.Redis(host=host, port=port, db=db, decode_responses=decode_responses)
+    def __init__(self, host: str = 'localhost', port: int = 6379, db: int = 0, decode_responses: bool = True,
+                 local_cache: Optional[LocalTTLCache] = None, client=None):
+        # ``client``: an existing (e.g. shared or fake) async Redis client to use instead
+        self.redis = client or redis.Redis(host=host, port=port, db=db, decode_responses=decode_responses)
+        self.local = local_cache
+        self.l2_hits = 0
+        self.l2_misses = 0
+        self.l2_errors = 0
+
+    async def get(self, key: str, decode: Decoder = json_decode) -> Optional[Any]:
+        if self.local is not None:
+            payload = self.local.get(key)
+            value = decode(key, payload) if payload is not None else None
+            if value is not None:
+                return value
 
-    async def get(self, key: str) -> Optional[Any]:
         try:
             value = await self.redis.get(key)
-            if not value:
-                return None
-            return json.loads(value)
         except Exception:
+            self.l2_errors += 1
             return None
 
-    async def set(self, key: str, value: Any, ttl: int = 86400) -> bool:
+        if not value:
+            self.l2_misses += 1
+            return None
+        self.l2_hits += 1
+
+        try:
+            result = decode(key, value)
+        except Exception:
+            return None
+        if self.local is not None and result is not None:
+            self.local.set(key, value)
+        return result
+
+    async def set(self, key: str, value: Any, ttl: int = 86400, encode: Encoder = json_encode) -> bool:
+        try:
+            payload = encode(value)
+        except Exception:
+            return False
+
+        if self.local is not None:
+            self.local.set(key, payload, ttl)
+
         try:
-            payload = json.dumps(value)
             await self.redis.setex(key, ttl, payload)
             return True
         except Exception:
+            self.l2_errors += 1
+            return False
+
+    def _local_hits(self, keys: Iterable[str], decode: Decoder) -> Tuple[Dict[str, Any], List[str]]:
+        found: Dict[str, Any] = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            payload = self.local.get(key) if self.local is not None else None
+            value = decode(key, payload) if payload is not None else None
+            if value is not None:
+                found[key] = value
+            else:
+                missing.append(key)
+        return found, missing
+
+    def _l2_hit(self, found: Dict[str, Any], key: str, payload: Optional[str], decode: Decoder) -> bool:
+        """Decode one L2 payload into ``found``; False for a miss or an unusable payload."""
+        if not payload:
+            self.l2_misses += 1
             return False
+        try:
+            value = decode(key, payload)
+        except Exception:
+            value = None
+        if value is None:
+            self.l2_misses += 1
+            return False
+        self.l2_hits += 1
+        found[key] = value
+        if self.local is not None:
+            self.local.set(key, payload)
+        return True
+
+    async def get_many(self, keys: Iterable[str], chunk_size: int = 1000,
+                       decode: Decoder = json_decode) -> Dict[str, Any]:
+        """Look up many keys with one MGET per ``chunk_size`` keys; returns only the hits."""
+        found, missing = self._local_hits(keys, decode)
+
+        for i in range(0, len(missing), chunk_size):
+            chunk = missing[i:i + chunk_size]
+            try:
+                values = await self.redis.mget(chunk)
+            except Exception:
+                self.l2_errors += 1
+                continue
+
+            for key, value in zip(chunk, values):
+                self._l2_hit(found, key, value, decode)
+
+        return found
+
+    def _encode_many(self, items: Dict[str, Any], ttl: int, encode: Encoder) -> Dict[str, str]:
+        payloads = {}
+        for key, value in items.items():
+            try:
+                payloads[key] = encode(value)
+            except Exception:
+                continue
+            if self.local is not None:
+                self.local.set(key, payloads[key], ttl)
+        return payloads
+
+    async def set_many(self, items: Dict[str, Any], ttl: int = 86400, chunk_size: int = 1000,
+                       encode: Encoder = json_encode) -> bool:
+        """Write many keys through pipelined SETEX calls, one round trip per ``chunk_size``."""
+        payloads = self._encode_many(items, ttl, encode)
+
+        ok = True
+        keys = list(payloads)
+        for i in range(0, len(keys), chunk_size):
+            try:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    for key in keys[i:i + chunk_size]:
+                        pipe.setex(key, ttl, payloads[key])
+                    await pipe.execute()
+            except Exception:
+                self.l2_errors += 1
+                ok = False
+        return ok
+
+    async def hget_many(self, keys: Iterable[str], layout: "HashLayout", chunk_size: int = 1000,
+                        decode: Decoder = json_decode) -> Dict[str, Any]:
+        """``get_many`` for entries stored as hash fields by ``layout``. Keys stay the
+        L1 keys; fields that fail to decode (e.g. past their embedded expiry) are
+        dropped from Redis on the way."""
+        found, missing = self._local_hits(keys, decode)
+
+        for i in range(0, len(missing), chunk_size):
+            chunk = missing[i:i + chunk_size]
+            locations = [layout.read_locations(key) for key in chunk]
+            try:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    for key_locations in locations:
+                        for hash_key, field in key_locations:
+                            pipe.hget(hash_key, field)
+                    values = iter(await pipe.execute())
+            except Exception:
+                self.l2_errors += 1
+                continue
+
+            stale = []
+            for key, key_locations in zip(chunk, locations):
+                # newest generation first; the replies for every location are consumed
+                replies = [next(values) for _ in key_locations]
+                for (hash_key, field), value in zip(key_locations, replies):
+                    if value:
+                        if not self._l2_hit(found, key, value, decode):
+                            stale.append((hash_key, field))
+                        break
+                else:
+                    self.l2_misses += 1
+            if stale:
+                try:
+                    async with self.redis.pipeline(transaction=False) as pipe:
+                        for hash_key, field in stale:
+                            pipe.hdel(hash_key, field)
+                        await pipe.execute()
+                except Exception:
+                    self.l2_errors += 1
+
+        return found
+
+    async def hset_many(self, items: Dict[str, Any], layout: "HashLayout", ttl: int = 86400,
+                        chunk_size: int = 1000, encode: Encoder = json_encode) -> bool:
+        """``set_many`` for entries stored as hash fields by ``layout``. Redis can't
+        expire single fields, so ``encode`` must embed the expiry in the payload."""
+        payloads = self._encode_many(items, ttl, encode)
+
+        ok = True
+        keys = list(payloads)
+        for i in range(0, len(keys), chunk_size):
+            touched = set()
+            try:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    for key in keys[i:i + chunk_size]:
+                        hash_key, field = layout.write_location(key)
+                        pipe.hset(hash_key, field, payloads[key])
+                        touched.add(hash_key)
+                    for hash_key in touched:
+                        pipe.expire(hash_key, layout.hash_ttl)
+                    await pipe.execute()
+            except Exception:
+                self.l2_errors += 1
+                ok = False
+        return ok
 
     async def delete(self, key: str) -> bool:
+        if self.local is not None:
+            self.local.delete(key)
         try:
             await self.redis.delete(key)
             return True
         except Exception:
             return False
 
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Hit/miss/eviction counters per tier."""
+        return {
+            'l1': self.local.stats() if self.local is not None else {},
+            'l2': {'hits': self.l2_hits, 'misses': self.l2_misses, 'errors': self.l2_errors},
+        }
+
     async def close(self):
         try:
             await self.redis.close()
         except Exception:
             pass
+
+
+class HashLayout:
+    """Stores flat ``prefix``-ed keys as fields of a fixed number of Redis hashes.
+
+    Small hashes use Redis' compact listpack encoding, which costs far less than one
+    top-level key per entry. The bucket comes from a CRC of the key, so hashes stay
+    evenly sized (keep ``buckets`` near entries / 100 to stay under the default
+    ``hash-max-listpack-entries`` of 128). Writes go to the hash of the current
+    ``generation``; reads also check the previous one. Each hash expires two
+    generations after its last write, which bounds how long fields that are never
+    read again can linger.
+    """
+
+    def __init__(self, prefix: str, buckets: int = 65536, generation_seconds: int = 86400):
+        self.prefix = prefix
+        self.buckets = buckets
+        self.generation_seconds = generation_seconds
+        self.hash_ttl = 2 * generation_seconds
+
+    def _hash_key(self, generation: int, field: str) -> str:
+        return f'{self.prefix}h:{generation}:{zlib.crc32(field.encode()) % self.buckets}'
+
+    def write_location(self, key: str) -> Tuple[str, str]:
+        field = key[len(self.prefix):]
+        return self._hash_key(int(time.time() // self.generation_seconds), field), field
+
+    def read_locations(self, key: str) -> List[Tuple[str, str]]:
+        field = key[len(self.prefix):]
+        generation = int(time.time() // self.generation_seconds)
+        return [(self._hash_key(generation, field), field), (self._hash_key(generation - 1, field), field)]
+
+
+class CacheWriteBuffer:
+    """Collects writes and flushes them in batches, through ``CacheManager.set_many``
+    unless another ``write(items, ttl=...)`` coroutine is given."""
+
+    def __init__(self, cache: CacheManager, ttl: Optional[int] = 86400, batch_size: int = 500,
+                 write: Optional[Callable[..., Any]] = None):
+        self.cache = cache
+        self.ttl = ttl
+        self.batch_size = batch_size
+        self.write = write or cache.set_many
+        self._pending: Dict[str, Any] = {}
+
+    async def add(self, key: str, value: Any):
+        self._pending[key] = value
+        if len(self._pending) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        if not self._pending:
+            return
+        items, self._pending = self._pending, {}
+        await self.write(items, ttl=self.ttl)
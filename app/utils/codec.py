@@ -0,0 +1,211 @@
+# app/utils/codec.py
+"""Compact cache encodings for verification results and domain facts.
+
+A cached result used to be the JSON of ``VerificationResult.dict()`` (~280 bytes
+per address). Everything in it is either implied by the cache key (the address),
+derived from the status (``is_verified``) or a boolean, so it packs into a short
+versioned string::
+
+    1|v|95|3b                  version | status | quality score | detail flags and depth (hex)
+    1|v|95|3b|1c7c7fb|1c7c5c3  ... | hard expiry | fresh until (minutes since the epoch, hex)
+
+The depth a result was verified to (``details['depth']``) sits in the two bits
+above the flags, counted down from ``full`` so entries written before depths
+existed read as full. The hard expiry is only written for the hash layout (Redis
+expires plain keys); past "fresh until" a result is stale: still served, but due
+for a refresh.
+
+Domain facts get the same treatment: ``1|mx1.example.com,mx2.example.com`` for MX
+hosts, ``1|-`` / ``1|0`` for a domain without MX / an invalid one, and ``1|1`` /
+``1|0`` for the catch-all verdict. Decoders still accept the old JSON payloads so
+existing cache entries stay readable until they expire, and every encoder can
+still write them (``compact=False``).
+
+Decoding builds ``ResultRecord`` objects directly: the fields were checked when
+the result was first produced, so hits skip pydantic validation entirely.
+"""
+import json
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.models.results import DEPTH_RANKS, ResultRecord, VerificationDepth, VerificationResult, VerificationStatus
+
+VERSION = '1'
+
+STATUS_CODES = {
+    VerificationStatus.VALID.value: 'v',
+    VerificationStatus.INVALID.value: 'i',
+    VerificationStatus.RISKY.value: 'r',
+    VerificationStatus.UNKNOWN.value: 'u',
+    VerificationStatus.CATCH_ALL.value: 'c',
+    VerificationStatus.DISPOSABLE.value: 'd',
+    VerificationStatus.ROLE_ACCOUNT.value: 'o',
+}
+CODE_STATUSES = {code: status for status, code in STATUS_CODES.items()}
+VERIFIED_STATUSES = {VerificationStatus.VALID.value, VerificationStatus.CATCH_ALL.value}
+
+# always present in details, one bit each
+FLAGS = ('syntax_valid', 'is_disposable', 'is_role_account', 'domain_verified', 'smtp_verified', 'is_catch_all')
+# only present in details when true
+OPTIONAL_FLAGS = ('disposable_mx', 'dns_error')
+# recomputed for every response, never cached
+TRANSIENT_DETAILS = ('timings',)
+_KNOWN_DETAILS = set(FLAGS) | set(OPTIONAL_FLAGS) | set(TRANSIENT_DETAILS) | {'quality_score', 'depth'}
+# details['depth'] above the flag bits, deepest first: 0 is full
+DEPTH_SHIFT = len(FLAGS) + len(OPTIONAL_FLAGS)
+DEPTH_CODES = tuple(reversed(DEPTH_RANKS))
+
+
+def _details_template(flags: int) -> Dict[str, Any]:
+    details = {name: bool(flags & (1 << bit)) for bit, name in enumerate(FLAGS)}
+    for bit, name in enumerate(OPTIONAL_FLAGS, len(FLAGS)):
+        if flags & (1 << bit):
+            details[name] = True
+    details['depth'] = DEPTH_CODES[flags >> DEPTH_SHIFT]
+    return details
+
+
+# decoded details for every flag and depth combination, copied on each hit
+_DETAILS = {flags: _details_template(flags) for flags in range(len(DEPTH_CODES) << DEPTH_SHIFT)}
+
+
+def _minutes(timestamp: Optional[float], round_up: bool = True) -> str:
+    if timestamp is None:
+        return ''
+    return format(int(timestamp // 60) + round_up, 'x')
+
+
+def encode_result(result: ResultRecord, expires_at: Optional[float] = None, compact: bool = True,
+                  fresh_until: Optional[float] = None) -> str:
+    """Compact form of ``result``; JSON when ``compact`` is off or details carry
+    anything the compact form can't represent. ``expires_at`` (epoch seconds) is
+    embedded for stores without per-entry TTL, ``fresh_until`` marks when the
+    result turns stale."""
+    details = result.details
+    status = result.status if isinstance(result.status, str) else result.status.value
+    depth = details.get('depth', VerificationDepth.FULL.value)
+    if not compact or status not in STATUS_CODES or not _KNOWN_DETAILS.issuperset(details) or \
+            depth not in DEPTH_RANKS or \
+            any(not isinstance(details.get(name, False), bool) for name in FLAGS + OPTIONAL_FLAGS):
+        data = result.dict()
+        for name in TRANSIENT_DETAILS:
+            data['details'].pop(name, None)
+        if expires_at is not None:
+            data['expires_at'] = int(expires_at)
+        if fresh_until is not None:
+            data['fresh_until'] = int(fresh_until)
+        return json.dumps(data)
+
+    flags = DEPTH_CODES.index(depth) << DEPTH_SHIFT
+    for bit, name in enumerate(FLAGS + OPTIONAL_FLAGS):
+        if details.get(name):
+            flags |= 1 << bit
+    parts = [VERSION, STATUS_CODES[status], str(result.quality_score), format(flags, 'x')]
+    if expires_at is not None or fresh_until is not None:
+        parts.append(_minutes(expires_at))
+    if fresh_until is not None:
+        # rounded down: turns stale no later than asked
+        parts.append(_minutes(fresh_until, round_up=False))
+    return '|'.join(parts)
+
+
+def decode_entry(email: str, payload: str) -> Optional[Tuple[ResultRecord, float]]:
+    """(result for ``email``, epoch time it turns stale), or None for expired,
+    unknown or corrupt payloads. Entries written without a freshness mark never
+    turn stale."""
+    now = time.time()
+    if payload.startswith('{'):
+        try:
+            data = json.loads(payload)
+            if data.pop('expires_at', float('inf')) <= now:
+                return None
+            fresh_until = data.pop('fresh_until', float('inf'))
+            record = ResultRecord(**VerificationResult(**data).dict())
+            # written before depths existed: every cached result was a full check
+            record.details.setdefault('depth', VerificationDepth.FULL.value)
+            return record, fresh_until
+        except Exception:
+            return None
+
+    parts = payload.split('|')
+    if parts[0] != VERSION or len(parts) < 4:
+        return None
+    try:
+        status = CODE_STATUSES[parts[1]]
+        quality = int(parts[2])
+        flags = int(parts[3], 16)
+        if len(parts) > 4 and parts[4] and int(parts[4], 16) * 60 <= now:
+            return None
+        fresh_until = int(parts[5], 16) * 60 if len(parts) > 5 else float('inf')
+    except (KeyError, ValueError):
+        return None
+
+    template = _DETAILS.get(flags)
+    if template is None:
+        return None
+    details = dict(template)
+    details['quality_score'] = quality
+    return ResultRecord(email, status, quality, details, status in VERIFIED_STATUSES), fresh_until
+
+
+def decode_result(email: str, payload: str) -> Optional[ResultRecord]:
+    """Rebuild the result for ``email``; None for expired, unknown or corrupt payloads."""
+    entry = decode_entry(email, payload)
+    return entry[0] if entry is not None else None
+
+
+def encode_mx(domain_valid: bool, mx_servers: List[str], compact: bool = True) -> str:
+    if not compact:
+        return json.dumps({'mx': mx_servers} if mx_servers else {'mx': [], 'valid': domain_valid})
+    if mx_servers:
+        return VERSION + '|' + ','.join(mx_servers)
+    return VERSION + ('|-' if domain_valid else '|0')
+
+
+def decode_mx(payload: Optional[str]) -> Optional[Tuple[bool, List[str]]]:
+    """(domain is valid, MX servers), or None when there is no usable entry."""
+    if not payload:
+        return None
+    if payload.startswith('{'):
+        try:
+            cached = json.loads(payload)
+        except ValueError:
+            return None
+        if not isinstance(cached, dict):
+            return None
+        if cached.get('mx'):
+            return True, cached['mx']
+        if 'valid' in cached:
+            # negative entry: NXDOMAIN / invalid domain, or a domain without MX
+            return cached['valid'], []
+        return None
+
+    version, _, body = payload.partition('|')
+    if version != VERSION or not body:
+        return None
+    if body == '-':
+        return True, []
+    if body == '0':
+        return False, []
+    return True, body.split(',')
+
+
+def encode_catch_all(is_catch_all: bool, compact: bool = True) -> str:
+    if not compact:
+        return json.dumps({'catch_all': is_catch_all})
+    return VERSION + ('|1' if is_catch_all else '|0')
+
+
+def decode_catch_all(payload: Optional[str]) -> Optional[bool]:
+    if not payload:
+        return None
+    if payload.startswith('{'):
+        try:
+            cached = json.loads(payload)
+        except ValueError:
+            return None
+        return cached.get('catch_all') if isinstance(cached, dict) else None
+    version, _, body = payload.partition('|')
+    if version != VERSION or body not in ('0', '1'):
+        return None
+    return body == '1'
@@ -0,0 +1,226 @@
+import asyncio
+import codecs
+import json
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional
+
+
+class FlightAbandoned(Exception):
+    """Set on a claimed future whose owner stopped before producing a result."""
+
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key onto one in-flight task."""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        # callers of ``do`` waiting on each shared run
+        self._waiters: Dict[asyncio.Future, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    def get(self, key: Hashable) -> Optional[asyncio.Future]:
+        """The in-flight future for ``key``, if any."""
+        return self._inflight.get(key)
+
+    def claim(self, key: Hashable) -> asyncio.Future:
+        """Register a future for ``key`` that the caller resolves itself, so work done
+        outside ``do`` (e.g. inside a batch) can still be joined by other callers."""
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        future.add_done_callback(lambda f: self._forget(key, f))
+        return future
+
+    def abandon(self, future: asyncio.Future):
+        """Give up a claimed ``future`` unsettled: callers waiting in ``do`` run ``fn``
+        themselves instead of taking a result the owner never produced."""
+        if not future.done():
+            future.set_exception(FlightAbandoned())
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]], abandon: bool = False) -> Any:
+        """Run ``fn`` for ``key``, or join the run already in flight. With ``abandon``,
+        a caller cancelled while nobody else waits on the run (e.g. on a deadline)
+        cancels the run too."""
+        while True:
+            future = self._inflight.get(key)
+            if future is None:
+                future = asyncio.ensure_future(fn())
+                self._inflight[key] = future
+                future.add_done_callback(lambda f: self._forget(key, f))
+            self._waiters[future] = self._waiters.get(future, 0) + 1
+            try:
+                # shield: one caller being cancelled must not cancel the shared work
+                return await asyncio.shield(future)
+            except FlightAbandoned:
+                # the claimed run was given up: start (or join) a fresh one
+                continue
+            except asyncio.CancelledError:
+                # only runs started by ``do``: claimed futures are settled by their owner
+                if abandon and self._waiters[future] == 1 and isinstance(future, asyncio.Task):
+                    future.cancel()
+                raise
+            finally:
+                self._waiters[future] -= 1
+                if not self._waiters[future]:
+                    del self._waiters[future]
+
+    def _forget(self, key: Hashable, future: asyncio.Future):
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        if not future.cancelled():
+            # mark the exception retrieved when every waiter was cancelled
+            future.exception()
+
+
+class _JSONStringArrayParser:
+    """Incremental parser yielding the string items of a JSON array as text arrives."""
+
+    def __init__(self):
+        self._in_string = False
+        self._escaped = False
+        self._closed = False
+        self._buffer: List[str] = []
+
+    def feed(self, text: str) -> List[str]:
+        items = []
+        for ch in text:
+            if self._closed:
+                # anything after the array (e.g. the rest of a wrapping object) is ignored
+                break
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == '\\':
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+                    items.append(json.loads('"' + ''.join(self._buffer) + '"'))
+                    self._buffer = []
+                    continue
+                self._buffer.append(ch)
+            elif ch == '"':
+                self._in_string = True
+            elif ch == ']':
+                self._closed = True
+            elif ch not in ' \t\r\n,[':
+                raise ValueError(f"unexpected character {ch!r} in email array")
+        return items
+
+
+class _EmailsFieldFinder:
+    """Incremental scanner for a JSON object body: skips strings and nested values
+    until the top-level ``"emails"`` key, then hands over the text from its array on."""
+
+    def __init__(self):
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._buffer: List[str] = []
+        self._key: Optional[str] = None
+        self._value_of: Optional[str] = None
+
+    def feed(self, text: str) -> Optional[str]:
+        """The rest of the body from the ``"emails"`` array's ``[``, once it is reached."""
+        for i, ch in enumerate(text):
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == '\\':
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._value_of is None:
+                        self._key = json.loads('"' + ''.join(self._buffer) + '"')
+                    continue
+                if self._depth == 1 and self._value_of is None:
+                    # only top-level keys are kept, never the (possibly long) values
+                    self._buffer.append(ch)
+            elif ch == '"':
+                if self._value_of == 'emails' and self._depth == 1:
+                    raise ValueError('"emails" must be an array')
+                self._in_string = True
+                self._buffer = []
+            elif ch in '{[':
+                if self._depth == 1 and self._value_of == 'emails':
+                    if ch == '{':
+                        raise ValueError('"emails" must be an array')
+                    return text[i:]
+                self._depth += 1
+            elif ch in '}]':
+                self._depth -= 1
+                if self._depth <= 0:
+                    raise ValueError('no "emails" array in the request body')
+            elif self._depth == 1 and ch == ':':
+                self._value_of = self._key
+            elif self._depth == 1 and ch == ',':
+                self._key = self._value_of = None
+            elif self._depth == 1 and self._value_of == 'emails' and ch not in ' \t\r\n':
+                raise ValueError('"emails" must be an array')
+        return None
+
+
+async def iter_emails(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    """Yield addresses from a streamed request body without buffering it whole.
+
+    Accepts a JSON array of strings, a ``{"emails": [...]}`` object, or
+    newline-delimited addresses (optionally JSON-quoted, one per line).
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    mode = None
+    parser = _JSONStringArrayParser()
+    finder = _EmailsFieldFinder()
+    pending = ''
+
+    async for chunk in chunks:
+        text = decoder.decode(chunk)
+
+        if mode is None:
+            pending += text
+            stripped = pending.lstrip()
+            if not stripped:
+                continue
+            if stripped[0] == '[':
+                mode, text = 'json', stripped
+            elif stripped[0] == '{':
+                mode, text = 'object', stripped
+            else:
+                mode, text = 'lines', pending
+            pending = ''
+
+        if mode == 'object':
+            # object body: skip ahead to the "emails" array
+            text = finder.feed(text)
+            if text is None:
+                continue
+            mode = 'json'
+        if mode == 'json':
+            for email in parser.feed(text):
+                yield email
+        else:
+            pending += text
+            *lines, pending = pending.split('\n')
+            for line in lines:
+                email = _parse_line(line)
+                if email:
+                    yield email
+
+    tail = decoder.decode(b'', final=True)
+    if mode == 'object':
+        tail = finder.feed(tail)
+        if tail is None:
+            raise ValueError('no "emails" array in the request body')
+        mode = 'json'
+    if mode == 'json':
+        for email in parser.feed(tail):
+            yield email
+    else:
+        email = _parse_line(pending + tail)
+        if email:
+            yield email
+
+
+def _parse_line(line: str) -> str:
+    line = line.strip()
+    if line.startswith('"'):
+        return json.loads(line)
+    return line
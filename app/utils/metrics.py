@@ -0,0 +1,190 @@
+# app/utils/metrics.py
+"""Minimal in-process metrics rendered in the Prometheus text format.
+
+Recording is a dict lookup plus a few integer/float updates, cheap enough to
+leave on under full load. Values that already exist elsewhere (cache counters,
+semaphore and queue depth) are read by callbacks at scrape time only.
+"""
+import bisect
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+Labels = Tuple[str, ...]
+
+# seconds: 1 ms .. 30 s, covering cache hits up to SMTP timeouts
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_text(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+
+    def header(self) -> List[str]:
+        return [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, labels: Labels = (), amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, labels: Labels = ()) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        return [f'{self.name}{_label_text(self.labelnames, labels)} {value}'
+                for labels, value in self._values.items()]
+
+
+class Gauge(_Metric):
+    """Set directly, or computed at scrape time by ``callback`` returning
+    ``{labels: value}``."""
+    kind = 'gauge'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 callback: Optional[Callable[[], Dict[Labels, float]]] = None):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[Labels, float] = {}
+        self.callback = callback
+
+    def set(self, value: float, labels: Labels = ()):
+        self._values[labels] = value
+
+    def render(self) -> List[str]:
+        values = self.callback() if self.callback is not None else self._values
+        return [f'{self.name}{_label_text(self.labelnames, labels)} {value}'
+                for labels, value in values.items()]
+
+
+class CallbackCounter(Gauge):
+    """Counter whose values are kept elsewhere and read at scrape time."""
+    kind = 'counter'
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (+Inf last), sum]
+        self._series: Dict[Labels, list] = {}
+
+    def observe(self, value: float, labels: Labels = ()):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def count(self, labels: Labels = ()) -> int:
+        series = self._series.get(labels)
+        return sum(series[0]) if series else 0
+
+    def render(self) -> List[str]:
+        lines = []
+        for labels, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float('inf') else f'le="{float(bound)!r}"'
+                lines.append(f'{self.name}_bucket{_label_text(self.labelnames, labels, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_label_text(self.labelnames, labels)} {total}')
+            lines.append(f'{self.name}_count{_label_text(self.labelnames, labels)} {cumulative}')
+        return lines
+
+
+class Registry:
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self, metrics: Iterable[_Metric] = None) -> str:
+        lines = []
+        for metric in metrics or self._metrics.values():
+            try:
+                body = metric.render()
+            except Exception:
+                # a broken callback must not take the whole scrape down
+                continue
+            lines.extend(metric.header())
+            lines.extend(body)
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'email_verifier_stage_seconds', 'Latency of each verification stage.', ('stage',)
+))
+RESULTS = REGISTRY.register(Counter(
+    'email_verifier_results_total', 'Verdicts computed (not served from the result cache), by status.', ('status',)
+))
+SMTP_REPLIES = REGISTRY.register(Counter(
+    'email_verifier_smtp_replies_total', 'SMTP RCPT reply codes by mail provider.', ('provider', 'code')
+))
+SMTP_SESSIONS = REGISTRY.register(Counter(
+    'email_verifier_smtp_sessions_total', 'SMTP sessions by mail provider and outcome.', ('provider', 'outcome')
+))
+
+
+class Stopwatch:
+    """Per-request stage timer: every ``lap`` feeds the stage histogram and, when
+    ``keep`` is set, a millisecond breakdown for the result details."""
+
+    def __init__(self, keep: bool = False):
+        self.started = time.perf_counter()
+        self.timings: Optional[Dict[str, float]] = {} if keep else None
+
+    def lap(self, stage: str, since: float) -> float:
+        now = time.perf_counter()
+        elapsed = now - since
+        STAGE_SECONDS.observe(elapsed, (stage,))
+        if self.timings is not None:
+            self.timings[stage] = round(self.timings.get(stage, 0) + elapsed * 1000, 3)
+        return now
+
+    def breakdown(self) -> Optional[Dict[str, float]]:
+        if self.timings is None:
+            return None
+        timings = dict(self.timings)
+        timings['total'] = round((time.perf_counter() - self.started) * 1000, 3)
+        return timings
+
+
+def observe_stage(stage: str, since: float) -> float:
+    """Record ``stage`` as taking from ``since`` (a perf_counter value) until now."""
+    now = time.perf_counter()
+    STAGE_SECONDS.observe(now - since, (stage,))
+    return now
@@ -0,0 +1,34 @@
+# app/utils/serialization.py
+"""JSON encoding for API responses straight to bytes.
+
+Uses orjson when it is installed and the stdlib otherwise; both take
+``ResultRecord`` objects as they are, so results never go through pydantic
+models on the way out. Output is compact (no spaces), like FastAPI's own
+``JSONResponse``.
+"""
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # optional: the stdlib encoder is ~5x slower but equivalent
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    to_dict = getattr(obj, 'dict', None)
+    if to_dict is not None:
+        return to_dict()
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default)
+    return json.dumps(obj, default=_default, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+def loads(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
@@ -0,0 +1,129 @@
+"""Result cache encoding: the old JSON payloads vs the compact codec.
+
+Measures payload size, encode and decode CPU per entry (decode = what a cache hit
+costs, including building the result object), and Redis memory per entry for
+plain keys vs the hashed layout. Redis memory is measured with ``--redis-url``
+(the database is flushed first, use a scratch instance); without it an estimate
+from Redis' per-key and listpack overheads is printed instead.
+
+    python benchmarks/bench_cache_encoding.py --count 200000
+    python benchmarks/bench_cache_encoding.py --count 200000 --redis-url redis://localhost:6379/15
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.verifier import EMAIL_CACHE_PREFIX, EmailVerifier  # noqa: E402
+from app.models.results import VerificationResult, VerificationStatus  # noqa: E402
+from app.utils.cache import HashLayout  # noqa: E402
+from app.utils.codec import decode_result, encode_result  # noqa: E402
+
+# rough Redis costs used for the estimate: dict entry, key object, expires entry
+KEY_OVERHEAD = 72
+FIELD_OVERHEAD = 4
+
+OUTCOMES = [
+    (VerificationStatus.VALID, 95, dict(syntax_valid=True, domain_verified=True, smtp_verified=True)),
+    (VerificationStatus.INVALID, 40, dict(syntax_valid=True, domain_verified=True)),
+    (VerificationStatus.CATCH_ALL, 75, dict(syntax_valid=True, domain_verified=True, smtp_verified=True,
+                                            is_catch_all=True)),
+    (VerificationStatus.RISKY, 65, dict(syntax_valid=True, domain_verified=True, is_role_account=True)),
+    (VerificationStatus.DISPOSABLE, 20, dict(syntax_valid=True, domain_verified=True, is_disposable=True,
+                                             disposable_mx=True)),
+]
+
+
+def make_results(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    results = []
+    for i in range(count):
+        status, quality, flags = rng.choices(OUTCOMES, [50, 30, 10, 8, 2])[0]
+        details = EmailVerifier._new_details()
+        details.update(flags)
+        details['quality_score'] = quality
+        results.append(VerificationResult(
+            email=f'user{i}.{rng.randint(1, 99)}@company{rng.randint(1, 5000)}.com', status=status,
+            quality_score=quality, details=details,
+            is_verified=status in (VerificationStatus.VALID, VerificationStatus.CATCH_ALL)
+        ))
+    return results
+
+
+def timed(fn, items):
+    started = time.perf_counter()
+    out = [fn(item) for item in items]
+    return out, (time.perf_counter() - started) / len(items) * 1e6
+
+
+async def redis_memory(url: str, results, payloads, layout):
+    import redis.asyncio as redis
+    client = redis.Redis.from_url(url, decode_responses=True)
+    await client.flushdb()
+    base = (await client.info('memory'))['used_memory']
+    async with client.pipeline(transaction=False) as pipe:
+        for result, payload in zip(results, payloads):
+            key = EMAIL_CACHE_PREFIX + result.email
+            if layout is None:
+                pipe.setex(key, 86400, payload)
+            else:
+                hash_key, field = layout.write_location(key)
+                pipe.hset(hash_key, field, payload)
+                pipe.expire(hash_key, layout.hash_ttl)
+        await pipe.execute()
+    used = (await client.info('memory'))['used_memory'] - base
+    await client.flushdb()
+    await client.close()
+    return used / len(results)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=200_000)
+    parser.add_argument('--redis-url', help='scratch Redis to measure memory on (FLUSHDB is run)')
+    args = parser.parse_args()
+
+    results = make_results(args.count)
+    emails = [r.email for r in results]
+    layout = HashLayout(EMAIL_CACHE_PREFIX, buckets=max(1, args.count // 100))
+
+    legacy, legacy_enc = timed(lambda r: json.dumps(r.dict()), results)
+    compact, compact_enc = timed(encode_result, results)
+    expiring, _ = timed(lambda r: encode_result(r, time.time() + 86400), results)
+    _, legacy_dec = timed(lambda p: VerificationResult(**json.loads(p)), legacy)
+    decoded, compact_dec = timed(lambda pair: decode_result(*pair), list(zip(emails, compact)))
+    assert all(a.dict() == b.dict() for a, b in zip(results, decoded))
+
+    legacy_bytes = sum(map(len, legacy)) / args.count
+    compact_bytes = sum(map(len, compact)) / args.count
+    hashed_bytes = sum(map(len, expiring)) / args.count
+    key_bytes = sum(len(EMAIL_CACHE_PREFIX) + len(e) for e in emails) / args.count
+    field_bytes = sum(len(e) for e in emails) / args.count
+
+    print(f"{args.count:,} cached results")
+    print(f"{'format':<22}{'payload B':>10}{'encode us':>11}{'decode us':>11}{'redis B/entry':>15}")
+    rows = [
+        ('json, key per entry', legacy, legacy_bytes, legacy_enc, legacy_dec, None,
+         KEY_OVERHEAD + key_bytes + legacy_bytes),
+        ('compact, key per entry', compact, compact_bytes, compact_enc, compact_dec, None,
+         KEY_OVERHEAD + key_bytes + compact_bytes),
+        ('compact, hashed', expiring, hashed_bytes, compact_enc, compact_dec, layout,
+         FIELD_OVERHEAD + field_bytes + hashed_bytes),
+    ]
+    for name, payloads, size, enc, dec, row_layout, estimate in rows:
+        if args.redis_url:
+            memory = f"{await redis_memory(args.redis_url, results, payloads, row_layout):,.0f}"
+        else:
+            memory = f"~{estimate:,.0f}"
+        print(f"{name:<22}{size:>10.0f}{enc:>11.2f}{dec:>11.2f}{memory:>15}")
+    if not args.redis_url:
+        print("(redis column estimated; pass --redis-url to measure)")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
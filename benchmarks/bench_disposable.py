@@ -0,0 +1,99 @@
+"""Disposable-domain engine benchmark.
+
+Builds a synthetic list of N domains, then reports compile time, snapshot load
+(startup) time, resident cost and lookup cost for hits, misses and subdomains.
+
+    python benchmarks/bench_disposable.py --domains 200000
+"""
+import argparse
+import os
+import random
+import string
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.disposable import DisposableDomains  # noqa: E402
+
+
+def random_domain(rng: random.Random) -> str:
+    name = ''.join(rng.choices(string.ascii_lowercase + string.digits, k=rng.randint(5, 14)))
+    return f"{name}.{rng.choice(['com', 'net', 'org', 'io', 'xyz', 'co.uk'])}"
+
+
+def timed_lookups(engine: DisposableDomains, domains, repeat: int = 1) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for domain in domains:
+            engine.is_disposable_domain(domain)
+    return (time.perf_counter() - start) / (len(domains) * repeat)
+
+
+def startup_seconds(path: str) -> float:
+    """Fresh interpreter: import the engine and open the list, like a worker boot."""
+    code = (
+        "import sys, time; sys.path.insert(0, %r); t = time.perf_counter();"
+        "from app.core.disposable import DisposableDomains;"
+        "DisposableDomains(%r, reload_interval=0); print(time.perf_counter() - t)"
+    ) % (os.path.dirname(os.path.dirname(os.path.abspath(__file__))), path)
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    return float(out.stdout.strip())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--domains', type=int, default=200_000)
+    parser.add_argument('--lookups', type=int, default=200_000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    listed = list({random_domain(rng) for _ in range(args.domains)})
+    misses = [random_domain(rng) for _ in range(args.lookups)]
+    hits = [rng.choice(listed) for _ in range(args.lookups)]
+    subdomains = [f"mx{rng.randint(1, 9)}.{rng.choice(listed)}" for _ in range(args.lookups)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'disposable_domains.txt')
+        with open(path, 'w') as f:
+            f.write('\n'.join(listed))
+
+        start = time.perf_counter()
+        engine = DisposableDomains(path, reload_interval=0)
+        compile_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        engine = DisposableDomains(path, reload_interval=0)
+        load_s = time.perf_counter() - start
+
+        tracemalloc.start()
+        mapped = DisposableDomains(path, reload_interval=0)
+        index_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        tracemalloc.start()
+        as_set = set(listed)
+        set_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del as_set, mapped
+
+        print(f"domains:                 {len(engine.index):,}")
+        print(f"snapshot size:           {os.path.getsize(path + '.idx') / 1024 / 1024:.2f} MiB")
+        print(f"compile from text:       {compile_s * 1000:.1f} ms")
+        print(f"load from snapshot:      {load_s * 1000:.3f} ms")
+        print(f"cold process startup:    {startup_seconds(path) * 1000:.1f} ms")
+        print(f"heap (mmap index):       {index_bytes / 1024:.1f} KiB")
+        print(f"heap (python set):       {set_bytes / 1024 / 1024:.2f} MiB")
+        print(f"lookup hit:              {timed_lookups(engine, hits) * 1e6:.2f} us")
+        print(f"lookup miss:             {timed_lookups(engine, misses) * 1e6:.2f} us")
+        print(f"lookup subdomain hit:    {timed_lookups(engine, subdomains) * 1e6:.2f} us")
+
+        assert all(engine.is_disposable_domain(d) for d in hits[:1000])
+        assert all(engine.is_disposable_domain(d) for d in subdomains[:1000])
+
+
+if __name__ == '__main__':
+    main()
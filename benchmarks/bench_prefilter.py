@@ -0,0 +1,82 @@
+"""Prefilter microbenchmark: local checks (normalize, syntax, disposable, role)
+over a large synthetic list, per-address calls vs one validate_batch pass.
+
+    python benchmarks/bench_prefilter.py --count 1000000
+"""
+import argparse
+import os
+import random
+import re
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.validators import EmailValidators  # noqa: E402
+
+LEGACY_PATTERN = r'^[a-zA-Z0-9.!#$%&’*+/=?^_`{|}~-]+@[a-zA-Z0-9-]+(?:\.[a-zA-Z0-9-]+)*$'
+
+
+def make_addresses(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    domains = ['gmail.com', 'yahoo.com', 'outlook.com', 'corp.example.com', 'mailinator.com',
+               'x.mailinator.com', 'startup.io'] + [f"d{i}.com" for i in range(2000)]
+    weights = [40, 10, 10, 5, 2, 1, 2] + [30 / 2000] * 2000
+    locals_ = ['john.smith', 'info', 'support-team', 'shinfo.smith', 'j.doe+news', 'sales2', 'no-reply']
+    out = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.05:
+            out.append('broken@@' + rng.choice(domains))
+        elif roll < 0.08:
+            out.append(''.join(rng.choices(string.ascii_lowercase, k=10)))
+        else:
+            local = rng.choice(locals_) if roll < 0.3 else ''.join(rng.choices(string.ascii_lowercase, k=9))
+            out.append(f"{local}@{rng.choices(domains, weights)[0]}")
+    return out
+
+
+def legacy_checks(validators: EmailValidators, emails):
+    """What verify_single did per address before the batch prefilter."""
+    for raw in emails:
+        try:
+            email = validators.normalize_email(raw)
+        except ValueError:
+            continue
+        if not re.match(LEGACY_PATTERN, email):
+            continue
+        if validators.is_disposable_email(email):
+            continue
+        local_part = email.split('@')[0]
+        any(prefix in local_part for prefix in validators.role_account_prefixes)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    validators = EmailValidators()
+    validators.disposable.reload_interval = 0
+    emails = make_addresses(args.count)
+
+    start = time.perf_counter()
+    legacy_checks(validators, emails)
+    legacy_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    checks = validators.validate_batch(emails)
+    batch_s = time.perf_counter() - start
+
+    rejected = sum(1 for c in checks if c.rejected)
+    roles = sum(1 for c in checks if c.is_role_account)
+    print(f"addresses:           {len(emails):,}")
+    print(f"rejected locally:    {rejected:,} ({rejected / len(emails):.1%})")
+    print(f"role accounts:       {roles:,}")
+    print(f"per-address checks:  {legacy_s:.2f} s  ({len(emails) / legacy_s:,.0f} addr/s)")
+    print(f"validate_batch:      {batch_s:.2f} s  ({len(emails) / batch_s:,.0f} addr/s)")
+
+
+if __name__ == '__main__':
+    main()
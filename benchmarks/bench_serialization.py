@@ -0,0 +1,99 @@
+"""Bulk response serialization: pydantic models through FastAPI's response_model
+vs ResultRecord objects encoded straight to bytes.
+
+"before" builds a VerificationResult per address, wraps them in
+BulkVerificationResponse and runs FastAPI's own response serialization (the
+response_model validation pass, jsonable_encoder, json.dumps). "after" builds
+ResultRecords and encodes the body with app.utils.serialization.dumps (orjson if
+installed; ``--stdlib`` forces the json fallback). Both bodies are checked to
+decode to the same document.
+
+    python benchmarks/bench_serialization.py --count 10000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+
+from app.utils import serialization  # noqa: E402
+from app.models.results import ResultRecord, VerificationResult, VerificationStatus  # noqa: E402
+
+STATUSES = [VerificationStatus.VALID, VerificationStatus.INVALID, VerificationStatus.CATCH_ALL,
+            VerificationStatus.RISKY, VerificationStatus.DISPOSABLE]
+
+
+def make_fields(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        status = rng.choices(STATUSES, [50, 30, 10, 8, 2])[0]
+        details = {
+            'syntax_valid': True, 'is_disposable': status == VerificationStatus.DISPOSABLE,
+            'is_role_account': rng.random() < 0.03, 'domain_verified': True,
+            'smtp_verified': status in (VerificationStatus.VALID, VerificationStatus.CATCH_ALL),
+            'is_catch_all': status == VerificationStatus.CATCH_ALL, 'quality_score': rng.choice([95, 40, 75, 65, 20]),
+        }
+        rows.append((f'user{i}@company{rng.randint(1, 500)}.com', status, details['quality_score'], details,
+                     status in (VerificationStatus.VALID, VerificationStatus.CATCH_ALL)))
+    return rows
+
+
+async def before(main, field, rows):
+    results = [VerificationResult(email=e, status=s, quality_score=q, details=dict(d), is_verified=v)
+               for e, s, q, d, v in rows]
+    response = main.BulkVerificationResponse(success=True, data=results, total=len(results),
+                                             valid_count=sum(1 for r in results if r.is_verified))
+    content = await serialize_response(field=field, response_content=response)
+    return JSONResponse(content).body
+
+
+def after(rows):
+    results = [ResultRecord(e, s.value, q, dict(d), v) for e, s, q, d, v in rows]
+    return serialization.dumps({'success': True, 'data': results, 'total': len(results),
+                                'valid_count': sum(1 for r in results if r.is_verified)})
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=10_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--stdlib', action='store_true', help='measure the json fallback instead of orjson')
+    args = parser.parse_args()
+    if args.stdlib:
+        serialization.orjson = None
+
+    import main as app_main
+    route = next(r for r in app_main.app.routes if getattr(r, 'path', None) == '/verify-bulk')
+    rows = make_fields(args.count)
+
+    old_body, new_body = await before(app_main, route.response_field, rows), after(rows)
+    assert json.loads(old_body) == json.loads(new_body), 'response documents differ'
+
+    timings = {'before': [], 'after': []}
+    for _ in range(args.repeat):
+        started = time.process_time()
+        await before(app_main, route.response_field, rows)
+        timings['before'].append(time.process_time() - started)
+        started = time.process_time()
+        after(rows)
+        timings['after'].append(time.process_time() - started)
+
+    encoder = 'json' if serialization.orjson is None else 'orjson'
+    print(f"{args.count:,} results, best of {args.repeat}, CPU time")
+    print(f"before (pydantic + response_model): {min(timings['before']) * 1000:8.1f} ms  "
+          f"{len(old_body):,} bytes")
+    print(f"after  (ResultRecord + {encoder:<6}):     {min(timings['after']) * 1000:8.1f} ms  "
+          f"{len(new_body):,} bytes")
+    print(f"speedup: {min(timings['before']) / min(timings['after']):.1f}x")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,254 @@
+"""End-to-end throughput benchmark, fully offline.
+
+Runs ``EmailVerifier`` (or the FastAPI app over HTTP) against local stand-ins:
+fake SMTP servers with per-provider behaviour, a fake resolver and fakeredis (or
+a local Redis), on a domain-skewed address list. Reports throughput, p50/p99
+latency, SMTP connection counts and the verdict mix.
+
+    python benchmarks/bench_verifier.py --count 10000 --mode bulk
+    python benchmarks/bench_verifier.py --count 2000 --mode single --concurrency 200
+    python benchmarks/bench_verifier.py --count 100000 --mode stream --latency-scale 0
+    python benchmarks/bench_verifier.py --count 5000 --mode http --batch 500
+    python benchmarks/bench_verifier.py --count 5000 --realistic-limits --dead-mx-ratio 0.05
+
+By default rate limits and congestion pacing are lifted so the numbers show what
+the engine itself can do; ``--realistic-limits`` keeps the configured ones.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import time
+import zlib
+from collections import Counter
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import Config  # noqa: E402
+from fakes import (BlackholeServer, FakeResolver, FakeSMTPServer, fake_redis,  # noqa: E402
+                   host_router, make_workload, percentile)
+
+# per-provider server behaviour; latencies are multiplied by --latency-scale
+PROFILES = {
+    'google': dict(latency=0.02, jitter=0.02, per_transaction_limit=100),
+    'microsoft': dict(latency=0.03, jitter=0.03, per_session_limit=20),
+    'yahoo': dict(latency=0.05, jitter=0.05, max_connections=4, throttle_ratio=0.03),
+    'default': dict(latency=0.01, jitter=0.02, per_session_limit=10),
+}
+
+
+def lift_limits(verifier):
+    """Take provider budgets and congestion pacing out of the measurement."""
+    verifier.scheduler.max_calls = 10 ** 9
+    verifier.scheduler.concurrency = Config.MAX_CONCURRENT_VERIFICATIONS
+    verifier.providers.default_max_calls = 10 ** 9
+    verifier.providers.default_concurrency = Config.MAX_CONCURRENT_VERIFICATIONS
+    verifier.providers.policies = [
+        policy._replace(max_calls=10 ** 9, concurrency=Config.MAX_CONCURRENT_VERIFICATIONS)
+        for policy in verifier.providers.policies
+    ]
+    congestion = verifier.congestion
+    congestion.initial_rate = congestion.max_rate = 10 ** 9
+    congestion.initial_concurrency = congestion.max_concurrency = Config.MAX_CONCURRENT_VERIFICATIONS
+
+
+async def start_servers(latency_scale: float, workload) -> Dict[str, object]:
+    servers = {}
+    catch_all = {d for d in workload.mx if d.startswith('company') and zlib.crc32(d.encode()) % 10 == 0}
+    for name, profile in PROFILES.items():
+        profile = dict(profile)
+        profile['latency'] *= latency_scale
+        profile['jitter'] *= latency_scale
+        profile['catch_all_domains'] = catch_all
+        servers[name] = FakeSMTPServer(**profile)
+        await servers[name].start()
+    servers['dead'] = BlackholeServer()
+    await servers['dead'].start()
+    return servers
+
+
+def build_verifier(args, workload, servers):
+    from app.core.verifier import EmailVerifier
+
+    resolver = FakeResolver(workload.mx, workload.nxdomain, workload.timeouts,
+                            latency=args.dns_latency_ms / 1000 * args.latency_scale, timeout=args.dns_timeout)
+    verifier = EmailVerifier(redis_client=fake_redis(args.redis_url), resolver=resolver)
+    verifier.smtp_checker.connect_to = host_router({name: s.port for name, s in servers.items()},
+                                                   workload.host_profiles)
+    verifier.smtp_checker.timeout = args.smtp_timeout
+    if not args.realistic_limits:
+        lift_limits(verifier)
+    return verifier, resolver
+
+
+async def run_single(verifier, emails: List[str], concurrency: int):
+    slots = asyncio.Semaphore(concurrency)
+    latencies, results = [], []
+
+    async def one(email: str):
+        async with slots:
+            started = time.perf_counter()
+            results.append(await verifier.verify_single(email))
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one(email) for email in emails))
+    return results, latencies
+
+
+async def run_bulk(verifier, emails: List[str], batch: int, parallel: int):
+    slots = asyncio.Semaphore(parallel)
+    latencies, results = [], []
+
+    async def one(chunk: List[str]):
+        async with slots:
+            started = time.perf_counter()
+            results.extend(await verifier.verify_bulk(chunk))
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one(emails[i:i + batch]) for i in range(0, len(emails), batch)))
+    return results, latencies
+
+
+async def run_stream(verifier, emails: List[str]):
+    async def feed():
+        for email in emails:
+            yield email
+
+    started = time.perf_counter()
+    results, arrivals = [], []
+    async for result in verifier.verify_stream(feed()):
+        results.append(result)
+        arrivals.append(time.perf_counter() - started)
+    # time from the start of the run until each result arrived
+    return results, arrivals
+
+
+async def run_http(verifier, emails: List[str], batch: int, parallel: int):
+    import aiohttp
+    import uvicorn
+
+    Config.JOB_WORKERS = 0
+    import main
+    # endpoints serve through main.verification; never hand the run to shard workers
+    main.verifier = main.verification = verifier
+    main.shards = None
+
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(main.app, host='127.0.0.1', port=port, log_level='warning'))
+    serving = asyncio.ensure_future(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    slots = asyncio.Semaphore(parallel)
+    latencies, results = [], []
+    try:
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=None)) as session:
+            async def one(chunk: List[str]):
+                async with slots:
+                    started = time.perf_counter()
+                    async with session.post(f'http://127.0.0.1:{port}/verify-bulk', json={'emails': chunk}) as resp:
+                        body = await resp.json()
+                    latencies.append(time.perf_counter() - started)
+                    results.extend(body['data'])
+
+            await asyncio.gather(*(one(emails[i:i + batch]) for i in range(0, len(emails), batch)))
+    finally:
+        server.should_exit = True
+        await serving
+    return results, latencies
+
+
+def status_of(result) -> str:
+    return result['status'] if isinstance(result, dict) else result.status
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=10_000)
+    parser.add_argument('--mode', choices=['single', 'bulk', 'stream', 'http'], default='bulk')
+    parser.add_argument('--batch', type=int, default=1000, help='addresses per bulk call / HTTP request')
+    parser.add_argument('--parallel', type=int, default=4, help='bulk calls / HTTP requests in flight')
+    parser.add_argument('--concurrency', type=int, default=200, help='verify_single calls in flight')
+    parser.add_argument('--passes', type=int, default=1, help='repeat the run; later passes hit the cache')
+    parser.add_argument('--latency-scale', type=float, default=1.0, help='0 removes simulated network latency')
+    parser.add_argument('--dns-latency-ms', type=float, default=5)
+    parser.add_argument('--dns-timeout', type=float, default=2.0)
+    parser.add_argument('--smtp-timeout', type=float, default=2.0)
+    parser.add_argument('--dead-mx-ratio', type=float, default=0.0, help='share of self-hosted primary MXs blackholed')
+    parser.add_argument('--realistic-limits', action='store_true')
+    parser.add_argument('--redis-url', help='use this Redis instead of fakeredis')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--json', action='store_true', help='print one JSON report line per pass')
+    args = parser.parse_args()
+
+    workload = make_workload(args.count, seed=args.seed, dead_mx_ratio=args.dead_mx_ratio)
+    servers = await start_servers(args.latency_scale, workload)
+    verifier, resolver = build_verifier(args, workload, servers)
+    emails = workload.emails
+
+    for run in range(1, args.passes + 1):
+        before = {name: s.stats() if hasattr(s, 'stats') else {} for name, s in servers.items()}
+        started = time.perf_counter()
+        if args.mode == 'single':
+            results, latencies = await run_single(verifier, emails, args.concurrency)
+        elif args.mode == 'bulk':
+            results, latencies = await run_bulk(verifier, emails, args.batch, args.parallel)
+        elif args.mode == 'stream':
+            results, latencies = await run_stream(verifier, emails)
+        else:
+            results, latencies = await run_http(verifier, emails, args.batch, args.parallel)
+        elapsed = time.perf_counter() - started
+
+        smtp = {}
+        for name, s in servers.items():
+            if hasattr(s, 'stats'):
+                smtp[name] = {k: v - before[name].get(k, 0) if k != 'max_concurrent' else v
+                              for k, v in s.stats().items()}
+        report = {
+            'pass': run,
+            'mode': args.mode,
+            'addresses': len(emails),
+            'unique_domains': len({e.rsplit('@', 1)[-1].lower() for e in emails}),
+            'elapsed_s': round(elapsed, 3),
+            'throughput_per_s': round(len(emails) / elapsed, 1),
+            'throughput_per_min': round(len(emails) / elapsed * 60),
+            'latency_unit': {'single': 'address', 'stream': 'since start'}.get(args.mode, 'batch'),
+            'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+            'smtp_connections': sum(s['connections'] for s in smtp.values()),
+            'smtp_rcpts': sum(s['rcpts'] for s in smtp.values()),
+            'smtp_by_profile': smtp,
+            'dead_mx_connections': servers['dead'].connections,
+            'dns_queries': resolver.queries,
+            'statuses': dict(Counter(status_of(r) for r in results)),
+            'cache': verifier.cache.stats(),
+        }
+        if args.json:
+            print(json.dumps(report))
+            continue
+
+        print(f"--- pass {run}: {args.mode}, {report['addresses']:,} addresses, "
+              f"{report['unique_domains']:,} domains")
+        print(f"elapsed:            {report['elapsed_s']:.2f} s")
+        print(f"throughput:         {report['throughput_per_s']:,.0f} addr/s  "
+              f"({report['throughput_per_min']:,} addr/min)")
+        print(f"latency per {report['latency_unit']}: p50 {report['p50_ms']:.1f} ms, p99 {report['p99_ms']:.1f} ms")
+        print(f"smtp:               {report['smtp_connections']:,} connections, {report['smtp_rcpts']:,} RCPTs, "
+              f"{report['dead_mx_connections']:,} to dead MXs")
+        for name, stats in smtp.items():
+            print(f"  {name:<10} {stats}")
+        print(f"dns queries:        {report['dns_queries']:,}")
+        print(f"statuses:           {report['statuses']}")
+
+    for s in servers.values():
+        await s.stop()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,334 @@
+"""Local stand-ins for the network: an SMTP server, a DNS resolver and a
+domain-skewed address workload. Used by the benchmarks so they run offline.
+"""
+import asyncio
+import random
+import zlib
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import dns.exception
+import dns.resolver
+
+
+class FakeSMTPServer:
+    """In-process SMTP responder with the behaviours the verifier has to cope with.
+
+    - ``latency`` (+ random ``jitter``) seconds before every reply
+    - ``mailbox_ratio``: share of name-like addresses that exist (deterministic per address)
+    - ``catch_all_domains``: every RCPT on these domains is accepted
+    - ``per_session_limit``: RCPTs before the server answers 421 and hangs up
+    - ``per_transaction_limit``: RCPTs per MAIL before 452
+    - ``max_connections``: concurrent sessions before the greeting is a 421
+    - ``throttle_ratio``: share of RCPTs answered 450 (greylisting / rate limiting)
+    """
+
+    def __init__(self, mailbox_ratio: float = 0.6, catch_all_domains: Iterable[str] = (),
+                 latency: float = 0.0, jitter: float = 0.0, per_session_limit: Optional[int] = None,
+                 per_transaction_limit: Optional[int] = None, max_connections: Optional[int] = None,
+                 throttle_ratio: float = 0.0, seed: int = 1):
+        self.mailbox_ratio = mailbox_ratio
+        self.catch_all_domains = set(catch_all_domains)
+        self.latency = latency
+        self.jitter = jitter
+        self.per_session_limit = per_session_limit
+        self.per_transaction_limit = per_transaction_limit
+        self.max_connections = max_connections
+        self.throttle_ratio = throttle_ratio
+        self.rng = random.Random(seed)
+        self.port: Optional[int] = None
+        self.server: Optional[asyncio.AbstractServer] = None
+        # counters for the report
+        self.connections = 0
+        self.active = 0
+        self.max_active = 0
+        self.rcpts = 0
+        self.refused = 0
+        self.throttled = 0
+
+    def is_mailbox(self, address: str) -> bool:
+        domain = address.rsplit('@', 1)[-1]
+        if domain in self.catch_all_domains:
+            return True
+        local = address.rsplit('@', 1)[0].lower()
+        if '.' not in local and local not in ROLES:
+            # made-up local parts (catch-all probes) never exist on a normal server
+            return False
+        return zlib.crc32(address.encode()) % 1000 < self.mailbox_ratio * 1000
+
+    async def _pause(self):
+        delay = self.latency + (self.rng.random() * self.jitter if self.jitter else 0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await self._pause()
+            if self.max_connections and self.active > self.max_connections:
+                self.refused += 1
+                writer.write(b"421 4.7.0 too many connections\r\n")
+                await writer.drain()
+                return
+            writer.write(b"220 fake.local ESMTP\r\n")
+            await writer.drain()
+
+            in_session = in_transaction = 0
+            while True:
+                line = await reader.readline()
+                if not line:
+                    return
+                command = line.decode(errors='replace').strip()
+                verb = command[:4].upper()
+                await self._pause()
+
+                if verb in ('EHLO', 'HELO'):
+                    writer.write(b"250 fake.local\r\n")
+                elif verb in ('MAIL', 'RSET'):
+                    in_transaction = 0
+                    writer.write(b"250 2.1.0 ok\r\n")
+                elif verb == 'RCPT':
+                    if self.per_session_limit and in_session >= self.per_session_limit:
+                        writer.write(b"421 4.7.0 too many recipients this session\r\n")
+                        await writer.drain()
+                        return
+                    if self.per_transaction_limit and in_transaction >= self.per_transaction_limit:
+                        writer.write(b"452 4.5.3 too many recipients\r\n")
+                        await writer.drain()
+                        continue
+                    self.rcpts += 1
+                    in_session += 1
+                    in_transaction += 1
+                    if self.throttle_ratio and self.rng.random() < self.throttle_ratio:
+                        self.throttled += 1
+                        writer.write(b"450 4.2.1 try again later\r\n")
+                    else:
+                        address = command[command.find('<') + 1:command.rfind('>')].lower()
+                        writer.write(b"250 2.1.5 ok\r\n" if self.is_mailbox(address)
+                                     else b"550 5.1.1 no such user\r\n")
+                elif verb == 'QUIT':
+                    writer.write(b"221 2.0.0 bye\r\n")
+                    await writer.drain()
+                    return
+                else:
+                    writer.write(b"250 ok\r\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.active -= 1
+            writer.close()
+
+    async def start(self) -> int:
+        self.server = await asyncio.start_server(self._handle, '127.0.0.1', 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    def stats(self) -> Dict[str, int]:
+        return {'connections': self.connections, 'max_concurrent': self.max_active, 'rcpts': self.rcpts,
+                'refused': self.refused, 'throttled': self.throttled}
+
+
+class BlackholeServer:
+    """Accepts TCP connections and never answers: a dead or firewalled MX."""
+
+    def __init__(self):
+        self.connections = 0
+        self.port: Optional[int] = None
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        try:
+            await reader.read()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self) -> int:
+        self.server = await asyncio.start_server(self._handle, '127.0.0.1', 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+
+
+class MXRecord(NamedTuple):
+    preference: int
+    exchange: str
+
+
+class _RRSet:
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+
+
+class _Answer:
+    def __init__(self, records: List, ttl: int):
+        self._records = records
+        self.rrset = _RRSet(ttl)
+
+    def __iter__(self):
+        return iter(self._records)
+
+
+class FakeResolver:
+    """Stands in for ``dns.asyncresolver.Resolver`` in ``DNSChecker(resolver=...)``.
+
+    ``mx`` maps a domain to its MX hosts in preference order. Domains in ``nxdomain``
+    do not exist, domains in ``timeouts`` time out after ``timeout`` seconds, and
+    domains in ``a_only`` have an A record but no MX. Every query waits ``latency``.
+    """
+
+    def __init__(self, mx: Dict[str, List[str]], nxdomain: Iterable[str] = (),
+                 timeouts: Iterable[str] = (), a_only: Iterable[str] = (),
+                 latency: float = 0.0, timeout: float = 2.0, ttl: int = 300):
+        self.mx = mx
+        self.nxdomain: Set[str] = set(nxdomain)
+        self.timeouts: Set[str] = set(timeouts)
+        self.a_only: Set[str] = set(a_only)
+        self.latency = latency
+        self.timeout = timeout
+        self.ttl = ttl
+        self.queries = 0
+
+    async def resolve(self, name: str, rdtype: str):
+        self.queries += 1
+        name = name.lower().rstrip('.')
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if name in self.timeouts:
+            await asyncio.sleep(self.timeout)
+            raise dns.exception.Timeout()
+        if name in self.nxdomain or (name not in self.mx and name not in self.a_only):
+            raise dns.resolver.NXDOMAIN(qnames=[name], responses={})
+
+        if rdtype == 'MX' and name in self.mx:
+            hosts = self.mx[name]
+            return _Answer([MXRecord(10 * (i + 1), host + '.') for i, host in enumerate(hosts)], self.ttl)
+        if rdtype == 'A':
+            return _Answer(['192.0.2.1'], self.ttl)
+        raise dns.resolver.NoAnswer(response=None)
+
+
+class Workload(NamedTuple):
+    emails: List[str]
+    mx: Dict[str, List[str]]
+    nxdomain: Set[str]
+    timeouts: Set[str]
+    # MX host -> behaviour profile name (see PROFILES in bench_verifier.py)
+    host_profiles: Dict[str, str]
+
+
+FIRST = ['james', 'mary', 'john', 'patricia', 'robert', 'jennifer', 'michael', 'linda', 'david', 'sarah',
+         'wei', 'fatima', 'ahmed', 'maria', 'ivan', 'yuki', 'carlos', 'anna', 'omar', 'priya']
+LAST = ['smith', 'johnson', 'garcia', 'chen', 'khan', 'muller', 'rossi', 'kim', 'silva', 'novak',
+        'brown', 'lee', 'martin', 'singh', 'lopez', 'wang', 'ali', 'jones', 'ivanova', 'sato']
+ROLES = ['info', 'support', 'sales', 'admin', 'noreply', 'billing']
+
+
+def make_workload(count: int, seed: int = 7, dead_mx_ratio: float = 0.0) -> Workload:
+    """Address list with a realistic skew: a few consumer providers take most of
+    the volume, the rest is a Zipf-distributed tail of company domains hosted on
+    Google Workspace, Microsoft 365 or their own MX. Includes typos, duplicates,
+    role and disposable addresses, dead domains and DNS timeouts."""
+    rng = random.Random(seed)
+
+    consumer = {
+        'gmail.com': ['gmail-smtp-in.l.google.com', 'alt1.gmail-smtp-in.l.google.com'],
+        'outlook.com': ['outlook-com.olc.protection.outlook.com'],
+        'hotmail.com': ['hotmail-com.olc.protection.outlook.com'],
+        'yahoo.com': ['mta5.am0.yahoodns.net', 'mta6.am0.yahoodns.net'],
+        'icloud.com': ['mx01.mail.icloud.com', 'mx02.mail.icloud.com'],
+    }
+    consumer_weights = [35, 6, 4, 8, 5]
+
+    mx = dict(consumer)
+    host_profiles = {}
+    for hosts in consumer.values():
+        for host in hosts:
+            host_profiles[host] = 'yahoo' if 'yahoodns' in host else \
+                'microsoft' if 'outlook' in host else 'google' if 'google' in host else 'default'
+
+    company_count = max(50, count // 40)
+    companies = [f"company{i}.{rng.choice(['com', 'io', 'co.uk', 'de', 'net'])}" for i in range(company_count)]
+    nxdomain, timeouts = set(), set()
+    for domain in companies:
+        roll = rng.random()
+        if roll < 0.02:
+            nxdomain.add(domain)
+            continue
+        if roll < 0.025:
+            timeouts.add(domain)
+            continue
+        hosting = rng.random()
+        if hosting < 0.3:
+            hosts = ['aspmx.l.google.com', 'alt1.aspmx.l.google.com']
+        elif hosting < 0.55:
+            hosts = [domain.replace('.', '-') + '.mail.protection.outlook.com']
+        else:
+            hosts = [f'mx1.{domain}', f'mx2.{domain}']
+        mx[domain] = hosts
+        for host in hosts:
+            host_profiles.setdefault(host, 'google' if 'google' in host else
+                                     'microsoft' if 'outlook' in host else 'default')
+        if hosts[0].startswith('mx1.') and rng.random() < dead_mx_ratio:
+            host_profiles[hosts[0]] = 'dead'
+    # Zipf-like weights: a few large companies, a long tail of small ones
+    company_weights = [1 / (rank + 1) for rank in range(company_count)]
+
+    emails = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.03:
+            emails.append(f"{rng.choice(FIRST)}..{rng.choice(LAST)}@@{rng.choice(list(consumer))}")
+            continue
+        if roll < 0.04:
+            emails.append(f"{rng.choice(FIRST)}{rng.randint(1, 999)}@mailinator.com")
+            continue
+        if roll < 0.55:
+            domain = rng.choices(list(consumer), consumer_weights)[0]
+        else:
+            domain = rng.choices(companies, company_weights)[0]
+        if rng.random() < 0.03:
+            local = rng.choice(ROLES)
+        else:
+            local = f"{rng.choice(FIRST)}.{rng.choice(LAST)}{rng.choice(['', '', str(rng.randint(1, 99))])}"
+        emails.append(f"{local}@{domain}" if rng.random() > 0.05 else f"{local.upper()}@{domain.upper()}")
+    return Workload(emails, mx, nxdomain, timeouts, host_profiles)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def fake_redis(url: Optional[str] = None):
+    """A local Redis when ``url`` is given, fakeredis otherwise."""
+    if url:
+        import redis.asyncio as redis
+        return redis.Redis.from_url(url, decode_responses=True)
+    try:
+        import fakeredis
+    except ImportError:
+        raise SystemExit("fakeredis is required without --redis-url: pip install fakeredis lupa")
+    return fakeredis.FakeAsyncRedis(decode_responses=True)
+
+
+def host_router(ports: Dict[str, int], host_profiles: Dict[str, str]):
+    """``SMTPChecker.connect_to`` mapping every MX host onto its profile's local server."""
+    def connect_to(host: str) -> Tuple[str, int]:
+        return '127.0.0.1', ports[host_profiles.get(host, 'default')]
+    return connect_to
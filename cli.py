@@ -0,0 +1,43 @@
+import argparse
+import os
+import sys
+from app.core.file_runner import FileRunner
+from app.models.results import VerificationDepth
+from config import Config
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Verify a large CSV / text file offline across worker processes. "
+                    "Results are appended to OUTPUT (.csv, or .jsonl for JSON lines); an interrupted "
+                    "run resumes from OUTPUT.checkpoint when started again with the same arguments."
+    )
+    parser.add_argument("input", help=".csv / .tsv with an address column, or one address per line")
+    parser.add_argument("output")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--column", help="address column: header name or 0-based index (default: auto)")
+    parser.add_argument("--depth", choices=[depth.value for depth in VerificationDepth],
+                        default=VerificationDepth.FULL.value)
+    parser.add_argument("--shards", type=int, default=Config.FILE_SHARDS,
+                        help="domain shards; fixed for the life of a run, unlike --processes")
+    parser.add_argument("--chunk-size", type=int, default=Config.FILE_CHUNK_SIZE)
+    parser.add_argument("--in-flight", type=int, default=Config.FILE_CHUNKS_IN_FLIGHT,
+                        help="chunks each process verifies at once")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and start over")
+    args = parser.parse_args()
+
+    runner = FileRunner(
+        args.input, args.output, args.processes,
+        column=args.column,
+        depth=args.depth,
+        shards=args.shards,
+        chunk_size=args.chunk_size,
+        in_flight=args.in_flight,
+        checkpoint_interval=Config.FILE_CHECKPOINT_INTERVAL,
+        restart=args.restart
+    )
+    try:
+        runner.run()
+    except KeyboardInterrupt:
+        print("interrupted: progress saved, run the same command again to resume", file=sys.stderr)
+        sys.exit(130)
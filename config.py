@@ -11,8 +11,67 @@ class Config:
     REDIS_DB = int(os.getenv('REDIS_DB', 0))
 
     SMTP_TIMEOUT = 10
+    SMTP_PORT = int(os.getenv('SMTP_PORT', 25))
+    # bulk verification reuses one SMTP session for several recipients
+    SMTP_MAX_RCPT_PER_SESSION = 25
+    SMTP_RCPT_PER_TRANSACTION = 10
+    # the next MX is tried in parallel when the current one is silent this long (seconds)
+    SMTP_HEDGE_DELAY = 2.0
+    SMTP_MAX_MX_ATTEMPTS = 2
+    # MX hosts failing to connect this many times in a row are skipped, with backoff
+    SMTP_BREAKER_FAILURES = 2
+    SMTP_BREAKER_BASE_DELAY = 30
+    SMTP_BREAKER_MAX_DELAY = 1800
     MAX_CONCURRENT_VERIFICATIONS = 50
+    # global slots are shared by priority class (app/core/admission.py): under contention
+    # each class gets slots in proportion to its weight, and reserved slots are only
+    # usable by that class or a higher one
+    PRIORITY_WEIGHTS = {'interactive': 8, 'bulk': 2, 'background': 1}
+    PRIORITY_RESERVED = {'interactive': 10}
+    # addresses per class admitted and not yet finished (None = unbounded); past it
+    # requests get 429 with Retry-After. Background work (jobs, refreshes) is never shed.
+    ADMISSION_LIMITS = {
+        'interactive': int(os.getenv('ADMISSION_INTERACTIVE_LIMIT', 1000)),
+        'bulk': int(os.getenv('ADMISSION_BULK_LIMIT', 50000)),
+        'background': None,
+    }
+    # SMTP sessions one domain may run at once; also its share of global slots
+    SCHEDULER_DOMAIN_CONCURRENCY = 5
     CACHE_TTL = 86400
+    # how long a cached verdict stays fresh, per status (CACHE_TTL for any not listed):
+    # definitive verdicts live long, flaky ones are re-checked soon
+    RESULT_CACHE_TTLS = {
+        'valid': 86400,
+        'catch_all': 86400,
+        'invalid': 7 * 86400,
+        'disposable': 7 * 86400,
+        'risky': 1800,
+        'unknown': 600,
+    }
+    # once past its TTL a result is still served for this long while it is re-verified in the background
+    RESULT_CACHE_STALE_WINDOW = int(os.getenv('RESULT_CACHE_STALE_WINDOW', 6 * 3600))
+    RESULT_REFRESH_WORKERS = int(os.getenv('RESULT_REFRESH_WORKERS', 4))
+    RESULT_REFRESH_MAX_PENDING = 10000
+    CATCH_ALL_CACHE_TTL = 86400
+    # negative domain facts (NXDOMAIN, no MX) expire sooner
+    NEGATIVE_CACHE_TTL = 3600
+
+    # in-process L1 cache in front of Redis
+    L1_CACHE_MAX_ENTRIES = int(os.getenv('L1_CACHE_MAX_ENTRIES', 100000))
+    L1_CACHE_MAX_BYTES = int(os.getenv('L1_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    L1_CACHE_TTL = 300
+    # bulk verification flushes new results to Redis in pipelined batches
+    CACHE_WRITE_BATCH = 500
+    # 'compact' packs cached results and domain facts into short strings (app/utils/codec.py);
+    # 'json' writes the old format, for rolling back to workers that can only read that
+    CACHE_ENCODING = os.getenv('CACHE_ENCODING', 'compact')
+    # store results as fields of RESULT_CACHE_HASH_BUCKETS Redis hashes instead of one key each
+    RESULT_CACHE_HASHED = os.getenv('RESULT_CACHE_HASHED', 'false').lower() in ('1', 'true', 'yes')
+    RESULT_CACHE_HASH_BUCKETS = int(os.getenv('RESULT_CACHE_HASH_BUCKETS', 65536))
+    # add a per-stage millisecond breakdown to details['timings'] (debugging aid)
+    DETAILS_TIMINGS = os.getenv('DETAILS_TIMINGS', 'false').lower() in ('1', 'true', 'yes')
+    # streaming bulk endpoint: addresses in flight or awaiting the client
+    STREAM_MAX_PENDING = 200
 
     DNS_SERVERS = ['8.8.8.8', '1.1.1.1', '8.8.4.4']
 
@@ -20,5 +79,72 @@ class Config:
 
     RATE_LIMIT_PER_MINUTE = 100
 
+    # SMTP throttling is keyed by the receiving infrastructure: domains whose MX matches a
+    # provider share its budget (sessions/minute) and concurrency; any other domain is
+    # bucketed by its primary MX host with PROVIDER_DEFAULT_* limits
+    PROVIDER_DEFAULT_MAX_CALLS = 60
+    PROVIDER_DEFAULT_CONCURRENCY = SCHEDULER_DOMAIN_CONCURRENCY
+    PROVIDER_POLICIES = {
+        'google': {'mx': ['*.google.com', '*.googlemail.com'], 'max_calls': 120, 'concurrency': 10},
+        'microsoft': {'mx': ['*.mail.protection.outlook.com', '*.olc.protection.outlook.com',
+                             '*.hotmail.com', '*.outlook.com'], 'max_calls': 90, 'concurrency': 8},
+        'yahoo': {'mx': ['*.yahoodns.net', '*.yahoo.com'], 'max_calls': 30, 'concurrency': 3},
+        'apple': {'mx': ['*.icloud.com', '*.me.com'], 'max_calls': 30, 'concurrency': 3},
+        'zoho': {'mx': ['*.zoho.com', '*.zoho.eu', '*.zoho.in'], 'max_calls': 60, 'concurrency': 5},
+        'proofpoint': {'mx': ['*.pphosted.com', '*.ppe-hosted.com'], 'max_calls': 60, 'concurrency': 5},
+        'mimecast': {'mx': ['*.mimecast.com', '*.mimecast.co.za'], 'max_calls': 60, 'concurrency': 5},
+    }
+
+    # adaptive per-MX pacing (AIMD): sessions/minute and concurrent sessions per MX host
+    # grow while RCPTs are answered under the latency target and halve on 4xx/resets/timeouts
+    CONGESTION_INITIAL_RATE = 60
+    CONGESTION_MIN_RATE = 2
+    CONGESTION_MAX_RATE = 600
+    CONGESTION_INITIAL_CONCURRENCY = 2
+    CONGESTION_MAX_CONCURRENCY = 20
+    CONGESTION_LATENCY_TARGET = 2.0
+
+    # per-domain SMTP limiter: "memory" keeps the budget per process, "redis" shares it
+    # across workers and nodes. Prefetch > 1 reserves grants in batches.
+    RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'memory')
+    RATE_LIMIT_PREFETCH = int(os.getenv('RATE_LIMIT_PREFETCH', 1))
+
+    # disposable domains: one domain per line; compiled to "<file>.idx" and hot-reloaded on change
+    DISPOSABLE_DOMAINS_FILE = os.getenv('DISPOSABLE_DOMAINS_FILE', 'data/disposable_domains.txt')
+    DISPOSABLE_SNAPSHOT_FILE = os.getenv('DISPOSABLE_SNAPSHOT_FILE')
+    DISPOSABLE_RELOAD_INTERVAL = 60
+    DISPOSABLE_MX_PATTERNS = [
+        '*.mailinator.com', 'mx*.yopmail.com', '*.guerrillamail.com',
+        '*.trashmail.com', '*.temp-mail.org', '*.10minutemail.com'
+    ]
+
+    # bulk jobs: worker coroutines started by the API process (0 = run worker.py instead)
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', 0))
+    JOB_BATCH_SIZE = 50
+    # stable, unique per process: a restart replays its own unacknowledged items. Unset, each
+    # run gets a fresh name and a crashed run's items are reclaimed after JOB_CLAIM_IDLE_MS
+    JOB_CONSUMER_NAME = os.getenv('JOB_CONSUMER_NAME')
+    JOB_CLAIM_IDLE_MS = 5 * 60 * 1000
+    JOB_MAX_ATTEMPTS = 3
+    JOB_RESULT_TTL = 7 * 86400
+
+    # sharded serving (app/core/sharding.py): with SHARD_WORKERS > 0 the API process only
+    # dispatches, and each address is verified by the worker process its domain hashes to,
+    # so a domain's DNS/catch-all caches, limits and SMTP sessions live in one process
+    SHARD_WORKERS = int(os.getenv('SHARD_WORKERS', 0))
+    SHARD_SOCKET_DIR = os.getenv('SHARD_SOCKET_DIR')  # default: a temporary directory
+    SHARD_VNODES = 128
+    SHARD_HEALTH_INTERVAL = 1.0
+    SHARD_START_TIMEOUT = 30
+    # a worker being removed gets this long to answer what it was sent
+    SHARD_DRAIN_TIMEOUT = 30
+
+    # offline file verification (cli.py): rows are grouped into FILE_SHARDS domain shards,
+    # sent to worker processes FILE_CHUNK_SIZE rows at a time, FILE_CHUNKS_IN_FLIGHT per process
+    FILE_SHARDS = 64
+    FILE_CHUNK_SIZE = 1000
+    FILE_CHUNKS_IN_FLIGHT = 8
+    FILE_CHECKPOINT_INTERVAL = 5
+
 
 config = Config()
\ No newline at end of file
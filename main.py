@@ -1,20 +1,55 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Request, Query
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
 from typing import List, Optional
 import uvicorn
+from app.core.admission import BULK, Overloaded
 from app.core.verifier import EmailVerifier
-from app.models.results import VerificationResult
+from app.core.jobs import JobManager, JobWorkerPool
+from app.core.sharding import ShardDispatcher
+from app.models.results import VerificationDepth, VerificationResult
+from app.models.jobs import JobInfo, JobResultsPage
+from app.utils.helpers import iter_emails
+from app.utils.metrics import REGISTRY
+from app.utils.serialization import dumps
+from config import Config
 import asyncio
 
 app = FastAPI(title="Email Verification Service", version="1.0.0")
 verifier = EmailVerifier()
+# SHARD_WORKERS > 0: addresses are verified by worker processes, each owning a share of the domains
+shards = ShardDispatcher(Config.SHARD_WORKERS, Config.SHARD_SOCKET_DIR) if Config.SHARD_WORKERS > 0 else None
+verification = shards or verifier
+job_manager = JobManager(verifier.cache.redis, result_ttl=Config.JOB_RESULT_TTL)
+job_workers = JobWorkerPool(
+    job_manager, verification,
+    workers=Config.JOB_WORKERS,
+    batch_size=Config.JOB_BATCH_SIZE,
+    consumer=Config.JOB_CONSUMER_NAME,
+    claim_idle_ms=Config.JOB_CLAIM_IDLE_MS,
+    max_attempts=Config.JOB_MAX_ATTEMPTS
+)
 
 
-class EmailRequest(BaseModel):
+class VerificationOptions(BaseModel):
+    # stop after this stage; details.depth in the result says how far the check got
+    depth: VerificationDepth = VerificationDepth.FULL
+    # answer with the best verdict so far once this budget is spent (for the whole list in bulk)
+    deadline_ms: Optional[int] = Field(None, gt=0)
+    # finish answers short of full depth in the background to fill the cache
+    background: bool = False
+
+    def verifier_kwargs(self) -> dict:
+        return {"depth": self.depth.value,
+                "deadline": self.deadline_ms / 1000 if self.deadline_ms else None,
+                "background": self.background}
+
+
+class EmailRequest(VerificationOptions):
     email: str
 
 
-class BulkEmailRequest(BaseModel):
+class BulkEmailRequest(VerificationOptions):
     emails: List[str]
 
 
@@ -31,41 +66,152 @@ class BulkVerificationResponse(BaseModel):
     valid_count: int
 
 
+@app.on_event("startup")
+async def start_job_workers():
+    if shards is not None:
+        await shards.start()
+    if Config.JOB_WORKERS > 0:
+        try:
+            await job_workers.start()
+        except Exception:
+            # Redis down at boot: the API still serves synchronous verification
+            pass
+
+
+@app.on_event("shutdown")
+async def stop_job_workers():
+    await job_workers.stop()
+    await verifier.refresher.stop()
+    if shards is not None:
+        await shards.stop()
+
+
+class UploadStreamingResponse(StreamingResponse):
+    """StreamingResponse that leaves ``receive`` alone while streaming.
+
+    Starlette's version listens for disconnects on ``receive``, which would compete
+    with the endpoint still reading the request body.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
 @app.get("/")
 async def root():
     return {"message": "Email Verification Service", "status": "running"}
 
 
+def json_response(body: dict) -> Response:
+    """Encode verifier output straight to bytes. ``response_model`` still documents
+    the schema, but returning a Response skips FastAPI's re-validation of it."""
+    return Response(content=dumps(body), media_type="application/json")
+
+
+def too_many_requests(e: Overloaded) -> HTTPException:
+    return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
 @app.post("/verify", response_model=VerificationResponse)
 async def verify_email(request: EmailRequest):
     try:
-        result = await verifier.verify_single(request.email)
-        return VerificationResponse(success=True, data=result)
+        result = await verification.verify_single(request.email, **request.verifier_kwargs())
+        return json_response({"success": True, "data": result, "error": None})
+    except Overloaded as e:
+        raise too_many_requests(e)
     except Exception as e:
-        return VerificationResponse(success=False, error=str(e))
+        return json_response({"success": False, "data": None, "error": str(e)})
 
 
 @app.post("/verify-bulk", response_model=BulkVerificationResponse)
 async def verify_bulk_emails(request: BulkEmailRequest):
     try:
-        results = await verifier.verify_bulk(request.emails)
+        results = await verification.verify_bulk(request.emails, **request.verifier_kwargs())
         valid_count = sum(1 for r in results if r.is_verified)
 
-        return BulkVerificationResponse(
-            success=True,
-            data=results,
-            total=len(results),
-            valid_count=valid_count
-        )
+        return json_response({
+            "success": True,
+            "data": results,
+            "total": len(results),
+            "valid_count": valid_count
+        })
+    except Overloaded as e:
+        raise too_many_requests(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/verify-bulk/stream")
+async def verify_bulk_stream(request: Request):
+    """Verify a JSON array or newline-delimited list of addresses while it uploads.
+    Responds with NDJSON results in completion order, then a summary line."""
+    # refuse before the 200 goes out; the stream re-checks once it starts
+    try:
+        verification.admission.check(BULK, Config.STREAM_MAX_PENDING)
+    except Overloaded as e:
+        raise too_many_requests(e)
+
+    async def ndjson():
+        total = valid_count = 0
+        status_counts = {}
+        try:
+            async for result in verification.verify_stream(iter_emails(request.stream())):
+                total += 1
+                valid_count += result.is_verified
+                status_counts[result.status] = status_counts.get(result.status, 0) + 1
+                yield dumps(result) + b"\n"
+        except Exception as e:
+            yield dumps({"error": str(e)}) + b"\n"
+
+        yield dumps({"summary": {
+            "total": total,
+            "valid_count": valid_count,
+            "status_counts": status_counts
+        }}) + b"\n"
+
+    return UploadStreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+
+@app.post("/jobs", response_model=JobInfo, status_code=202)
+async def submit_job(request: BulkEmailRequest):
+    try:
+        job_id = await job_manager.submit(request.emails)
+        return await job_manager.status(job_id)
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+@app.get("/jobs/{job_id}", response_model=JobInfo)
+async def get_job(job_id: str):
+    status = await job_manager.status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return status
+
+
+@app.get("/jobs/{job_id}/results", response_model=JobResultsPage)
+async def get_job_results(job_id: str, offset: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=1000)):
+    status = await job_manager.status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    data = await job_manager.results(job_id, offset, limit)
+    return JobResultsPage(job_id=job_id, offset=offset, limit=limit, total=status['total'], data=data)
+
+
+@app.delete("/jobs/{job_id}", response_model=JobInfo)
+async def cancel_job(job_id: str):
+    if not await job_manager.cancel(job_id):
+        raise HTTPException(status_code=404, detail="job not found")
+    return await job_manager.status(job_id)
+
+
 # TEST ENDPOINTS
 @app.get("/test/single")
 async def test_single_verification():
     """Test endpoint for single verification"""
-    result = await verifier.verify_single("bookf826@gmail.com")
+    result = await verification.verify_single("bookf826@gmail.com")
     return {
         "email": result.email,
         "status": result.status,
@@ -88,7 +234,7 @@ async def test_bulk_verification():
         "annoy.inovace@gmail.com",
     ]
 
-    results = await verifier.verify_bulk(emails)
+    results = await verification.verify_bulk(emails)
 
     return {
         "results": [
@@ -107,6 +253,68 @@ async def test_bulk_verification():
     }
 
 
+# with SHARD_WORKERS > 0 the front verifier sits idle: these report every worker's, by shard
+
+@app.get("/cache/stats")
+async def cache_stats():
+    if shards is not None:
+        return {"shards": {name: stats["cache"] for name, stats in (await shards.stats()).items()}}
+    return dict(verifier.cache.stats(), refresh=verifier.refresher.stats())
+
+
+@app.get("/admission")
+async def admission_state():
+    """Backlog, limit and rejections per priority class, plus global slot usage."""
+    if shards is not None:
+        slots = [stats["slots"] for stats in (await shards.stats()).values()]
+        slots = {"capacity": sum(s["capacity"] for s in slots), "in_use": sum(s["in_use"] for s in slots)}
+    else:
+        slots = {"capacity": verifier.global_semaphore.capacity,
+                 "in_use": verifier.global_semaphore.in_use()}
+    return {"classes": verification.admission.stats(),
+            "slots": slots,
+            "throughput": round(verification.admission.throughput(), 2)}
+
+
+@app.get("/congestion")
+async def congestion_state():
+    """Learned per-MX limits, outcome counts and recent AIMD decisions."""
+    if shards is not None:
+        return {"shards": {name: {"hosts": stats["congestion"], "open_circuits": stats["open_circuits"]}
+                           for name, stats in (await shards.stats()).items()}}
+    return {"hosts": verifier.congestion.snapshot(),
+            "open_circuits": verifier.smtp_checker.breaker.snapshot()}
+
+
+@app.get("/congestion/{host}")
+async def congestion_host_state(host: str):
+    if shards is not None:
+        # a host serving several domains can be paced by more than one shard
+        state = {name: stats["congestion"][0]
+                 for name, stats in (await shards.stats(host)).items() if stats["congestion"]}
+        if not state:
+            raise HTTPException(status_code=404, detail="host not tracked")
+        return {"shards": state}
+    state = verifier.congestion.snapshot(host)
+    if not state:
+        raise HTTPException(status_code=404, detail="host not tracked")
+    return state[0]
+
+
+@app.get("/shards")
+async def shard_state():
+    """Worker processes of the sharded mode: liveness, in-flight requests and share of domains."""
+    if shards is None:
+        raise HTTPException(status_code=404, detail="sharding is off (SHARD_WORKERS=0)")
+    return shards.snapshot()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Prometheus text exposition: stage latencies, verdicts, SMTP replies, queues, cache."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "service": "email_verification"}
@@ -0,0 +1,21 @@
+import os
+import sys
+
+import fakeredis
+import pytest
+
+# the app is run from the repository root (python main.py); import it the same way
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def redis_server():
+    """One fake Redis server; every client made with ``redis_client`` talks to it."""
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def redis_client(redis_server):
+    def connect():
+        return fakeredis.aioredis.FakeRedis(server=redis_server, decode_responses=True)
+    return connect
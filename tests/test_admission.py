@@ -0,0 +1,45 @@
+import pytest
+
+from app.core.admission import BULK, INTERACTIVE, AdmissionController, Overloaded
+
+
+def test_refuses_past_the_limit_but_admits_an_idle_class():
+    admission = AdmissionController({BULK: 10, INTERACTIVE: None})
+
+    # larger than the limit, but nothing else of the class is running
+    with admission.admit(BULK, 50):
+        with pytest.raises(Overloaded) as refused:
+            with admission.admit(BULK, 1):
+                pass
+        assert refused.value.priority == BULK
+        # other classes have their own backlog
+        with admission.admit(INTERACTIVE, 1000):
+            pass
+
+    with admission.admit(BULK, 10):
+        assert admission.backlog(BULK) == 10
+    assert admission.backlog(BULK) == 0
+    assert admission.stats()[BULK] == {'backlog': 0, 'limit': 10, 'rejected': 1}
+
+
+def test_retry_after_follows_the_completion_rate(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('app.core.admission.time.monotonic', lambda: now[0])
+    admission = AdmissionController({BULK: 100}, rate_window=10, max_retry_after=300)
+    assert admission.retry_after(50) == 300
+
+    for second in range(10):
+        now[0] = 1000.0 + second
+        with admission.admit(BULK, 20):
+            pass
+    # 200 addresses over the last 10 seconds
+    assert admission.throughput() == 20
+    with admission.admit(BULK, 100):
+        with pytest.raises(Overloaded) as refused:
+            admission.check(BULK, 60)
+    assert refused.value.retry_after == 3
+
+    # nothing finished within the window any more
+    now[0] += 30
+    assert admission.throughput() == 0
+    assert admission.retry_after(1) == 300
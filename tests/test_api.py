@@ -0,0 +1,108 @@
+import asyncio
+import json
+
+import httpx
+from fastapi.encoders import jsonable_encoder
+
+import main
+from app.models.results import ResultRecord, VerificationResult
+from app.utils import serialization
+from benchmarks.fakes import FakeResolver, FakeSMTPServer
+
+EMAILS = ['jane.roe@example.org', 'john.doe@example.org', 'info@example.org', 'x@mailinator.com', 'bad@@x',
+          'john.doe@gone.com']
+
+
+def call_api(redis_client, monkeypatch, requests, configure=None, **server_options):
+    """Send ``requests`` ((method, path, json) tuples) to the app, verifying against
+    fake DNS and SMTP; returns the responses. ``configure(verifier)`` runs first."""
+    async def scenario():
+        server = FakeSMTPServer(**{'mailbox_ratio': 0.5, **server_options})
+        await server.start()
+        verifier = main.EmailVerifier(redis_client=redis_client(),
+                                      resolver=FakeResolver({'example.org': ['mx.example.org']}))
+        verifier.smtp_checker.connect_to = lambda host: ('127.0.0.1', server.port)
+        if configure is not None:
+            configure(verifier)
+        monkeypatch.setattr(main, 'verification', verifier)
+        try:
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url='http://test') as client:
+                return await asyncio.gather(*(client.request(method, path, json=body)
+                                              for method, path, body in requests))
+        finally:
+            await verifier.refresher.stop()
+            await server.stop()
+
+    return asyncio.run(scenario())
+
+
+def test_bulk_response_matches_the_published_schema(redis_client, monkeypatch):
+    response, = call_api(redis_client, monkeypatch, [('POST', '/verify-bulk', {'emails': EMAILS})])
+    assert response.status_code == 200
+    assert response.headers['content-type'] == 'application/json'
+
+    body = response.json()
+    # what FastAPI would have sent by validating through response_model
+    validated = main.BulkVerificationResponse.model_validate(body)
+    assert jsonable_encoder(validated) == body
+    assert [result['email'] for result in body['data']] == EMAILS
+    assert body['total'] == len(EMAILS)
+    assert body['valid_count'] == sum(result['is_verified'] for result in body['data'])
+    assert {result['status'] for result in body['data']} >= {'invalid', 'disposable'}
+
+
+def test_single_response_matches_the_published_schema(redis_client, monkeypatch):
+    response, = call_api(redis_client, monkeypatch, [('POST', '/verify', {'email': 'jane.roe@example.org'})])
+    body = response.json()
+    assert jsonable_encoder(main.VerificationResponse.model_validate(body)) == body
+    assert body['success'] and body['error'] is None
+    assert body['data']['details']['quality_score'] == body['data']['quality_score']
+
+
+def test_both_encoders_produce_the_same_document(monkeypatch):
+    record = ResultRecord(email='josé@example.org', status='valid', quality_score=90,
+                          details={'mx_servers': ['mx.example.org'], 'smtp_code': 250, 'depth': 'full'},
+                          is_verified=True)
+    body = {'success': True, 'data': [record], 'total': 1}
+    fast = serialization.dumps(body)
+
+    monkeypatch.setattr(serialization, 'orjson', None)
+    fallback = serialization.dumps(body)
+    assert json.loads(fast) == json.loads(fallback) == jsonable_encoder(
+        {**body, 'data': [VerificationResult(**record.dict())]})
+    # compact, like FastAPI's JSONResponse
+    assert b': ' not in fallback and b', ' not in fallback
+
+
+def test_record_dict_does_not_share_details():
+    record = ResultRecord(email='a@example.org', status='valid', quality_score=90, details={'depth': 'full'},
+                          is_verified=True)
+    record.dict()['details']['depth'] = 'dns'
+    assert record.details == {'depth': 'full'}
+
+
+def test_full_backlog_answers_429_with_retry_after(redis_client, monkeypatch):
+    def configure(verifier):
+        verifier.admission.limits['bulk'] = 4
+
+    emails = [f'user.{i}@example.org' for i in range(3)]
+    responses = call_api(redis_client, monkeypatch, [('POST', '/verify-bulk', {'emails': emails}),
+                                                     ('POST', '/verify-bulk', {'emails': emails[:2]}),
+                                                     ('POST', '/verify', {'email': 'jane.roe@example.org'})],
+                         configure=configure, latency=0.05)
+
+    assert [response.status_code for response in responses] == [200, 429, 200]
+    refused = responses[1]
+    # nothing has finished yet, so the longest delay is suggested
+    assert refused.headers['retry-after'] == '300'
+    assert 'bulk verification backlog is full' in refused.json()['detail']
+
+
+def test_stream_is_refused_before_it_starts(redis_client, monkeypatch):
+    def configure(verifier):
+        verifier.admission.limits['bulk'] = main.Config.STREAM_MAX_PENDING + 1
+        verifier.admission._backlog['bulk'] = 2
+
+    response, = call_api(redis_client, monkeypatch, [('POST', '/verify-bulk/stream', None)], configure=configure)
+    assert response.status_code == 429
+    assert int(response.headers['retry-after']) > 0
@@ -0,0 +1,210 @@
+import asyncio
+
+from app.core.verifier import MX_CACHE_PREFIX, NEGATIVE_CACHE_TTL, EmailVerifier
+from app.utils.cache import CacheManager, CacheWriteBuffer, HashLayout, LocalTTLCache, json_decode
+from benchmarks.fakes import FakeResolver
+
+
+def test_local_cache_expires_entries_after_their_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('app.utils.cache.time.monotonic', lambda: now[0])
+    local = LocalTTLCache(default_ttl=60)
+
+    local.set('short', '"a"', ttl=10)
+    local.set('capped', '"b"', ttl=3600)
+    now[0] += 11
+    assert local.get('short') is None
+    assert local.get('capped') == '"b"'
+    # the L1 TTL never outlives default_ttl, whatever Redis keeps
+    now[0] += 50
+    assert local.get('capped') is None
+
+    assert local.stats()['expirations'] == 2
+    assert len(local) == 0 and local.bytes == 0
+
+
+def test_local_cache_evicts_least_recently_used_entries():
+    local = LocalTTLCache(max_entries=2)
+    local.set('a', '1')
+    local.set('b', '2')
+    local.get('a')
+    local.set('c', '3')
+
+    assert local.get('b') is None
+    assert local.get('a') == '1' and local.get('c') == '3'
+    assert local.stats()['evictions'] == 1
+
+
+def test_local_cache_stays_under_its_byte_budget():
+    payload = 'x' * 1000
+    local = LocalTTLCache(max_bytes=5000)
+    for i in range(20):
+        local.set(f'k{i}', payload)
+
+    assert local.bytes <= 5000
+    assert 0 < len(local) < 20
+    assert local.get('k19') == payload
+    # a payload larger than the whole budget is never cached
+    local.set('huge', 'x' * 10000)
+    assert local.get('huge') is None
+
+
+def test_hits_are_served_from_local_cache_after_the_first_read(redis_client):
+    async def scenario():
+        redis = redis_client()
+        await redis.set('k', '{"status": "valid"}')
+        cache = CacheManager(client=redis, local_cache=LocalTTLCache())
+
+        first = await cache.get('k')
+        await redis.delete('k')
+        second = await cache.get('k')
+
+        assert first == second == {'status': 'valid'}
+        # the second copy is not the same object handed out the first time
+        assert first is not second
+        stats = cache.stats()
+        assert stats['l2'] == {'hits': 1, 'misses': 0, 'errors': 0}
+        assert stats['l1']['hits'] == 1
+
+    asyncio.run(scenario())
+
+
+def test_writes_go_through_both_tiers(redis_client):
+    async def scenario():
+        redis = redis_client()
+        cache = CacheManager(client=redis, local_cache=LocalTTLCache(default_ttl=60))
+
+        await cache.set('k', [1, 2], ttl=600)
+        assert cache.local.get('k') == '[1, 2]'
+        assert await redis.get('k') == '[1, 2]'
+        assert 590 <= await redis.ttl('k') <= 600
+
+        await cache.delete('k')
+        assert await cache.get('k') is None
+        assert await redis.exists('k') == 0
+
+    asyncio.run(scenario())
+
+
+def test_dead_domains_are_cached_as_negative_mx_entries(redis_client):
+    async def scenario():
+        resolver = FakeResolver({}, nxdomain=['gone.example'])
+        verifier = EmailVerifier(redis_client=redis_client(), resolver=resolver)
+        first = await verifier.verify_single('john@gone.example')
+        await verifier.refresher.stop()
+
+        redis = redis_client()
+        assert await redis.exists(MX_CACHE_PREFIX + 'gone.example') == 1
+        assert 0 < await redis.ttl(MX_CACHE_PREFIX + 'gone.example') <= NEGATIVE_CACHE_TTL
+
+        # another process sharing the Redis answers from the negative entry alone
+        other_resolver = FakeResolver({})
+        other = EmailVerifier(redis_client=redis_client(), resolver=other_resolver)
+        assert await other._resolve_mx('jane@gone.example', 'gone.example') == (False, [])
+        assert other_resolver.queries == 0
+        assert first.status == 'invalid'
+        await other.refresher.stop()
+
+    asyncio.run(scenario())
+
+
+def test_get_many_sends_one_mget_per_chunk(redis_client):
+    async def scenario():
+        redis = redis_client()
+        for i in range(0, 25, 2):
+            await redis.set(f'k{i}', str(i))
+        await redis.set('bad', '{not json')
+        cache = CacheManager(client=redis)
+        calls = []
+        mget = redis.mget
+
+        async def counting_mget(keys):
+            calls.append(len(keys))
+            return await mget(keys)
+
+        redis.mget = counting_mget
+        found = await cache.get_many([f'k{i}' for i in range(25)] + ['k0', 'bad'], chunk_size=10)
+
+        assert calls == [10, 10, 6]
+        assert found == {f'k{i}': i for i in range(0, 25, 2)}
+        assert cache.stats()['l2'] == {'hits': 13, 'misses': 13, 'errors': 0}
+
+    asyncio.run(scenario())
+
+
+def test_get_many_skips_redis_for_local_hits(redis_client):
+    async def scenario():
+        redis = redis_client()
+        cache = CacheManager(client=redis, local_cache=LocalTTLCache())
+        await cache.set_many({f'k{i}': i for i in range(5)}, ttl=600, chunk_size=2)
+        assert await redis.mget([f'k{i}' for i in range(5)]) == ['0', '1', '2', '3', '4']
+
+        redis.mget = None  # any L2 read would fail the lookup
+        assert await cache.get_many([f'k{i}' for i in range(5)]) == {f'k{i}': i for i in range(5)}
+
+    asyncio.run(scenario())
+
+
+def test_hash_layout_round_trip_and_generations(redis_client, monkeypatch):
+    now = [86400 * 100 + 10.0]
+    monkeypatch.setattr('app.utils.cache.time.time', lambda: now[0])
+
+    async def scenario():
+        redis = redis_client()
+        layout = HashLayout('p:', buckets=4)
+        cache = CacheManager(client=redis)
+        await cache.hset_many({f'p:{i}': i for i in range(20)}, layout, chunk_size=7)
+
+        assert await redis.dbsize() <= 4
+        hash_key = layout.write_location('p:3')[0]
+        assert 0 < await redis.ttl(hash_key) <= layout.hash_ttl
+
+        # the previous generation is still read the next day
+        now[0] += 86400
+        fresh = CacheManager(client=redis)
+        found = await fresh.hget_many([f'p:{i}' for i in range(25)], layout, chunk_size=10)
+        assert found == {f'p:{i}': i for i in range(20)}
+
+    asyncio.run(scenario())
+
+
+def test_hget_many_drops_fields_that_fail_to_decode(redis_client):
+    async def scenario():
+        redis = redis_client()
+        layout = HashLayout('p:', buckets=4)
+        cache = CacheManager(client=redis)
+        await cache.hset_many({'p:old': 'expired', 'p:new': 'ok'}, layout)
+
+        def decode(key, payload):
+            value = json_decode(key, payload)
+            return None if value == 'expired' else value
+
+        assert await cache.hget_many(['p:old', 'p:new'], layout, decode=decode) == {'p:new': 'ok'}
+        assert await redis.hexists(*layout.write_location('p:old')) == 0
+        assert await redis.hexists(*layout.write_location('p:new')) == 1
+
+    asyncio.run(scenario())
+
+
+def test_write_buffer_flushes_in_batches(redis_client):
+    async def scenario():
+        redis = redis_client()
+        cache = CacheManager(client=redis)
+        batches = []
+
+        async def write(items, ttl):
+            batches.append(len(items))
+            await cache.set_many(items, ttl=ttl)
+
+        writer = CacheWriteBuffer(cache, ttl=600, batch_size=4, write=write)
+        for i in range(10):
+            await writer.add(f'k{i}', i)
+        assert batches == [4, 4]
+        assert await redis.exists('k9') == 0
+
+        await writer.flush()
+        await writer.flush()
+        assert batches == [4, 4, 2]
+        assert await cache.get_many([f'k{i}' for i in range(10)]) == {f'k{i}': i for i in range(10)}
+
+    asyncio.run(scenario())
@@ -0,0 +1,64 @@
+from app.core.circuit_breaker import HostCircuitBreaker
+
+
+def make_breaker(monkeypatch, **options):
+    now = [1000.0]
+    monkeypatch.setattr('app.core.circuit_breaker.time.monotonic', lambda: now[0])
+    return HostCircuitBreaker(**options), now
+
+
+def test_opens_after_consecutive_failures_and_backs_off(monkeypatch):
+    breaker, now = make_breaker(monkeypatch, failure_threshold=2, base_delay=30, max_delay=100)
+
+    breaker.record_failure('mx.example.com')
+    assert breaker.allow('mx.example.com')
+    breaker.record_failure('mx.example.com')
+    assert not breaker.allow('mx.example.com')
+    assert breaker.snapshot() == [{'host': 'mx.example.com', 'failures': 2, 'retry_in': 30.0}]
+
+    # one trial once the delay is over; others keep waiting for its outcome
+    now[0] += 30
+    assert breaker.allow('mx.example.com')
+    assert not breaker.allow('mx.example.com')
+    breaker.record_failure('mx.example.com')
+    assert breaker.snapshot()[0]['retry_in'] == 60.0
+    now[0] += 60
+    assert breaker.allow('mx.example.com')
+    breaker.record_failure('mx.example.com')
+    # capped at max_delay
+    assert breaker.snapshot()[0]['retry_in'] == 100.0
+
+
+def test_a_successful_trial_closes_the_circuit(monkeypatch):
+    breaker, now = make_breaker(monkeypatch, failure_threshold=1, base_delay=10)
+    breaker.record_failure('mx.example.com')
+    assert breaker.is_open('mx.example.com')
+
+    now[0] += 10
+    assert breaker.allow('mx.example.com')
+    breaker.record_success('mx.example.com')
+    assert not breaker.is_open('mx.example.com')
+    assert breaker.allow('mx.example.com') and breaker.allow('mx.example.com')
+    assert breaker.snapshot() == []
+
+
+def test_a_trial_that_never_reports_stops_blocking(monkeypatch):
+    breaker, now = make_breaker(monkeypatch, failure_threshold=1, base_delay=10, trial_timeout=60)
+    breaker.record_failure('mx.example.com')
+    now[0] += 10
+    assert breaker.allow('mx.example.com')
+
+    now[0] += 59
+    assert not breaker.allow('mx.example.com')
+    now[0] += 1
+    assert breaker.allow('mx.example.com')
+
+
+def test_tracks_a_bounded_number_of_hosts(monkeypatch):
+    breaker, _ = make_breaker(monkeypatch, failure_threshold=1, max_hosts=3)
+    for i in range(5):
+        breaker.record_failure(f'mx{i}.example.com')
+
+    assert [state['host'] for state in breaker.snapshot()] == ['mx2.example.com', 'mx3.example.com',
+                                                                'mx4.example.com']
+    assert breaker.allow('mx0.example.com')
@@ -0,0 +1,59 @@
+import asyncio
+
+from app.core.congestion import CONGESTION_KEY_PREFIX, OK, THROTTLED, CongestionController
+
+
+def test_first_record_keeps_the_saved_limits(redis_client):
+    async def scenario():
+        redis = redis_client()
+        await redis.hset(CONGESTION_KEY_PREFIX + 'mx.example.com', mapping={'rate': 400, 'concurrency': 10})
+        congestion = CongestionController(redis_client=redis)
+
+        # a restarted process hears about the host before any acquire()
+        congestion.record('mx.example.com', OK, 0.1)
+        congestion.record('mx.example.com', THROTTLED)
+        await asyncio.sleep(0.1)
+
+        state = congestion.snapshot('mx.example.com')[0]
+        assert state['rate_per_minute'] == 200.5
+        assert state['concurrency'] == 5
+        saved = await redis.hgetall(CONGESTION_KEY_PREFIX + 'mx.example.com')
+        assert float(saved['rate']) == 200.5
+
+    asyncio.run(scenario())
+
+
+def test_outcomes_before_the_load_finishes_are_not_lost(redis_client):
+    async def scenario():
+        redis = redis_client()
+        await redis.hset(CONGESTION_KEY_PREFIX + 'mx.example.com', mapping={'rate': 400, 'concurrency': 10})
+        congestion = CongestionController(redis_client=redis)
+
+        acquire = asyncio.ensure_future(congestion.acquire('mx.example.com'))
+        congestion.record('mx.example.com', OK, 0.1)
+        await acquire
+        await asyncio.sleep(0.1)
+
+        state = congestion.snapshot('mx.example.com')[0]
+        assert state['rate_per_minute'] == 401
+        assert state['outcomes'][OK] == 1
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_while_paced_gives_the_slot_back():
+    async def scenario():
+        congestion = CongestionController(initial_rate=60, initial_concurrency=1)
+        await congestion.acquire('mx.example.com')
+        congestion.release('mx.example.com')
+
+        # next start is a second away: cancel the caller during the pacing sleep
+        paced = asyncio.ensure_future(congestion.acquire('mx.example.com'))
+        await asyncio.sleep(0.05)
+        paced.cancel()
+        await asyncio.gather(paced, return_exceptions=True)
+        await asyncio.sleep(0)
+        assert congestion.snapshot('mx.example.com')[0]['in_flight'] == 0
+        await asyncio.wait_for(congestion.acquire('mx.example.com'), 3)
+
+    asyncio.run(scenario())
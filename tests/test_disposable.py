@@ -0,0 +1,88 @@
+import mmap
+import os
+import time
+
+from app.core.disposable import DisposableDomainIndex, DisposableDomains
+
+
+def write_list(path, domains):
+    path.write_text(''.join(f'{d}\n' for d in domains))
+
+
+def test_lookups_match_the_domain_and_its_parents(tmp_path):
+    domains_file = tmp_path / 'disposable.txt'
+    domains_file.write_text('# comment\nMailinator.com\ntrash-mail.io.  # trailing dot\n\n')
+    disposable = DisposableDomains(str(domains_file), builtin=['tempmail.org'], reload_interval=0)
+
+    assert disposable.is_disposable_domain('mailinator.com')
+    assert disposable.is_disposable_domain('x.y.MAILINATOR.com')
+    assert disposable.is_disposable_domain('trash-mail.io.')
+    assert disposable.is_disposable_domain('box.tempmail.org')
+    assert not disposable.is_disposable_domain('notmailinator.com')
+    # a bare public suffix never matches
+    assert not disposable.is_disposable_domain('com')
+    assert len(disposable) == 3
+
+
+def test_snapshot_is_memory_mapped_on_the_next_start(tmp_path):
+    domains_file = tmp_path / 'disposable.txt'
+    write_list(domains_file, [f'd{i}.example' for i in range(1000)])
+    first = DisposableDomains(str(domains_file), reload_interval=0)
+    snapshot = f'{domains_file}.idx'
+    assert os.path.exists(snapshot)
+    # 36-byte header, then 8 bytes per domain
+    assert os.path.getsize(snapshot) == 36 + 8 * 1000
+
+    again = DisposableDomains(str(domains_file), reload_interval=0)
+    assert isinstance(again.index._source, mmap.mmap)
+    assert all(again.is_disposable_domain(f'd{i}.example') for i in range(1000))
+    assert not again.is_disposable_domain('d1000.example')
+    assert len(first) == len(again) == 1000
+
+
+def test_outdated_or_damaged_snapshots_are_rebuilt(tmp_path):
+    domains_file = tmp_path / 'disposable.txt'
+    write_list(domains_file, ['old.example'])
+    DisposableDomains(str(domains_file), reload_interval=0)
+    snapshot = f'{domains_file}.idx'
+
+    # the list changed after the snapshot was written
+    write_list(domains_file, ['new.example', 'other.example'])
+    stat = os.stat(domains_file)
+    assert DisposableDomainIndex.load(snapshot, source_stamp=(stat.st_mtime_ns, stat.st_size)) is None
+    disposable = DisposableDomains(str(domains_file), reload_interval=0)
+    assert disposable.is_disposable_domain('new.example')
+    assert not disposable.is_disposable_domain('old.example')
+
+    with open(snapshot, 'r+b') as f:
+        f.truncate(50)
+    assert DisposableDomainIndex.load(snapshot) is None
+    assert DisposableDomains(str(domains_file), reload_interval=0).is_disposable_domain('other.example')
+
+
+def test_list_changes_are_picked_up_in_the_background(tmp_path):
+    domains_file = tmp_path / 'disposable.txt'
+    write_list(domains_file, ['first.example'])
+    disposable = DisposableDomains(str(domains_file), reload_interval=0.01)
+    old_index = disposable.index
+
+    write_list(domains_file, ['first.example', 'second.example'])
+    time.sleep(0.02)
+    deadline = time.monotonic() + 5
+    while disposable.index is old_index and time.monotonic() < deadline:
+        # lookups keep answering from the old index while the new one is built
+        assert disposable.is_disposable_domain('first.example')
+        time.sleep(0.01)
+
+    assert disposable.is_disposable_domain('second.example')
+    assert not disposable.reload()
+
+
+def test_mx_hosts_match_patterns_and_listed_domains(tmp_path):
+    domains_file = tmp_path / 'disposable.txt'
+    write_list(domains_file, ['mailinator.com'])
+    disposable = DisposableDomains(str(domains_file), mx_patterns=['mx*.guerrillamail.*'], reload_interval=0)
+
+    assert disposable.is_disposable_mx(['mx1.mailinator.com.'])
+    assert disposable.is_disposable_mx(['aspmx.l.google.com', 'MX2.GuerrillaMail.net'])
+    assert not disposable.is_disposable_mx(['aspmx.l.google.com'])
@@ -0,0 +1,31 @@
+import asyncio
+
+from app.core.dns_check import DNSChecker
+from benchmarks.fakes import FakeResolver
+
+
+def verify_domain(email, **resolver_options):
+    resolver = FakeResolver(**resolver_options)
+    return asyncio.run(DNSChecker(resolver=resolver).verify_domain(email)), resolver
+
+
+def test_null_mx_accepts_no_mail():
+    # "." as the only exchange: RFC 7505 null MX, even though the domain has an A record
+    result, resolver = verify_domain('john@nomail.com', mx={'nomail.com': ['']})
+    assert result['is_valid_domain'] is False
+    assert result['null_mx'] is True
+    assert result['mx_servers'] == []
+    assert resolver.queries <= 2
+
+
+def test_null_mx_next_to_real_hosts_is_ignored():
+    result, _ = verify_domain('john@mixed.com', mx={'mixed.com': ['', 'mx.mixed.com']})
+    assert result['is_valid_domain'] is True
+    assert result['mx_servers'] == ['mx.mixed.com']
+
+
+def test_domain_without_mx_falls_back_to_a():
+    result, _ = verify_domain('john@aonly.com', mx={}, a_only=['aonly.com'])
+    assert (result['is_valid_domain'], result['has_mx_records'], result['domain_exists']) == (True, False, True)
+    result, _ = verify_domain('john@gone.com', mx={})
+    assert result['is_valid_domain'] is False
@@ -0,0 +1,100 @@
+import csv
+import io
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+from app.core.file_runner import CSV_COLUMNS, Checkpoint, FileRunner
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_interrupted_run_exits(tmp_path):
+    source = tmp_path / 'emails.txt'
+    source.write_text(''.join(f'user{i}@d{i % 500}.com\n' for i in range(200_000)))
+    output = tmp_path / 'results.csv'
+
+    # chunks larger than a pipe buffer: the inbox feeder threads are still writing when the interrupt arrives
+    run = subprocess.Popen([sys.executable, 'cli.py', str(source), str(output), '--processes', '2',
+                            '--depth', 'syntax', '--chunk-size', '5000'],
+                           cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, start_new_session=True)
+    time.sleep(3)
+    # like Ctrl-C: the whole process group, workers included
+    os.killpg(run.pid, signal.SIGINT)
+    try:
+        _, err = run.communicate(timeout=20)
+    except subprocess.TimeoutExpired:
+        run.kill()
+        raise AssertionError('the interrupted run did not exit')
+    assert run.returncode == 130, err.decode()
+    assert os.path.exists(str(output) + '.checkpoint')
+
+
+def write_emails(path, count):
+    path.write_text('email\n' + ''.join(f'user{i}@d{i % 50}.com\n' for i in range(count)))
+
+
+def output_rows(path):
+    with open(path, newline='') as f:
+        records = list(csv.reader(f))
+    assert records[0] == list(CSV_COLUMNS)
+    return sorted(int(record[0]) for record in records[1:])
+
+
+def test_checkpoint_watermark_and_round_trip(tmp_path):
+    checkpoint = Checkpoint(str(tmp_path / 'run.checkpoint'), {'input': 'a.csv', 'chunk_size': 10})
+    for chunk_id in (0, 2, 3, 1, 5):
+        checkpoint.mark(chunk_id, 10, 100, {'valid': 6, 'invalid': 4})
+    assert (checkpoint.done_below, checkpoint.done_above) == (4, {5})
+    assert [chunk_id in checkpoint for chunk_id in range(7)] == [True] * 4 + [False, True, False]
+    checkpoint.save()
+
+    loaded = Checkpoint(checkpoint.path, checkpoint.settings)
+    assert loaded.load()
+    assert (loaded.output_bytes, loaded.rows_done, loaded.counts) == (500, 50, {'valid': 30, 'invalid': 20})
+    assert 5 in loaded and 4 not in loaded
+    with pytest.raises(ValueError):
+        Checkpoint(checkpoint.path, {'input': 'a.csv', 'chunk_size': 20}).load()
+    assert not Checkpoint(str(tmp_path / 'missing'), {}).load()
+
+
+def test_interrupted_run_resumes_without_duplicates(tmp_path, monkeypatch):
+    source = tmp_path / 'emails.csv'
+    write_emails(source, 2000)
+    output = tmp_path / 'results.csv'
+    options = dict(processes=2, depth='syntax', shards=8, chunk_size=50, log=io.StringIO())
+
+    mark = Checkpoint.mark
+    marked = []
+
+    def interrupted_mark(self, *args):
+        # the chunk is already written to the output when the interrupt lands
+        if len(marked) == 10:
+            raise KeyboardInterrupt
+        marked.append(args[0])
+        mark(self, *args)
+
+    monkeypatch.setattr(Checkpoint, 'mark', interrupted_mark)
+    with pytest.raises(KeyboardInterrupt):
+        FileRunner(str(source), str(output), **options).run()
+    monkeypatch.setattr(Checkpoint, 'mark', mark)
+
+    with open(str(output) + '.checkpoint') as f:
+        saved = json.load(f)
+    assert saved['rows_done'] == 500
+    # the unmarked chunk is past the recorded size, and dropped on resume
+    assert os.path.getsize(output) > saved['output_bytes']
+
+    counts = FileRunner(str(source), str(output), **options).run()
+    assert output_rows(output) == list(range(1, 2001))
+    assert sum(counts.values()) == 2000
+
+    # a finished run is not verified again
+    log = io.StringIO()
+    assert FileRunner(str(source), str(output), **dict(options, log=log)).run() == counts
+    assert 'already complete' in log.getvalue()
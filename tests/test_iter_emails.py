@@ -0,0 +1,35 @@
+import asyncio
+
+import pytest
+
+from app.utils.helpers import iter_emails
+
+
+def collect(body: bytes, chunk_size: int = 3):
+    async def chunks():
+        for i in range(0, len(body), chunk_size):
+            yield body[i:i + chunk_size]
+
+    async def scenario():
+        return [email async for email in iter_emails(chunks())]
+
+    return asyncio.run(scenario())
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 1000])
+def test_object_body_streams_the_emails_array(chunk_size):
+    body = (b'{"tags": ["vip", {"x": [1, 2]}], "name": "[x] \\"quoted\\" {y}", '
+            b'"nested": {"emails": ["nope@b.com"]}, "emails": ["a@b.com", "c\\u0040d.com"], "after": [3]}')
+    assert collect(body, chunk_size) == ['a@b.com', 'c@d.com']
+
+
+def test_array_and_line_bodies():
+    assert collect(b' ["a@b.com", "c@d.com"]') == ['a@b.com', 'c@d.com']
+    assert collect(b'a@b.com\n"c@d.com"\r\n\ne@f.com') == ['a@b.com', 'c@d.com', 'e@f.com']
+
+
+@pytest.mark.parametrize('body', [b'{"tags": ["vip"]}', b'{"emails": "a@b.com"}', b'{"emails": {"a": 1}}',
+                                  b'{"emails": 5}', b'{"tags": ['])
+def test_object_body_without_an_emails_array_is_rejected(body):
+    with pytest.raises(ValueError):
+        collect(body)
@@ -0,0 +1,232 @@
+import asyncio
+
+from app.core.jobs import JobManager, JobWorkerPool
+from app.models.jobs import JobStatus
+from app.models.results import ResultRecord
+
+
+class FakeVerifier:
+    """Addresses containing "good" are valid; ``fail`` makes every call raise."""
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.calls = []
+
+    async def verify_bulk(self, emails, priority=None):
+        self.calls.append(list(emails))
+        if self.fail:
+            raise RuntimeError('verifier down')
+        return [ResultRecord(email, 'valid' if 'good' in email else 'invalid', 95 if 'good' in email else 10,
+                             {}, 'good' in email) for email in emails]
+
+
+async def wait_for_status(manager, job_id, status, timeout=5.0):
+    loop = asyncio.get_running_loop()
+    expires = loop.time() + timeout
+    while loop.time() < expires:
+        info = await manager.status(job_id)
+        if info['status'] == status:
+            return info
+        await asyncio.sleep(0.02)
+    raise AssertionError(f'job never reached {status}: {await manager.status(job_id)}')
+
+
+def make_pool(manager, verifier, consumer='worker-1', **kwargs):
+    kwargs.setdefault('block_ms', 50)
+    return JobWorkerPool(manager, verifier, workers=2, batch_size=3, consumer=consumer, **kwargs)
+
+
+def test_submit_reports_queued_job(redis_client):
+    async def scenario():
+        manager = JobManager(redis_client())
+        job_id = await manager.submit(['a@x.com', 'b@x.com'])
+        info = await manager.status(job_id)
+        assert info['status'] == JobStatus.QUEUED.value
+        assert (info['total'], info['processed'], info['progress']) == (2, 0, 0.0)
+        assert await manager.results(job_id) == [None, None]
+        assert await manager.status('missing') is None
+
+    asyncio.run(scenario())
+
+
+def test_empty_job_completes_on_submit(redis_client):
+    async def scenario():
+        manager = JobManager(redis_client())
+        job_id = await manager.submit([])
+        assert (await manager.status(job_id))['status'] == JobStatus.COMPLETED.value
+
+    asyncio.run(scenario())
+
+
+def test_progress_and_results_in_input_order_with_duplicates(redis_client):
+    emails = ['good1@x.com', 'bad@x.com', 'good1@x.com', 'good2@y.com', 'bad@x.com', 'good3@z.com', 'other@y.com']
+
+    async def scenario():
+        manager = JobManager(redis_client())
+        job_id = await manager.submit(emails, chunk_size=2)
+        pool = make_pool(manager, FakeVerifier())
+        await pool.start()
+        try:
+            info = await wait_for_status(manager, job_id, JobStatus.COMPLETED.value)
+        finally:
+            await pool.stop()
+        assert (info['processed'], info['valid_count'], info['progress']) == (7, 4, 1.0)
+        results = await manager.results(job_id, offset=0, limit=100)
+        assert [result['email'] for result in results] == emails
+        assert [result['is_verified'] for result in results] == [True, False, True, True, False, True, False]
+        assert await manager.results(job_id, offset=5, limit=10) == results[5:]
+
+    asyncio.run(scenario())
+
+
+def test_running_job_reports_partial_progress(redis_client):
+    async def scenario():
+        manager = JobManager(redis_client())
+        job_id = await manager.submit(['good@x.com', 'bad@x.com'])
+        assert await manager.record_result(job_id, 0, {'email': 'good@x.com', 'is_verified': True})
+        # a redelivered position is not counted twice
+        assert not await manager.record_result(job_id, 0, {'email': 'good@x.com', 'is_verified': True})
+        info = await manager.status(job_id)
+        assert info['status'] == JobStatus.RUNNING.value
+        assert (info['processed'], info['valid_count'], info['progress']) == (1, 1, 0.5)
+
+    asyncio.run(scenario())
+
+
+def test_pending_entries_of_dead_consumer_are_reclaimed(redis_client):
+    async def scenario():
+        manager = JobManager(redis_client())
+        job_id = await manager.submit(['good@x.com', 'bad@x.com', 'good2@x.com'])
+        # a worker reads everything and dies before acknowledging
+        await manager.redis.xreadgroup(manager.group, 'dead-worker', {manager.stream: '>'}, count=10)
+
+        verifier = FakeVerifier()
+        pool = make_pool(manager, verifier, consumer='worker-2', claim_idle_ms=100)
+        await pool.start()
+        try:
+            info = await wait_for_status(manager, job_id, JobStatus.COMPLETED.value)
+        finally:
+            await pool.stop()
+        assert info['processed'] == 3
+        assert sorted(email for call in verifier.calls for email in call) == ['bad@x.com', 'good2@x.com', 'good@x.com']
+        assert await manager.redis.xpending(manager.stream, manager.group) == \
+            {'pending': 0, 'min': None, 'max': None, 'consumers': []}
+
+    asyncio.run(scenario())
+
+
+def test_restarted_consumer_replays_its_own_pending_entries(redis_client):
+    async def scenario():
+        manager = JobManager(redis_client())
+        job_id = await manager.submit(['good@x.com', 'bad@x.com'])
+        await manager.ensure_group()
+        await manager.redis.xreadgroup(manager.group, 'worker-1', {manager.stream: '>'}, count=10)
+
+        # same consumer name after the restart, reclaiming effectively disabled
+        pool = make_pool(manager, FakeVerifier(), consumer='worker-1', claim_idle_ms=10 ** 9)
+        await pool.start()
+        try:
+            await wait_for_status(manager, job_id, JobStatus.COMPLETED.value)
+        finally:
+            await pool.stop()
+
+    asyncio.run(scenario())
+
+
+def test_cancel_stops_the_job_and_drops_its_items(redis_client):
+    async def scenario():
+        manager = JobManager(redis_client())
+        job_id = await manager.submit(['good@x.com', 'bad@x.com'])
+        assert await manager.cancel(job_id)
+        assert not await manager.cancel('missing')
+
+        verifier = FakeVerifier()
+        pool = make_pool(manager, verifier)
+        await pool.start()
+        try:
+            for _ in range(100):
+                if not await manager.redis.xlen(manager.stream):
+                    break
+                await asyncio.sleep(0.02)
+        finally:
+            await pool.stop()
+        assert verifier.calls == []
+        assert await manager.redis.xlen(manager.stream) == 0
+        info = await manager.status(job_id)
+        assert (info['status'], info['processed']) == (JobStatus.CANCELLED.value, 0)
+
+    asyncio.run(scenario())
+
+
+def test_cancel_is_not_overwritten_by_a_result_in_flight(redis_client):
+    async def scenario():
+        manager = JobManager(redis_client())
+        job_id = await manager.submit(['good@x.com', 'bad@x.com'])
+        real_pipeline = manager.redis.pipeline
+
+        def pipeline(*args, **kwargs):
+            # the cancel lands right after record_result has read the job as queued
+            manager.redis.pipeline = real_pipeline
+            pipe = real_pipeline(*args, **kwargs)
+            execute = pipe.execute
+
+            async def execute_then_cancel(*args, **kwargs):
+                replies = await execute(*args, **kwargs)
+                await manager.cancel(job_id)
+                return replies
+
+            pipe.execute = execute_then_cancel
+            return pipe
+
+        manager.redis.pipeline = pipeline
+        await manager.record_result(job_id, 0, {'email': 'good@x.com', 'is_verified': True})
+        assert (await manager.status(job_id))['status'] == JobStatus.CANCELLED.value
+        await manager.record_result(job_id, 1, {'email': 'bad@x.com', 'is_verified': False})
+        assert (await manager.status(job_id))['status'] == JobStatus.CANCELLED.value
+
+    asyncio.run(scenario())
+
+
+def test_item_failing_max_attempts_is_recorded_as_error(redis_client):
+    async def scenario():
+        manager = JobManager(redis_client())
+        job_id = await manager.submit(['good@x.com', 'bad@x.com'])
+        verifier = FakeVerifier(fail=True)
+        pool = make_pool(manager, verifier, claim_idle_ms=60, max_attempts=2)
+        await pool.start()
+        try:
+            info = await wait_for_status(manager, job_id, JobStatus.COMPLETED.value)
+        finally:
+            await pool.stop()
+        # delivered max_attempts times, then given up on
+        assert len(verifier.calls) == 2
+        assert (info['processed'], info['valid_count']) == (2, 0)
+        results = await manager.results(job_id)
+        assert [result['details'] for result in results] == [{'error': 'max_attempts_exceeded'}] * 2
+        assert [result['email'] for result in results] == ['good@x.com', 'bad@x.com']
+
+    asyncio.run(scenario())
+
+
+def test_unnamed_pools_never_replay_each_others_entries(redis_client):
+    async def scenario():
+        manager = JobManager(redis_client())
+        job_id = await manager.submit(['good@x.com', 'bad@x.com'])
+        busy = JobWorkerPool(manager, FakeVerifier())
+        await manager.ensure_group()
+        # the other pool on this host has read the items and is still verifying them
+        await manager.redis.xreadgroup(manager.group, busy.consumer, {manager.stream: '>'}, count=10)
+
+        verifier = FakeVerifier()
+        pool = JobWorkerPool(manager, verifier, workers=1, block_ms=50, claim_idle_ms=10 ** 9)
+        assert pool.consumer != busy.consumer
+        await pool.start()
+        await asyncio.sleep(0.2)
+        await pool.stop()
+        assert verifier.calls == []
+        assert (await manager.status(job_id))['processed'] == 0
+        # the stopped pool left nothing behind in the group, the busy one keeps its items
+        consumers = await manager.redis.xinfo_consumers(manager.stream, manager.group)
+        assert [(c['name'], c['pending']) for c in consumers] == [(busy.consumer, 2)]
+
+    asyncio.run(scenario())
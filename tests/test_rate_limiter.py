@@ -0,0 +1,88 @@
+import asyncio
+import time
+
+from app.core.rate_limiter import RedisRateLimiter
+
+
+async def granted_within(limiter, domain, timeout, max_calls=None):
+    try:
+        await asyncio.wait_for(limiter.acquire(domain, max_calls=max_calls), timeout)
+        return True
+    except asyncio.TimeoutError:
+        return False
+
+
+def test_budget_is_shared_between_instances(redis_client):
+    async def scenario():
+        first = RedisRateLimiter(redis_client(), default_max_calls=3, window_seconds=60)
+        second = RedisRateLimiter(redis_client(), default_max_calls=3, window_seconds=60)
+        await first.acquire('example.com')
+        await second.acquire('example.com')
+        await first.acquire('example.com')
+        # the window is full for both processes
+        assert not await granted_within(second, 'example.com', 0.2)
+        assert not await granted_within(first, 'example.com', 0.2)
+        # other domains have their own budget
+        assert await granted_within(second, 'other.com', 0.2)
+
+    asyncio.run(scenario())
+
+
+def test_per_call_max_calls_overrides_default(redis_client):
+    async def scenario():
+        limiter = RedisRateLimiter(redis_client(), default_max_calls=100, window_seconds=60)
+        await limiter.acquire('example.com', max_calls=1)
+        assert not await granted_within(limiter, 'example.com', 0.2, max_calls=1)
+
+    asyncio.run(scenario())
+
+
+def test_grants_resume_when_the_window_rolls_over(redis_client):
+    async def scenario():
+        limiter = RedisRateLimiter(redis_client(), default_max_calls=2, window_seconds=1)
+        await limiter.acquire('example.com')
+        await limiter.acquire('example.com')
+        started = time.monotonic()
+        await asyncio.wait_for(limiter.acquire('example.com'), 3)
+        waited = time.monotonic() - started
+        # held back until the oldest grant left the window, not much longer
+        assert 0.5 < waited < 2.0
+
+    asyncio.run(scenario())
+
+
+def test_prefetched_grants_count_against_the_shared_window(redis_client):
+    async def scenario():
+        redis = redis_client()
+        limiter = RedisRateLimiter(redis, default_max_calls=50, window_seconds=60, prefetch=5)
+        await limiter.acquire('example.com')
+        # one round trip reserved five grants
+        assert await redis.zcard('ratelimit:example.com') == 5
+        for _ in range(4):
+            await limiter.acquire('example.com')
+        assert await redis.zcard('ratelimit:example.com') == 5
+        await limiter.acquire('example.com')
+        assert await redis.zcard('ratelimit:example.com') == 10
+
+    asyncio.run(scenario())
+
+
+def test_falls_back_to_local_limits_while_redis_is_down(redis_server, redis_client):
+    max_calls = 2
+
+    async def scenario():
+        redis = redis_client()
+        limiter = RedisRateLimiter(redis, default_max_calls=max_calls, window_seconds=60, retry_interval=0.3)
+        redis_server.connected = False
+        for _ in range(max_calls):
+            assert await granted_within(limiter, 'example.com', 0.2)
+        # the in-memory fallback still enforces the budget
+        assert not await granted_within(limiter, 'example.com', 0.2)
+
+        redis_server.connected = True
+        await asyncio.sleep(0.3)
+        # Redis is tried again after retry_interval and has a fresh window
+        assert await granted_within(limiter, 'other.com', 0.2)
+        assert await redis.zcard('ratelimit:other.com') == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,66 @@
+import asyncio
+
+from app.core.admission import BACKGROUND, BULK, INTERACTIVE, PrioritySemaphore, prioritized
+from app.core.rate_limiter import DomainRateLimiter
+from app.core.scheduler import DomainScheduler
+
+
+def make_scheduler(window_seconds=60, **options):
+    return DomainScheduler(DomainRateLimiter(default_max_calls=1000, window_seconds=window_seconds),
+                           PrioritySemaphore(100, {INTERACTIVE: 8, BULK: 2, BACKGROUND: 1}), **options)
+
+
+def test_key_concurrency_is_shared_by_all_classes():
+    async def scenario():
+        scheduler = make_scheduler(weights={'google': 3})
+        running, peak, order = 0, 0, []
+
+        def job(name):
+            async def run():
+                nonlocal running, peak
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.02)
+                running -= 1
+                order.append(name)
+            return run
+
+        futures = []
+        for priority in (BACKGROUND, BULK):
+            with prioritized(priority):
+                futures += [scheduler.submit('google', job(f'{priority}{i}')) for i in range(4)]
+        await asyncio.sleep(0)
+        with prioritized(INTERACTIVE):
+            futures += [scheduler.submit('google', job(f'{INTERACTIVE}{i}')) for i in range(2)]
+        await asyncio.gather(*futures)
+
+        assert peak == 3
+        assert scheduler.active() == {}
+        # every slot went to the highest class waiting at the time
+        assert [name.rstrip('0123456789') for name in order] == \
+            [BULK] * 3 + [INTERACTIVE] * 2 + [BULK] + [BACKGROUND] * 4
+
+    asyncio.run(scenario())
+
+
+def test_a_higher_class_takes_the_token_a_lower_one_waited_for():
+    async def scenario():
+        scheduler = make_scheduler(window_seconds=0.5, max_calls=1)
+        order = []
+
+        async def first():
+            order.append('first')
+
+        with prioritized(BULK):
+            futures = [scheduler.submit('example.com', first)]
+            bulk = scheduler.submit('example.com', lambda: asyncio.sleep(0, 'bulk'))
+        await futures[0]
+        # the lane now waits out the window for the bulk job's token
+        await asyncio.sleep(0.1)
+        with prioritized(INTERACTIVE):
+            interactive = scheduler.submit('example.com', lambda: asyncio.sleep(0, 'interactive'))
+        done, _ = await asyncio.wait({bulk, interactive}, return_when=asyncio.FIRST_COMPLETED)
+        assert done == {interactive}
+        assert await bulk == 'bulk'
+
+    asyncio.run(scenario())
@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+
+from app.core.admission import Overloaded
+from app.core.sharding import ShardDispatcher, domain_key
+from app.models.results import ResultRecord
+
+
+def make_dispatcher(overloaded: str):
+    """Two in-process 'shards'; ``overloaded`` turns every request away."""
+    dispatcher = ShardDispatcher(2)
+    for name in ('shard-0', 'shard-1'):
+        dispatcher.ring.add(name)
+        dispatcher._processes[name] = None
+
+    async def send(name, emails, message):
+        await asyncio.sleep(0.01)
+        if name == overloaded:
+            raise Overloaded('bulk', 7)
+        return [ResultRecord(email=email, status='valid', quality_score=95, details={}, is_verified=True)
+                for email in emails]
+
+    dispatcher._send = send
+    return dispatcher
+
+
+def test_bulk_keeps_the_answers_of_healthy_shards():
+    dispatcher = make_dispatcher(overloaded='shard-1')
+    emails = [f'user@domain{i}.com' for i in range(40)]
+    owners = {email: dispatcher.ring.node_for(domain_key(email)) for email in emails}
+    assert set(owners.values()) == {'shard-0', 'shard-1'}
+
+    results = asyncio.run(dispatcher.verify_bulk(emails))
+
+    assert [result.email for result in results] == emails
+    for result in results:
+        if owners[result.email] == 'shard-0':
+            assert result.status == 'valid'
+        else:
+            assert result.status == 'unknown'
+            assert 'backlog is full' in result.details['error']
+
+
+def test_overload_of_the_only_shard_asked_is_raised():
+    dispatcher = make_dispatcher(overloaded='shard-1')
+    email = next(f'user@domain{i}.com' for i in range(40)
+                 if dispatcher.ring.node_for(f'domain{i}.com') == 'shard-1')
+
+    with pytest.raises(Overloaded):
+        asyncio.run(dispatcher.verify_single(email))
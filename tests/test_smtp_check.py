@@ -0,0 +1,122 @@
+import asyncio
+import socket
+
+from app.core.smtp_check import SMTPChecker
+from benchmarks.fakes import FakeSMTPServer
+
+EMAILS = [f'user.{i}@example.org' for i in range(10)]
+
+
+def run_batch(emails, checker_options=None, **server_options):
+    async def scenario():
+        server = FakeSMTPServer(mailbox_ratio=0.5, **server_options)
+        await server.start()
+        checker = SMTPChecker(timeout=5, connect_to=lambda host: ('127.0.0.1', server.port), **(checker_options or {}))
+        try:
+            return await checker.verify_email_smtp_batch(emails, ['mx.example.org']), server
+        finally:
+            await server.stop()
+
+    return asyncio.run(scenario())
+
+
+def expected(server, emails):
+    return {email: 'valid' if server.is_mailbox(email) else 'invalid' for email in emails}
+
+
+def test_recipients_share_sessions_up_to_the_limit():
+    emails = [f'user.{i}@example.org' for i in range(30)]
+    results, server = run_batch(emails, {'max_rcpt_per_session': 25})
+    assert {email: result['status'] for email, result in results.items()} == expected(server, emails)
+    assert (server.connections, server.rcpts) == (2, 30)
+    assert results[emails[0]]['code'] in (250, 550)
+
+
+def test_452_shrinks_the_transaction_and_retries_the_address():
+    results, server = run_batch(EMAILS, {'rcpt_per_transaction': 10}, per_transaction_limit=3)
+    assert {email: result['status'] for email, result in results.items()} == expected(server, EMAILS)
+    # RSET + MAIL every 3 recipients, all in one session
+    assert (server.connections, server.rcpts) == (1, 10)
+
+
+def test_421_reconnects_and_resumes_from_the_first_unanswered_address():
+    results, server = run_batch(EMAILS, per_session_limit=4)
+    assert {email: result['status'] for email, result in results.items()} == expected(server, EMAILS)
+    assert (server.connections, server.rcpts) == (3, 10)
+
+
+def test_deferred_recipients_keep_the_last_code_and_message():
+    results, _ = run_batch(EMAILS[:3], throttle_ratio=1.0)
+    for result in results.values():
+        assert result['status'] == 'unknown'
+        assert (result['code'], result['message']) == (450, '4.2.1 try again later')
+
+
+def test_unreachable_host_fails_after_max_reconnects():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+
+    async def scenario():
+        checker = SMTPChecker(timeout=2, max_reconnects=2, connect_to=lambda host: ('127.0.0.1', port))
+        results = await checker.check_smtp_batch(EMAILS[:2], 'mx.example.org')
+        assert {result['status'] for result in results.values()} == {'error'}
+        # every failed connect counted against the host
+        assert checker.breaker.snapshot()
+
+    asyncio.run(scenario())
+
+
+def unused_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def test_slow_primary_mx_is_hedged_with_the_next_one():
+    async def scenario():
+        slow, fast = FakeSMTPServer(mailbox_ratio=1.0, latency=0.5), FakeSMTPServer(mailbox_ratio=1.0)
+        await slow.start()
+        await fast.start()
+        ports = {'mx1.example.org': slow.port, 'mx2.example.org': fast.port}
+        checker = SMTPChecker(timeout=5, hedge_delay=0.1, connect_to=lambda host: ('127.0.0.1', ports[host]))
+
+        started = asyncio.get_running_loop().time()
+        result = await checker.verify_email_smtp(EMAILS[0], ['mx1.example.org', 'mx2.example.org'])
+        assert result['status'] == 'valid'
+        assert asyncio.get_running_loop().time() - started < 0.5
+        assert (slow.connections, fast.connections) == (1, 1)
+        # the losing attempt is cancelled before its RCPT
+        await asyncio.sleep(0.6)
+        assert slow.rcpts == 0
+        await slow.stop()
+        await fast.stop()
+
+    asyncio.run(scenario())
+
+
+def test_unreachable_mx_is_skipped_once_its_circuit_opens():
+    dead_port = unused_port()
+
+    async def scenario():
+        server = FakeSMTPServer(mailbox_ratio=1.0)
+        await server.start()
+        ports = {'mx1.example.org': dead_port, 'mx2.example.org': server.port}
+        checker = SMTPChecker(timeout=2, hedge_delay=5, connect_to=lambda host: ('127.0.0.1', ports[host]))
+        mx = ['mx1.example.org', 'mx2.example.org']
+
+        # a refused connection starts the next host without waiting for hedge_delay
+        for _ in range(2):
+            assert (await asyncio.wait_for(checker.verify_email_smtp(EMAILS[0], mx), 1))['status'] == 'valid'
+        assert checker.breaker.is_open('mx1.example.org')
+        assert checker.live_hosts(mx) == ['mx2.example.org']
+        result = await checker.check_smtp(EMAILS[0], 'mx1.example.org')
+        assert result['circuit_open']
+        assert server.connections == 2
+
+        checker.breaker.record_failure('mx2.example.org')
+        checker.breaker.record_failure('mx2.example.org')
+        assert (await checker.verify_email_smtp(EMAILS[0], mx)) == {'status': 'unknown', 'reason': 'mx_unreachable'}
+        await server.stop()
+
+    asyncio.run(scenario())
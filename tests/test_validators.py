@@ -0,0 +1,79 @@
+import asyncio
+
+from app.core.validators import EmailValidators
+from app.core.verifier import EmailVerifier
+from benchmarks.fakes import FakeResolver
+
+
+def test_role_names_match_whole_tokens_only():
+    validators = EmailValidators()
+    roles = ['info@x.com', 'info.smith@x.com', 'support2@x.com', 'no-reply@x.com', 'web.master@x.com',
+             'sales+eu@x.com', 'team-admin@x.com', 'POSTMASTER@x.com']
+    people = ['shinfo.smith@x.com', 'information@x.com', 'salesman@x.com', 'hellen@x.com', 'john.doe@x.com']
+
+    assert [email for email in roles if not validators.is_role_account(email)] == []
+    assert [email for email in people if validators.is_role_account(email)] == []
+
+
+def test_role_patterns_follow_changes_to_the_prefix_set():
+    validators = EmailValidators()
+    assert not validators.is_role_account('billing@x.com')
+    validators.role_account_prefixes.add('billing')
+    assert validators.is_role_account('billing.eu@x.com')
+
+
+def test_batch_agrees_with_the_single_address_checks():
+    validators = EmailValidators()
+    emails = ['John.Doe@Example.com', 'not-an-email', 'a..b@example.com', f"{'x' * 65}@example.com",
+              'x@mailinator.com', 'box@sub.yopmail.com', 'info@example.com', 'J.Doe+tag@Gmail.com', '  spaced@x.io ']
+
+    results = validators.validate_batch(emails)
+    for raw, result in zip(emails, results):
+        email = validators.normalize_email(raw)
+        assert result.email == email
+        assert result.syntax_valid == validators.validate_syntax(email)
+        if result.syntax_valid:
+            assert result.is_disposable == validators.is_disposable_email(email)
+            assert result.is_role_account == (not result.is_disposable and validators.is_role_account(email))
+        assert validators.prefilter(raw) == result
+
+    assert [result.rejected for result in results] == [False, True, True, True, True, True, False, False, False]
+    assert results[7].email == 'jdoe@gmail.com'
+
+
+def test_batch_looks_up_each_domain_once():
+    validators = EmailValidators()
+    lookups = []
+    is_disposable_domain = validators.disposable.is_disposable_domain
+
+    def counting(domain):
+        lookups.append(domain)
+        return is_disposable_domain(domain)
+
+    validators.disposable.is_disposable_domain = counting
+    validators.validate_batch([f'user{i}@example.com' for i in range(100)] + ['a@mailinator.com', 'b@mailinator.com'])
+    assert sorted(lookups) == ['example.com', 'mailinator.com']
+
+
+def test_locally_rejected_addresses_skip_dns_and_the_cache(redis_client):
+    async def scenario():
+        resolver = FakeResolver({})
+        verifier = EmailVerifier(redis_client=redis_client(), resolver=resolver)
+        reads = []
+        get_many = verifier.cache.get_many
+
+        async def counting_get_many(keys, *args, **kwargs):
+            keys = list(keys)
+            reads.extend(keys)
+            return await get_many(keys, *args, **kwargs)
+
+        verifier.cache.get_many = counting_get_many
+        results = await verifier.verify_bulk(['bad@@x', 'x@mailinator.com', 'y@yopmail.com'])
+
+        assert [result.status for result in results] == ['invalid', 'disposable', 'disposable']
+        assert resolver.queries == 0
+        assert reads == []
+        assert len(verifier._verify_flight) == 0
+        await verifier.refresher.stop()
+
+    asyncio.run(scenario())
@@ -0,0 +1,155 @@
+import asyncio
+
+from app.core.verifier import EmailVerifier
+from app.utils.codec import decode_result, encode_result
+from benchmarks.fakes import FakeResolver, FakeSMTPServer
+
+
+async def make_verifier(redis_client, mx, resolver_options=None, **server_options):
+    server = FakeSMTPServer(**server_options)
+    await server.start()
+    verifier = EmailVerifier(redis_client=redis_client(), resolver=FakeResolver(mx, **(resolver_options or {})))
+    verifier.smtp_checker.connect_to = lambda host: ('127.0.0.1', server.port)
+    return verifier, server
+
+
+def test_catch_all_probes_respect_the_provider_budget(redis_client):
+    domains = [f'g{i}.com' for i in range(30)]
+
+    async def scenario():
+        verifier, server = await make_verifier(redis_client, {d: ['aspmx.l.google.com'] for d in domains},
+                                               mailbox_ratio=1.0, latency=0.02)
+        verifier.providers.policies = [
+            policy._replace(max_calls=3, concurrency=10) if policy.name == 'google' else policy
+            for policy in verifier.providers.policies
+        ]
+        bulk = asyncio.ensure_future(verifier.verify_bulk([f'john.doe@{d}' for d in domains]))
+        await asyncio.sleep(2)
+        # recipient sessions and catch-all probes share the 3 sessions/minute
+        assert 1 <= server.connections <= 3
+        bulk.cancel()
+        await asyncio.gather(bulk, return_exceptions=True)
+        await verifier.refresher.stop()
+        await server.stop()
+
+    asyncio.run(scenario())
+
+
+def test_refresh_joins_a_live_check_of_the_same_address(redis_client):
+    email = 'john.doe@example.org'
+
+    async def scenario():
+        verifier, server = await make_verifier(redis_client, {'example.org': ['mx.example.org']},
+                                               mailbox_ratio=1.0, latency=0.02)
+        live, refreshed = await asyncio.gather(verifier.verify_single(email), verifier._refresh(email))
+        assert live is refreshed
+        # one recipient check, one catch-all probe
+        assert server.rcpts == 2
+        await verifier.refresher.stop()
+        await server.stop()
+
+    asyncio.run(scenario())
+
+
+def test_deadline_partials_never_answer_a_full_check(redis_client):
+    email = 'john.doe@example.org'
+
+    async def scenario():
+        verifier, server = await make_verifier(redis_client, {'example.org': ['mx.example.org']},
+                                               mailbox_ratio=1.0, latency=0.1)
+        bulk = asyncio.ensure_future(verifier.verify_bulk([email], deadline=0.3))
+        await asyncio.sleep(0.05)
+        # joins the flight the bulk call claimed
+        single = await verifier.verify_single(email)
+        assert (await bulk)[0].details['depth'] != 'full'
+        assert single.status == 'valid'
+        assert single.details['depth'] == 'full'
+        await verifier.refresher.stop()
+        await server.stop()
+
+    asyncio.run(scenario())
+
+
+def test_null_mx_domain_is_invalid(redis_client):
+    async def scenario():
+        verifier, server = await make_verifier(redis_client, {'nomail.com': ['']})
+        result = await verifier.verify_single('john.doe@nomail.com')
+        assert (result.status, result.details['domain_verified']) == ('invalid', False)
+        assert server.connections == 0
+        await verifier.refresher.stop()
+        await server.stop()
+
+    asyncio.run(scenario())
+
+
+def test_cached_results_match_the_live_ones_for_every_status(redis_client):
+    emails = {
+        'bad@@syntax': 'invalid',
+        'john@mailinator.com': 'disposable',
+        'john.doe@gone.com': 'invalid',
+        'john.doe@aonly.com': 'risky',
+        'john.doe@trash.com': 'disposable',
+        'jane.roe@example.org': 'valid',
+        'john.doe@example.org': 'invalid',
+        'info@example.org': 'invalid',
+        'john.doe@catchall.com': 'catch_all',
+        'john.doe@slow.com': 'unknown',
+    }
+    mx = {'example.org': ['mx.example.org'], 'catchall.com': ['mx.catchall.com'],
+          'trash.com': ['mx1.mailinator.com']}
+
+    async def scenario():
+        verifier, server = await make_verifier(
+            redis_client, mx, resolver_options={'a_only': ['aonly.com'], 'timeouts': ['slow.com'], 'timeout': 0.1},
+            mailbox_ratio=0.5, catch_all_domains=['catchall.com'])
+        live = await verifier.verify_bulk(list(emails))
+        assert {result.email: result.status for result in live} == emails
+        # served from the cache (or, for the uncached ones, verified again)
+        cached = await verifier.verify_bulk(list(emails))
+        for first, again in zip(live, cached):
+            assert again == first
+            decoded = decode_result(first.email, encode_result(first))
+            assert decoded == first, first.status
+        await verifier.refresher.stop()
+        await server.stop()
+
+    asyncio.run(scenario())
+
+
+def test_bulk_verifies_each_normalized_address_once(redis_client):
+    emails = ['John.Doe@Example.org', 'john.doe@example.org', ' JOHN.DOE@example.org', 'john.doe@example.org']
+
+    async def scenario():
+        verifier, server = await make_verifier(redis_client, {'example.org': ['mx.example.org']},
+                                               mailbox_ratio=1.0)
+        results = await verifier.verify_bulk(emails)
+        # one recipient check, one catch-all probe
+        assert server.rcpts == 2
+        assert [result.email for result in results] == emails
+        assert {result.status for result in results} == {'valid'}
+        await verifier.refresher.stop()
+        await server.stop()
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_singles_and_bulk_share_one_check(redis_client):
+    email = 'john.doe@example.org'
+
+    async def scenario():
+        verifier, server = await make_verifier(redis_client, {'example.org': ['mx.example.org']},
+                                               mailbox_ratio=1.0, latency=0.05)
+        bulk = asyncio.ensure_future(verifier.verify_bulk([email, 'jane.roe@example.org']))
+        await asyncio.sleep(0)
+        singles = await asyncio.gather(*(verifier.verify_single(email.upper()) for _ in range(5)))
+        results = await bulk
+
+        assert all(single is singles[0] for single in singles)
+        assert singles[0].status == results[0].status == 'valid'
+        # two recipients and one catch-all probe for the domain
+        assert server.rcpts == 3
+        assert len(verifier._verify_flight) == 0
+        await verifier.refresher.stop()
+        await server.stop()
+
+    asyncio.run(scenario())
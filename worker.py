@@ -0,0 +1,39 @@
+import argparse
+import asyncio
+import signal
+from app.core.verifier import EmailVerifier
+from app.core.jobs import JobManager, JobWorkerPool
+from config import Config
+
+
+async def run(workers: int, consumer: str):
+    verifier = EmailVerifier()
+    manager = JobManager(verifier.cache.redis, result_ttl=Config.JOB_RESULT_TTL)
+    pool = JobWorkerPool(
+        manager, verifier,
+        workers=workers,
+        batch_size=Config.JOB_BATCH_SIZE,
+        consumer=consumer,
+        claim_idle_ms=Config.JOB_CLAIM_IDLE_MS,
+        max_attempts=Config.JOB_MAX_ATTEMPTS
+    )
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await pool.start()
+    await stop.wait()
+    await pool.stop()
+    await verifier.cache.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk job worker: consumes the Redis job stream")
+    parser.add_argument("--workers", type=int, default=max(Config.JOB_WORKERS, 1))
+    parser.add_argument("--consumer", default=Config.JOB_CONSUMER_NAME,
+                        help="stable consumer name (unique per process) so a restart replays its own items; "
+                             "default: a fresh name per run")
+    args = parser.parse_args()
+    asyncio.run(run(args.workers, args.consumer))